@@ -0,0 +1,452 @@
+"""
+AllBlackery Autocomplete
+
+Typo-tolerant search-box completions over product names, brands and categories:
+- Distinct phrases ("terms") weighted by how many live products carry them,
+  so index size follows the vocabulary, not the product count
+- Prefix trie over every term and each of its word suffixes ("leather jacket"
+  is also reachable from "jacket"), with a cached top-k at every node; a
+  lookup is a walk down the query's characters
+- Burst trie: the rest of a key is kept (as an offset into the term's key)
+  in a small tail list on the deepest existing node and only expanded into
+  child nodes once that list outgrows BURST_SIZE, so unique product names
+  don't cost a node per character
+- Fuzzy matching: a trigram index over the word vocabulary proposes
+  corrections, verified with a bounded (prefix) edit distance, and the
+  corrected prefix is looked up in the trie. Candidates are seeded from the
+  query's rarest trigrams; trigrams shared by more than FUZZY_POSTING_LIMIT
+  words only rank candidates already found
+- Incremental: products_db change notifications adjust term weights, and
+  only the trie nodes on the changed terms' paths are touched; a node whose
+  top-k may have lost a member is recomputed from its children on next read;
+  renaming a category re-indexes its products' category terms
+
+Benchmark (index size, build and query latency over a synthetic catalog
+with unique product names):
+    python autocomplete.py 1000000
+"""
+
+from typing import List, Optional, Dict, Any, Tuple, Callable, Iterable
+from collections import Counter
+import heapq
+import re
+
+from product_store import ProductStore
+
+TOP_K = 10
+MIN_FUZZY_LENGTH = 3
+FUZZY_CANDIDATES = 64
+FUZZY_POSTING_LIMIT = 1024
+BURST_SIZE = 32
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def max_edits(word: str) -> int:
+    return 1 if len(word) <= 5 else 2
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f"^{word}"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str, limit: int, prefix: bool = False) -> int:
+    """Levenshtein distance from a to b (or to the closest prefix of b), or limit + 1 if above limit"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    distance = min(previous) if prefix else previous[-1]
+    return distance if distance <= limit else limit + 1
+
+
+class Term:
+    __slots__ = ("kind", "key", "text", "value", "weight")
+
+    def __init__(self, kind: str, key: str, text: str, value: str):
+        self.kind = kind
+        self.key = key
+        self.text = text
+        self.value = value
+        self.weight = 0
+
+
+def _rank(term: Term) -> Tuple[int, str, str]:
+    return (-term.weight, term.key, term.kind)
+
+
+class _Node:
+    __slots__ = ("children", "terms", "tail", "top", "stale")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Terms whose key ends here
+        self.terms: Optional[List[Term]] = None
+        # (offset into term.key, term) for keys continuing below here with no child node yet
+        self.tail: Optional[List[Tuple[int, Term]]] = None
+        self.top: List[Term] = []
+        self.stale = False
+
+
+class Autocomplete:
+    """Prefix trie with per-node top-k and a trigram index for fuzzy completion"""
+
+    def __init__(self, category_name: Callable[[str], str] = lambda category_id: category_id):
+        self.category_name = category_name
+        self._root = _Node()
+        self._nodes = 1
+        self._terms: Dict[Tuple[str, str], Term] = {}
+        self._indexed: Dict[str, Tuple[Tuple[str, str, str], ...]] = {}
+        self._entries_pool: Dict[Tuple, Tuple] = {}
+        self._words: Counter = Counter()
+        self._grams: Dict[str, set] = {}
+
+    # Indexing
+    def _entries(self, product: Any) -> Tuple[Tuple[str, str, str], ...]:
+        """(kind, display text, value) of each term a product carries"""
+        entries = (
+            ("name", product.name, product.name),
+            ("brand", product.brand, product.brand),
+            ("category", self.category_name(product.categoryId), product.categoryId),
+        )
+        # Share one tuple between products carrying the same terms
+        return self._entries_pool.setdefault(entries, entries)
+
+    @staticmethod
+    def _starts(key: str) -> List[int]:
+        """Offsets of the term itself and of every suffix starting at a later word"""
+        starts = [0]
+        position = key.find(" ")
+        while position != -1:
+            starts.append(position + 1)
+            position = key.find(" ", position + 1)
+        return starts
+
+    def _locate(self, key: str, start: int = 0) -> Tuple[List[_Node], int]:
+        """Nodes along key[start:] down to the deepest existing one, and the offset in key where the walk stopped"""
+        node = self._root
+        path = [node]
+        for index in range(start, len(key)):
+            child = node.children.get(key[index])
+            if child is None:
+                return path, index
+            node = child
+            path.append(node)
+        return path, len(key)
+
+    def _paths(self, term: Term) -> Iterable[Tuple[List[_Node], int]]:
+        for start in self._starts(term.key):
+            yield self._locate(term.key, start)
+
+    def _insert(self, term: Term, start: int):
+        path, index = self._locate(term.key, start)
+        node = path[-1]
+        if index == len(term.key):
+            if node.terms is None:
+                node.terms = []
+            node.terms.append(term)
+            return
+        if node.tail is None:
+            node.tail = []
+        node.tail.append((index, term))
+        if len(node.tail) > BURST_SIZE:
+            self._burst(node)
+
+    def _burst(self, node: _Node):
+        """Expand a node's tail one character down into child nodes"""
+        tail, node.tail = node.tail, None
+        created = []
+        for index, term in tail:
+            char = term.key[index]
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+                # Its top-k is built from the moved entries on first read
+                child.stale = True
+                created.append(child)
+                self._nodes += 1
+            if index + 1 == len(term.key):
+                if child.terms is None:
+                    child.terms = []
+                child.terms.append(term)
+            else:
+                if child.tail is None:
+                    child.tail = []
+                child.tail.append((index + 1, term))
+        for child in created:
+            if child.tail is not None and len(child.tail) > BURST_SIZE:
+                self._burst(child)
+
+    def _add_word(self, word: str):
+        self._words[word] += 1
+        if self._words[word] == 1:
+            for gram in _trigrams(word):
+                self._grams.setdefault(gram, set()).add(word)
+
+    def _remove_word(self, word: str):
+        self._words[word] -= 1
+        if self._words[word] <= 0:
+            del self._words[word]
+            for gram in _trigrams(word):
+                words = self._grams.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self._grams[gram]
+
+    def _set_weight(self, term: Term, weight: int):
+        decreased = weight < term.weight
+        created = term.weight == 0 and weight > 0
+        term.weight = weight
+
+        if created:
+            for start in self._starts(term.key):
+                self._insert(term, start)
+            for word in set(term.key.split()):
+                self._add_word(word)
+
+        for path, _ in self._paths(term):
+            for node in path:
+                self._update_node(node, term, decreased)
+
+        if weight <= 0:
+            for path, index in self._paths(term):
+                if index < len(term.key):
+                    path[-1].tail.remove((index, term))
+                else:
+                    path[-1].terms.remove(term)
+            for word in set(term.key.split()):
+                self._remove_word(word)
+            del self._terms[(term.kind, term.key)]
+
+    @staticmethod
+    def _update_node(node: _Node, term: Term, decreased: bool):
+        top = node.top
+        if term in top:
+            was_full = len(top) == TOP_K
+            if term.weight <= 0:
+                top.remove(term)
+                # A term outside the list may now belong in it
+                node.stale = node.stale or was_full
+            else:
+                top.sort(key=_rank)
+                if decreased and was_full and top[-1] is term:
+                    node.stale = True
+        elif term.weight > 0:
+            if len(top) < TOP_K:
+                top.append(term)
+                top.sort(key=_rank)
+            elif _rank(term) < _rank(top[-1]):
+                top[-1] = term
+                top.sort(key=_rank)
+
+    def _refresh(self, node: _Node) -> List[Term]:
+        if node.stale:
+            candidates = [term for term in node.terms or () if term.weight > 0]
+            candidates.extend(term for _, term in node.tail or () if term.weight > 0)
+            for child in node.children.values():
+                candidates.extend(self._refresh(child))
+            node.top = heapq.nsmallest(TOP_K, dict.fromkeys(candidates), key=_rank)
+            node.stale = False
+        return node.top
+
+    def apply(self, product_ids: Iterable[str], store: ProductStore):
+        """Re-index changed products; term weights are adjusted once per distinct term"""
+        deltas: Counter = Counter()
+        for product_id in product_ids:
+            record = store.record(product_id)
+            new = self._entries(record) if record is not None else ()
+            old = self._indexed.get(product_id, ())
+            if new == old:
+                continue
+            for entry in old:
+                deltas[entry] -= 1
+            for entry in new:
+                deltas[entry] += 1
+            if new:
+                self._indexed[product_id] = new
+            else:
+                self._indexed.pop(product_id, None)
+
+        for (kind, text, value), delta in deltas.items():
+            if delta == 0:
+                continue
+            key = normalize(text)
+            if not key:
+                continue
+            term = self._terms.get((kind, key))
+            if term is None:
+                if delta < 0:
+                    continue
+                term = self._terms[(kind, key)] = Term(kind, key, text, value)
+            self._set_weight(term, term.weight + delta)
+
+    def reindex_categories(self, category_ids: Iterable[str], store: ProductStore):
+        """Re-index the products of renamed categories, whose category terms carry the old name"""
+        self.apply([pid for category_id in category_ids for pid in store.ids_in_category(category_id)], store)
+
+    # Queries
+    def _lookup(self, prefix: str) -> List[Term]:
+        """Top-k terms with a key starting with prefix"""
+        path, index = self._locate(prefix)
+        if index == len(prefix):
+            return self._refresh(path[-1])
+        # The prefix ends inside the tail of the deepest node: at most BURST_SIZE entries to filter
+        rest = prefix[index:]
+        matches = [term for start, term in path[-1].tail or ()
+                   if term.key.startswith(rest, start) and term.weight > 0]
+        return heapq.nsmallest(TOP_K, dict.fromkeys(matches), key=_rank)
+
+    def _corrections(self, word: str, prefix: bool) -> List[Tuple[int, str]]:
+        """Vocabulary words within max_edits of word (or of one of their prefixes), closest first"""
+        shared: Counter = Counter()
+        for words in sorted((self._grams.get(gram, ()) for gram in set(_trigrams(word))), key=len):
+            if shared and len(words) > FUZZY_POSTING_LIMIT:
+                for candidate in shared:
+                    if candidate in words:
+                        shared[candidate] += 1
+            else:
+                for candidate in words:
+                    shared[candidate] += 1
+        limit = max_edits(word)
+        corrections = []
+        for candidate, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = edit_distance(word, candidate, limit, prefix)
+            if distance <= limit:
+                corrections.append((distance, -self._words[candidate], candidate))
+        corrections.sort()
+        return [(distance, candidate) for distance, _, candidate in corrections]
+
+    def complete(self, query: str, limit: int = TOP_K) -> List[Dict[str, Any]]:
+        """Ranked completions: exact prefix matches first, then fuzzy ones"""
+        limit = max(1, min(limit, TOP_K))
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        # normalize() drops trailing spaces; a trailing space means the last word is complete
+        if query[-1:].isspace():
+            prefix += " "
+
+        results: Dict[Term, bool] = {}
+        for term in self._lookup(prefix)[:limit]:
+            results[term] = False
+
+        words = prefix.rstrip().split(" ")
+        if len(results) < limit and len(words[-1]) >= MIN_FUZZY_LENGTH:
+            # Complete words must match a vocabulary word; only the last one may be a partial word
+            leading = []
+            for word in words[:-1]:
+                if word in self._words or len(word) < MIN_FUZZY_LENGTH:
+                    leading.append(word)
+                else:
+                    corrections = self._corrections(word, prefix=False)
+                    leading.append(corrections[0][1] if corrections else word)
+            for _, word in self._corrections(words[-1], prefix=True):
+                for term in self._lookup(" ".join(leading + [word])):
+                    if term not in results:
+                        results[term] = True
+                if len(results) >= limit:
+                    break
+
+        ranked = list(results.items())[:limit]
+        return [
+            {
+                "text": term.text,
+                "type": term.kind,
+                "value": term.value,
+                "count": term.weight,
+                "fuzzy": fuzzy,
+            }
+            for term, fuzzy in ranked
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "terms": len(self._terms),
+            "words": len(self._words),
+            "nodes": self._nodes,
+            "products": len(self._indexed),
+        }
+
+
+_STYLE_SYLLABLES = ["ka", "lo", "mi", "ra", "ne", "to", "vi", "sa", "du", "pe", "zo", "ri", "an", "el", "or", "um"]
+
+
+def style_name(number: int) -> str:
+    """Deterministic pronounceable model name, distinct for every number ("varenna" rather than "#48213")"""
+    syllables = []
+    while True:
+        syllables.append(_STYLE_SYLLABLES[number % 16])
+        number //= 16
+        if not number:
+            return "".join(syllables).capitalize()
+
+
+def benchmark(count: int = 1_000_000) -> Dict[str, Any]:
+    """Index `count` synthetic products with unique names; measure the index and a mix of exact and misspelled queries"""
+    import time
+    import tracemalloc
+    from catalog import generate_synthetic_products
+
+    # Real catalogs rarely repeat a product name, so give every product its own model name
+    store = ProductStore()
+    with store.batch():
+        for i, product in enumerate(generate_synthetic_products(count)):
+            product["name"] = f"{product['name']} {style_name(i * 2654435761 % (1 << 32))}"
+            store[product["id"]] = product
+
+    index = Autocomplete()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index.apply(list(store), store)
+    build_seconds = time.perf_counter() - started
+    index_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    store.on_change(lambda ids: index.apply(ids, store))
+
+    queries = ["l", "lea", "leather ja", "black bo", "noir", "jakcet", "elgant dre", "snekers", "obsidain",
+               store.record_at(count // 2).name.split()[-1][:5].lower(), "xyzzy"]
+    timings = {}
+    for query in queries:
+        index.complete(query, 8)
+        rounds = 200
+        started = time.perf_counter()
+        for _ in range(rounds):
+            suggestions = index.complete(query, 8)
+        timings[query] = {
+            "microseconds": round((time.perf_counter() - started) * 1e6 / rounds, 1),
+            "top": [suggestion["text"] for suggestion in suggestions[:3]],
+        }
+
+    # Incremental update: rename one product and query again
+    product = store["syn-00000000"]
+    product["name"] = "Limited Edition Black Leather Jacket"
+    started = time.perf_counter()
+    store["syn-00000000"] = product
+    update_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "products": count,
+        "index": index.stats(),
+        "indexBytesPerProduct": index_bytes // count,
+        "buildSecondsTraced": round(build_seconds, 2),
+        "singleUpdateMs": round(update_ms, 3),
+        "afterUpdate": [s["text"] for s in index.complete("limited", 3)],
+        "queries": timings,
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000), indent=2))
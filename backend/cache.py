@@ -0,0 +1,285 @@
+"""
+AllBlackery Read-Through Cache
+
+Two-level read-through cache for product lookups:
+- L1: in-process LRU bounded by approximate bytes, not entry count, with a
+  short TTL as a backstop for missed invalidation broadcasts
+- L2 (optional): shared Redis tier (CACHE_REDIS_URL), msgpack-encoded with a TTL
+- Single-flight: concurrent misses for a key share one fetch, which runs as
+  its own task so a cancelled request can't abort it for the others
+- Invalidation: writes drop keys locally right away, then delete them from
+  the shared tier and broadcast them to other workers over Redis pub/sub.
+  Past BROADCAST_MAX_KEYS changed keys, the shared tier moves to a new
+  epoch (key namespace) and every worker clears its L1 instead.
+- A fetch that overlaps an invalidation is returned but not stored, so a
+  stale read can't repopulate the cache. Keys invalidated locally but not
+  yet deleted from the shared tier are read from the loader, not Redis.
+
+Usage:
+    cache = ReadThroughCache(load_many)          # load_many(keys) -> {key: value}
+    product = await cache.get(product_id)
+    products = await cache.get_many(product_ids)
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Iterable
+from collections import OrderedDict
+import asyncio
+import os
+import time
+
+import msgpack
+
+from integrations import redis_asyncio
+
+BROADCAST_INTERVAL_SECONDS = 0.05
+BROADCAST_MAX_KEYS = 10_000
+LOCAL_TTL_SECONDS = float(os.environ.get("CACHE_LOCAL_TTL_SECONDS", "60"))
+
+
+def approximate_size(value: Any) -> int:
+    """Rough in-memory size of a JSON-like value in bytes"""
+    if isinstance(value, str):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + 8 * len(value) + sum(approximate_size(item) for item in value)
+    return 24
+
+
+class RedisTier:
+    """Shared cache tier and invalidation channel on Redis"""
+
+    def __init__(self, url: str, namespace: str = "allblackery:products", ttl: int = 300):
+        self.client = redis_asyncio.from_url(url)
+        self.namespace = namespace
+        self.channel = f"{namespace}:invalidate"
+        self.ttl = ttl
+        self.epoch = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{self.epoch}:{key}"
+
+    async def load_epoch(self):
+        self.epoch = int(await self.client.get(f"{self.namespace}:epoch") or 0)
+
+    async def next_epoch(self) -> int:
+        self.epoch = await self.client.incr(f"{self.namespace}:epoch")
+        return self.epoch
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        values = await self.client.mget([self._key(key) for key in keys])
+        return {key: msgpack.unpackb(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, items: Dict[str, Any]):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.setex(self._key(key), self.ttl, msgpack.packb(value))
+        await pipeline.execute()
+
+    async def delete(self, keys: List[str]):
+        if keys:
+            await self.client.delete(*(self._key(key) for key in keys))
+
+    async def publish(self, message: Dict[str, Any]):
+        await self.client.publish(self.channel, msgpack.packb(message))
+
+    async def listen(self, handler: Callable[[Dict[str, Any]], None]):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    handler(msgpack.unpackb(message["data"]))
+        finally:
+            await pubsub.close()
+
+
+class ReadThroughCache:
+    """Size-bounded LRU in front of a loader, with an optional shared tier and single-flight fetches"""
+
+    def __init__(
+        self,
+        load_many: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+        max_bytes: int = 64 * 1024 * 1024,
+        shared: Optional[RedisTier] = None,
+        sizeof: Callable[[Any], int] = approximate_size,
+        local_ttl: float = LOCAL_TTL_SECONDS,
+    ):
+        self.load_many = load_many
+        self.max_bytes = max_bytes
+        self.local_ttl = local_ttl
+        self.shared = shared
+        self.sizeof = sizeof
+        self.origin = f"{os.getpid()}-{id(self)}"
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generation = 0
+        # Invalidated keys not yet deleted from the shared tier: queued, and being deleted
+        self._pending: set = set()
+        self._deleting: set = set()
+        self.stats = {
+            "hits": 0, "misses": 0, "coalesced": 0, "sharedHits": 0, "loads": 0,
+            "evictions": 0, "expirations": 0, "invalidations": 0, "sharedErrors": 0,
+        }
+
+    # L1
+    def _store(self, key: str, value: Any):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._local[key] = (value, size, time.monotonic() + self.local_ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._local.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        entry = self._local.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _clear(self):
+        self._local.clear()
+        self._bytes = 0
+
+    # Reads
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values for the keys that exist, in request order"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        waiting: Dict[str, asyncio.Task] = {}
+        missing = []
+        now = time.monotonic()
+        for key in keys:
+            entry = self._local.get(key)
+            if entry is not None and entry[2] <= now:
+                self._drop(key)
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._local.move_to_end(key)
+                found[key] = entry[0]
+                self.stats["hits"] += 1
+            elif key in self._inflight:
+                waiting[key] = self._inflight[key]
+                self.stats["coalesced"] += 1
+            else:
+                missing.append(key)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            task = asyncio.ensure_future(self._fetch(missing, self._generation))
+            for key in missing:
+                self._inflight[key] = task
+            for key in missing:
+                waiting[key] = task
+
+        for key, task in waiting.items():
+            # shield: a cancelled caller must not cancel a fetch other callers wait on
+            loaded = await asyncio.shield(task)
+            if key in loaded:
+                found[key] = loaded[key]
+
+        return {key: found[key] for key in keys if key in found}
+
+    async def _fetch(self, keys: List[str], generation: int) -> Dict[str, Any]:
+        try:
+            loaded: Dict[str, Any] = {}
+            # The shared tier may still hold the old value of a key we invalidated
+            shared_keys = [key for key in keys if key not in self._pending and key not in self._deleting]
+            if self.shared is not None and shared_keys:
+                try:
+                    loaded = await self.shared.get_many(shared_keys)
+                    self.stats["sharedHits"] += len(loaded)
+                except Exception as e:
+                    self.stats["sharedErrors"] += 1
+                    print(f"⚠️ Shared cache read failed: {str(e)}")
+
+            remaining = [key for key in keys if key not in loaded]
+            if remaining:
+                self.stats["loads"] += 1
+                fetched = await self.load_many(remaining)
+                loaded.update(fetched)
+                if self.shared is not None and fetched and generation == self._generation:
+                    try:
+                        await self.shared.set_many(fetched)
+                    except Exception as e:
+                        self.stats["sharedErrors"] += 1
+                        print(f"⚠️ Shared cache write failed: {str(e)}")
+
+            # Anything invalidated while we were fetching may be stale: return it, don't keep it
+            if generation == self._generation:
+                for key, value in loaded.items():
+                    self._store(key, value)
+            return loaded
+        finally:
+            for key in keys:
+                self._inflight.pop(key, None)
+
+    # Invalidation
+    def invalidate(self, keys: Iterable[str]):
+        """Drop keys locally; with a shared tier they are also deleted there and broadcast to other workers"""
+        self._generation += 1
+        keys = list(keys)
+        for key in keys:
+            self._drop(key)
+        self.stats["invalidations"] += len(keys)
+        if self.shared is not None:
+            self._pending.update(keys)
+
+    def _on_message(self, message: Dict[str, Any]):
+        if message.get("origin") == self.origin:
+            return
+        self._generation += 1
+        if message.get("epoch") is not None:
+            self.shared.epoch = message["epoch"]
+            self._clear()
+        else:
+            for key in message.get("keys", ()):
+                self._drop(key)
+
+    async def _broadcast(self):
+        if not self._pending:
+            return
+        keys, self._pending = list(self._pending), set()
+        self._deleting.update(keys)
+        try:
+            if len(keys) > BROADCAST_MAX_KEYS:
+                epoch = await self.shared.next_epoch()
+                await self.shared.publish({"origin": self.origin, "epoch": epoch})
+            else:
+                await self.shared.delete(keys)
+                await self.shared.publish({"origin": self.origin, "keys": keys})
+        except Exception:
+            # Retry on the next tick; until then the keys keep bypassing the shared tier
+            self._pending.update(keys)
+            raise
+        finally:
+            self._deleting.difference_update(keys)
+
+    async def run(self):
+        """Listen for other workers' invalidations and publish ours (only with a shared tier)"""
+        if self.shared is None:
+            return
+        await self.shared.load_epoch()
+        listener = asyncio.create_task(self.shared.listen(self._on_message))
+        try:
+            while True:
+                await asyncio.sleep(BROADCAST_INTERVAL_SECONDS)
+                try:
+                    await self._broadcast()
+                except Exception as e:
+                    self.stats["sharedErrors"] += 1
+                    print(f"⚠️ Cache invalidation broadcast failed: {str(e)}")
+        finally:
+            listener.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._local), "bytes": self._bytes, "shared": self.shared is not None}
@@ -0,0 +1,436 @@
+"""
+AllBlackery Catalog Loader
+
+Bulk product import for production-sized catalogs:
+- Streaming JSONL/CSV ingest, validated in batches
+- Single pass build of products_db and category product counts
+- Admin bulk upserts/deletes from streamed NDJSON, applied one batch at a time
+- Deterministic synthetic catalog generator for performance testing
+
+Usage:
+    CATALOG_PATH=/data/products.jsonl uvicorn server:app
+    SYNTHETIC_CATALOG_SIZE=1000000 uvicorn server:app
+    python catalog.py 1000000 > products.jsonl
+"""
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import List, Optional, Dict, Any, Iterable, Iterator, AsyncIterator, Tuple
+from typing_extensions import TypedDict
+from datetime import datetime, timedelta
+import csv
+import json
+import random
+import time
+
+# Rows validated per batch; bounds peak memory to one batch of raw rows
+BATCH_SIZE = 5000
+
+# Maximum number of row errors kept in a load report
+MAX_REPORTED_ERRORS = 100
+
+# CSV columns holding lists, encoded as "a|b|c" or a JSON array
+CSV_LIST_FIELDS = ("images", "sizes", "colors", "materials")
+
+
+class ProductImport(TypedDict):
+    id: str
+    name: str
+    description: str
+    price: float
+    originalPrice: Optional[float]
+    discount: int
+    categoryId: str
+    images: List[str]
+    sizes: List[str]
+    colors: List[str]
+    stock: int
+    featured: bool
+    rating: float
+    reviews: int
+    brand: str
+    materials: List[str]
+    careInstructions: str
+    createdAt: Optional[str]
+    updatedAt: Optional[str]
+
+
+# Defaults merged into every row; id, name, price and categoryId are required
+PRODUCT_DEFAULTS: Dict[str, Any] = {
+    "description": "",
+    "originalPrice": None,
+    "discount": 0,
+    "images": [],
+    "sizes": [],
+    "colors": [],
+    "stock": 0,
+    "featured": False,
+    "rating": 0.0,
+    "reviews": 0,
+    "brand": "AllBlackery",
+    "materials": [],
+    "careInstructions": "",
+    "createdAt": None,
+    "updatedAt": None,
+}
+
+# TypedDict validation returns plain dicts, avoiding a model_dump() per row
+_row_adapter = TypeAdapter(ProductImport)
+_batch_adapter = TypeAdapter(List[ProductImport])
+
+
+class LoadReport:
+    """Summary of a bulk catalog load"""
+
+    def __init__(self):
+        self.loaded = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.seconds = 0.0
+
+    def reject(self, row: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group an iterable of rows into lists of at most `size`"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _format_errors(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def validate_rows(batch: List[Dict[str, Any]]) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """Validate raw rows in one call, falling back to per-row validation; returns (product, error) per row"""
+    batch = [{**PRODUCT_DEFAULTS, **row} for row in batch]
+    try:
+        return [(product, None) for product in _batch_adapter.validate_python(batch)]
+    except ValidationError:
+        pass
+
+    results = []
+    for row in batch:
+        try:
+            results.append((_row_adapter.validate_python(row), None))
+        except ValidationError as e:
+            results.append((None, _format_errors(e)))
+    return results
+
+
+def validate_batch(batch: List[Dict[str, Any]], first_row: int, report: LoadReport) -> List[Dict[str, Any]]:
+    """Validate a batch of raw rows, recording bad rows in the report"""
+    valid = []
+    for offset, (product, error) in enumerate(validate_rows(batch)):
+        if error is None:
+            valid.append(product)
+        else:
+            report.reject(first_row + offset, error)
+    return valid
+
+
+def load_products(
+    rows: Iterable[Dict[str, Any]],
+    products_db: Dict[str, Dict[str, Any]],
+    categories_db: Dict[str, Dict[str, Any]],
+    batch_size: int = BATCH_SIZE,
+) -> LoadReport:
+    """Validate and insert products in a single pass, maintaining category product counts"""
+    report = LoadReport()
+    started = time.perf_counter()
+    now = datetime.now().isoformat()
+    row_number = 1
+
+    for batch in _batches(rows, batch_size):
+        for product in validate_batch(batch, row_number, report):
+            if product["originalPrice"] is None:
+                product["originalPrice"] = product["price"]
+            product["createdAt"] = product["createdAt"] or now
+            product["updatedAt"] = product["updatedAt"] or product["createdAt"]
+
+            category_id = product["categoryId"]
+            category = categories_db.get(category_id)
+            if category is None:
+                category = categories_db[category_id] = {
+                    "id": category_id,
+                    "name": category_id.replace("-", " ").title(),
+                    "description": "",
+                    "image": "",
+                    "productCount": 0,
+                }
+
+            if product["id"] in products_db:
+                categories_db[products_db[product["id"]]["categoryId"]]["productCount"] -= 1
+            else:
+                report.loaded += 1
+            category["productCount"] += 1
+            products_db[product["id"]] = product
+        row_number += len(batch)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream product rows from a JSON Lines file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream product rows from a CSV file with a header row"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            for field in CSV_LIST_FIELDS:
+                value = (row.get(field) or "").strip()
+                if value.startswith("["):
+                    row[field] = json.loads(value)
+                else:
+                    row[field] = [v for v in value.split("|") if v]
+            # Empty cells mean "use the default", not an empty string
+            yield {k: v for k, v in row.items() if v != ""}
+
+
+def load_catalog_file(
+    path: str,
+    products_db: Dict[str, Dict[str, Any]],
+    categories_db: Dict[str, Dict[str, Any]],
+) -> LoadReport:
+    """Load a .jsonl/.ndjson or .csv catalog file"""
+    if path.endswith(".csv"):
+        rows = read_csv(path)
+    elif path.endswith((".jsonl", ".ndjson")):
+        rows = read_jsonl(path)
+    else:
+        raise ValueError(f"Unsupported catalog format: {path}")
+    return load_products(rows, products_db, categories_db)
+
+
+# Admin bulk writes
+class CategoryImport(BaseModel):
+    id: str
+    name: str
+    description: str = ""
+    image: str = ""
+
+
+async def read_ndjson_batches(chunks: AsyncIterator[bytes], size: int = BATCH_SIZE) -> AsyncIterator[List[Tuple[int, Any]]]:
+    """Split a streamed NDJSON body into batches of (row number, parsed object or ValueError)"""
+    buffer = b""
+    row = 0
+    batch = []
+
+    def parse(line: bytes):
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return e
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                row += 1
+                batch.append((row, parse(line)))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+    if buffer.strip():
+        row += 1
+        batch.append((row, parse(buffer)))
+    if batch:
+        yield batch
+
+
+def _parse_ops(rows: List[Tuple[int, Any]], results: List[Optional[Dict[str, Any]]]) -> List[Tuple[int, str, Any]]:
+    """Split rows into (index, op, payload); malformed rows get an error result"""
+    ops = []
+    for index, (row, obj) in enumerate(rows):
+        if isinstance(obj, ValueError):
+            results[index] = {"row": row, "status": "error", "error": f"Invalid JSON: {str(obj)}"}
+        elif not isinstance(obj, dict):
+            results[index] = {"row": row, "status": "error", "error": "Expected a JSON object"}
+        else:
+            op = obj.pop("op", "upsert")
+            if op not in ("upsert", "delete"):
+                results[index] = {"row": row, "id": obj.get("id"), "status": "error", "error": f"Unknown op: {op}"}
+            elif op == "delete" and not isinstance(obj.get("id"), str):
+                results[index] = {"row": row, "status": "error", "error": "Delete requires an id"}
+            else:
+                ops.append((index, op, obj))
+    return ops
+
+
+def apply_product_batch(
+    rows: List[Tuple[int, Any]],
+    products_db,
+    categories_db: Dict[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Validate and apply one batch of product upserts/deletes in row order; returns per-row results"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    ops = _parse_ops(rows, results)
+
+    # Validate every upsert in the batch with one adapter call
+    upserts = [obj for _, op, obj in ops if op == "upsert"]
+    validated = iter(validate_rows(upserts))
+    now = datetime.now().isoformat()
+
+    with products_db.batch():
+        for index, op, obj in ops:
+            row = rows[index][0]
+            if op == "delete":
+                if obj["id"] in products_db:
+                    del products_db[obj["id"]]
+                    results[index] = {"row": row, "id": obj["id"], "status": "deleted"}
+                else:
+                    results[index] = {"row": row, "id": obj["id"], "status": "error", "error": "Product not found"}
+                continue
+
+            product, error = next(validated)
+            if error is None and product["categoryId"] not in categories_db:
+                error = f"categoryId: Unknown category {product['categoryId']}"
+            if error is not None:
+                results[index] = {"row": row, "id": obj.get("id"), "status": "error", "error": error}
+                continue
+
+            existing = products_db.get(product["id"])
+            if product["originalPrice"] is None:
+                product["originalPrice"] = product["price"]
+            product["createdAt"] = product["createdAt"] or (existing["createdAt"] if existing else now)
+            product["updatedAt"] = now
+            products_db[product["id"]] = product
+            results[index] = {"row": row, "id": product["id"], "status": "updated" if existing else "created"}
+
+    return results
+
+
+def apply_category_batch(
+    rows: List[Tuple[int, Any]],
+    categories_db: Dict[str, Dict[str, Any]],
+    products_db,
+) -> List[Dict[str, Any]]:
+    """Apply one batch of category upserts/deletes in row order; returns per-row results"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+
+    for index, op, obj in _parse_ops(rows, results):
+        row = rows[index][0]
+        if op == "delete":
+            category_id = obj["id"]
+            if category_id not in categories_db:
+                results[index] = {"row": row, "id": category_id, "status": "error", "error": "Category not found"}
+            elif next(products_db.ids_in_category(category_id), None) is not None:
+                results[index] = {"row": row, "id": category_id, "status": "error", "error": "Category has products"}
+            else:
+                del categories_db[category_id]
+                results[index] = {"row": row, "id": category_id, "status": "deleted"}
+            continue
+
+        try:
+            category = CategoryImport.model_validate(obj).model_dump()
+        except ValidationError as e:
+            results[index] = {"row": row, "id": obj.get("id"), "status": "error", "error": _format_errors(e)}
+            continue
+
+        existing = categories_db.get(category["id"])
+        category["productCount"] = existing["productCount"] if existing else 0
+        categories_db[category["id"]] = category
+        results[index] = {"row": row, "id": category["id"], "status": "updated" if existing else "created"}
+
+    return results
+
+
+# Synthetic catalog generator
+SYNTHETIC_CATEGORIES = {
+    "jackets": (["Leather Jacket", "Bomber Jacket", "Trench Coat", "Blazer", "Parka"],
+                ["S", "M", "L", "XL", "XXL"], ["Genuine Leather", "Wool", "Cotton Lining"]),
+    "dresses": (["Evening Dress", "Midi Dress", "Slip Dress", "Maxi Dress", "Wrap Dress"],
+                ["XS", "S", "M", "L", "XL"], ["Silk", "Polyester", "Spandex"]),
+    "bags": (["Handbag", "Tote", "Clutch", "Backpack", "Crossbody Bag"],
+             ["One Size"], ["Genuine Leather", "Canvas", "Gold Hardware"]),
+    "shoes": (["Boots", "Heels", "Loafers", "Sneakers", "Sandals"],
+              ["6", "7", "8", "9", "10", "11", "12"], ["Leather", "Suede", "Rubber Sole"]),
+    "accessories": (["Necklace", "Belt", "Scarf", "Sunglasses", "Watch"],
+                    ["One Size"], ["Alloy", "Black Coating", "Stainless Steel"]),
+}
+SYNTHETIC_ADJECTIVES = ["Premium", "Elegant", "Luxury", "Designer", "Classic", "Minimal", "Statement", "Urban"]
+SYNTHETIC_BRANDS = ["AllBlackery", "Noir Atelier", "Onyx", "Obsidian & Co", "Midnight Label"]
+SYNTHETIC_COLORS = ["Black", "Charcoal", "Jet", "Onyx", "Graphite", "Navy", "Dark Brown"]
+SYNTHETIC_IMAGES = [
+    "https://images.unsplash.com/photo-1551028719-00167b16eac5?w=800",
+    "https://images.unsplash.com/photo-1566479179817-6b8e3b00e8b4?w=800",
+    "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=800",
+    "https://images.unsplash.com/photo-1551107696-a4b0c5a0d9a2?w=800",
+    "https://images.unsplash.com/photo-1611652022419-a9419f74343d?w=800",
+]
+SYNTHETIC_EPOCH = datetime(2024, 1, 1)
+
+
+def generate_synthetic_products(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Lazily generate `count` deterministic products; the same seed yields the same catalog"""
+    rand = random.Random(seed).random
+    categories = list(SYNTHETIC_CATEGORIES.items())
+    discounts = (0, 0, 10, 15, 20, 25, 30)
+
+    def pick(options):
+        return options[int(rand() * len(options))]
+
+    for i in range(count):
+        category_id, (kinds, sizes, materials) = categories[i % len(categories)]
+        original_price = round(30 + rand() * 570, 2)
+        discount = pick(discounts)
+        first_material = int(rand() * len(materials))
+        created_at = (SYNTHETIC_EPOCH + timedelta(minutes=i)).isoformat()
+
+        yield {
+            "id": f"syn-{i:08d}",
+            "name": f"{pick(SYNTHETIC_ADJECTIVES)} Black {pick(kinds)}",
+            "description": f"Synthetic catalog item #{i} for performance testing.",
+            "price": round(original_price * (100 - discount) / 100, 2),
+            "originalPrice": original_price,
+            "discount": discount,
+            "categoryId": category_id,
+            "images": [pick(SYNTHETIC_IMAGES)],
+            "sizes": sizes,
+            "colors": ["Black", pick(SYNTHETIC_COLORS)],
+            "stock": int(rand() * 101),
+            "featured": rand() < 0.05,
+            "rating": round(3 + rand() * 2, 1),
+            "reviews": int(rand() * 501),
+            "brand": pick(SYNTHETIC_BRANDS),
+            "materials": [materials[first_material], materials[first_material - 1]],
+            "careInstructions": "Professional cleaning recommended",
+            "createdAt": created_at,
+            "updatedAt": created_at,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Write a synthetic catalog as JSON Lines to stdout
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    out = sys.stdout
+    for product in generate_synthetic_products(count, seed):
+        out.write(json.dumps(product, separators=(",", ":")))
+        out.write("\n")
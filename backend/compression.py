@@ -0,0 +1,238 @@
+"""
+AllBlackery Response Compression
+
+gzip/brotli compression for JSON responses:
+- Accept-Encoding negotiation (q-values honoured), preferring brotli when it
+  is installed, then gzip
+- Only bodies with a known length above MIN_COMPRESS_BYTES and a textual
+  content type are compressed; streamed responses (SSE, exports) pass through
+- Cacheable catalog GETs are served from a precompressed cache keyed by URL,
+  catalog version and encoding, together with their ETag. Each page is
+  rendered and compressed once per catalog version, at a higher compression
+  level than per-request bodies, and If-None-Match revalidation returns 304
+  without running the handler
+
+Benchmark (bytes on the wire and CPU per encoding for a product listing page):
+    python compression.py 100
+"""
+
+from typing import Optional, Dict, Any, Tuple, Hashable, Callable, Awaitable
+from collections import OrderedDict
+from starlette.requests import Request
+from starlette.responses import Response
+import gzip
+import hashlib
+import os
+
+from integrations import brotli
+
+MIN_COMPRESS_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Per-request bodies favour speed; cached bodies are compressed once, so favour size
+DYNAMIC_LEVELS = {"gzip": 6, "br": 4}
+CACHED_LEVELS = {"gzip": 9, "br": 9}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "text/csv", "application/javascript")
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli.available else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: Tuple[str, ...]) -> str:
+    """Best supported content coding for an Accept-Encoding header, or "identity\""""
+    if not accept_encoding:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for coding in supported:
+        if weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "gzip":
+        # mtime=0 keeps output byte-identical for identical bodies
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return body
+
+
+def make_etag(body: bytes, encoding: str) -> str:
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip() in COMPRESSIBLE_TYPES
+
+
+class _CachedBody:
+    __slots__ = ("body", "etag", "media_type", "encoding")
+
+    def __init__(self, body: bytes, etag: str, media_type: str, encoding: str):
+        self.body = body
+        self.etag = etag
+        self.media_type = media_type
+        # Bodies under min_bytes are cached uncompressed, whatever the request accepted
+        self.encoding = encoding
+
+
+class ResponseCompressor:
+    """Compression middleware logic plus the precompressed cache of catalog responses"""
+
+    def __init__(self, min_bytes: int = MIN_COMPRESS_BYTES, cache_max_bytes: int = CACHE_MAX_BYTES):
+        self.min_bytes = min_bytes
+        self.cache_max_bytes = cache_max_bytes
+        self.supported = supported_encodings()
+        self._cache: "OrderedDict[Tuple, _CachedBody]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_version: Hashable = None
+        self.stats = {"compressed": 0, "bytesIn": 0, "bytesOut": 0, "cacheHits": 0, "cacheMisses": 0, "notModified": 0}
+
+    def _cache_get(self, key: Tuple, version: Hashable) -> Optional[_CachedBody]:
+        if version != self._cache_version:
+            # New catalog version: every cached body is stale
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._cache_version = version
+            return None
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: Tuple, version: Hashable, entry: _CachedBody):
+        if version != self._cache_version or len(entry.body) > self.cache_max_bytes:
+            return
+        self._cache[key] = entry
+        self._cache_bytes += len(entry.body)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted.body)
+
+    def _respond(self, entry: _CachedBody, if_none_match: Optional[str]) -> Response:
+        headers = {"ETag": entry.etag, "Vary": "Accept-Encoding"}
+        if etag_matches(if_none_match, entry.etag):
+            self.stats["notModified"] += 1
+            return Response(status_code=304, headers=headers)
+        if entry.encoding != "identity":
+            headers["Content-Encoding"] = entry.encoding
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    async def handle(
+        self,
+        request: Request,
+        call_next: Callable[[Request], Awaitable[Response]],
+        cache_version: Optional[Hashable] = None,
+    ) -> Response:
+        """Run the request, compressing its response; cache_version marks the response as cacheable"""
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), self.supported)
+        if_none_match = request.headers.get("if-none-match")
+
+        cache_key = None
+        if cache_version is not None:
+            cache_key = (request.url.path, request.url.query, encoding)
+            entry = self._cache_get(cache_key, cache_version)
+            if entry is not None:
+                self.stats["cacheHits"] += 1
+                return self._respond(entry, if_none_match)
+            self.stats["cacheMisses"] += 1
+
+        response = await call_next(request)
+
+        content_type = response.headers.get("content-type", "")
+        content_length = response.headers.get("content-length")
+        if (
+            response.status_code != 200
+            or content_length is None
+            or "content-encoding" in response.headers
+            or not _is_compressible(content_type)
+            or (cache_key is None and (encoding == "identity" or int(content_length) < self.min_bytes))
+        ):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        if len(body) < self.min_bytes:
+            encoding = "identity"
+
+        if cache_key is not None:
+            level = CACHED_LEVELS.get(encoding, 0)
+            entry = _CachedBody(compress(body, encoding, level), make_etag(body, encoding), content_type, encoding)
+            self._cache_put(cache_key, cache_version, entry)
+            self._count(body, entry.body, encoding)
+            return self._respond(entry, if_none_match)
+
+        compressed = compress(body, encoding, DYNAMIC_LEVELS.get(encoding, 0))
+        self._count(body, compressed, encoding)
+
+        async def stream():
+            yield compressed
+
+        response.body_iterator = stream()
+        response.headers["content-length"] = str(len(compressed))
+        if encoding != "identity":
+            response.headers["content-encoding"] = encoding
+        response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+    def _count(self, body: bytes, compressed: bytes, encoding: str):
+        if encoding != "identity":
+            self.stats["compressed"] += 1
+            self.stats["bytesIn"] += len(body)
+            self.stats["bytesOut"] += len(compressed)
+
+
+def benchmark(page_size: int = 100, rounds: int = 20) -> Dict[str, Any]:
+    """Bytes on the wire and CPU per encoding and level for one product listing page"""
+    import json
+    import time
+    from catalog import generate_synthetic_products
+
+    products = list(generate_synthetic_products(page_size, seed=1))
+    body = json.dumps({
+        "success": True,
+        "message": "Products retrieved successfully",
+        "data": {"products": products, "pagination": {"page": 1, "limit": page_size}},
+    }).encode()
+
+    results: Dict[str, Any] = {"identityBytes": len(body)}
+    for encoding in supported_encodings():
+        for label, level in (("dynamic", DYNAMIC_LEVELS[encoding]), ("cached", CACHED_LEVELS[encoding])):
+            started = time.process_time()
+            for _ in range(rounds):
+                compressed = compress(body, encoding, level)
+            cpu_ms = (time.process_time() - started) * 1000 / rounds
+            results[f"{encoding}-{label}"] = {
+                "level": level,
+                "bytes": len(compressed),
+                "ratio": round(len(body) / len(compressed), 1),
+                "cpuMs": round(cpu_ms, 3),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100), indent=2))
@@ -0,0 +1,138 @@
+"""
+AllBlackery Event Hub
+
+In-process pub/sub behind the Server-Sent Events endpoint:
+- Per-user fan-out to every open connection (tabs, devices) of that user;
+  events for a group of users (e.g. a product's watchers) reach only their
+  connections
+- Bounded per-connection buffers: a slow client loses its oldest events and
+  gets an "overflow" event telling it to refetch, instead of growing memory
+- Heartbeat comments keep proxies from closing idle connections and let the
+  server notice disconnects
+- Each event is serialized once per publish, not once per connection
+
+Wire format (text/event-stream):
+    id: 42
+    event: order.status
+    data: {"orderId": "...", "status": "paid"}
+"""
+
+from typing import Optional, Dict, Any, Set, AsyncIterator, Callable, Awaitable, Collection
+from collections import deque
+import asyncio
+import itertools
+import json
+
+
+class Subscription:
+    """One open stream: a bounded buffer of formatted events plus a wakeup flag"""
+
+    __slots__ = ("user_id", "buffer", "wakeup", "dropped")
+
+    def __init__(self, user_id: str, buffer_size: int):
+        self.user_id = user_id
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, message: str):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(message)
+        self.wakeup.set()
+
+
+class EventHub:
+    """Per-user pub/sub with bounded buffers and heartbeats"""
+
+    def __init__(self, buffer_size: int = 100, heartbeat: float = 15.0, max_streams_per_user: int = 5):
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.max_streams_per_user = max_streams_per_user
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._ids = itertools.count(1)
+        self.stats = {"connections": 0, "published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Open a stream for a user; returns None when the user has too many open streams"""
+        streams = self._subscriptions.setdefault(user_id, set())
+        if len(streams) >= self.max_streams_per_user:
+            return None
+        subscription = Subscription(user_id, self.buffer_size)
+        streams.add(subscription)
+        self.stats["connections"] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        streams = self._subscriptions.get(subscription.user_id)
+        if streams and subscription in streams:
+            streams.discard(subscription)
+            self.stats["connections"] -= 1
+            if not streams:
+                del self._subscriptions[subscription.user_id]
+
+    def _format(self, event: str, data: Dict[str, Any]) -> str:
+        return f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> int:
+        """Push an event to every open stream of a user; returns the number of streams reached"""
+        streams = self._subscriptions.get(user_id)
+        self.stats["published"] += 1
+        if not streams:
+            return 0
+        message = self._format(event, data)
+        for subscription in streams:
+            subscription.push(message)
+        self.stats["delivered"] += len(streams)
+        return len(streams)
+
+    def publish_many(self, user_ids: Collection[str], event: str, data: Dict[str, Any]) -> int:
+        """Push one event to every open stream of each user in user_ids; returns the number of streams reached"""
+        self.stats["published"] += 1
+        # Walk whichever side is smaller: the users, or the connected users
+        if len(user_ids) <= len(self._subscriptions):
+            targets = (self._subscriptions.get(user_id) for user_id in user_ids)
+        else:
+            targets = (streams for user_id, streams in self._subscriptions.items() if user_id in user_ids)
+        message = None
+        delivered = 0
+        for streams in targets:
+            if not streams:
+                continue
+            if message is None:
+                message = self._format(event, data)
+            for subscription in streams:
+                subscription.push(message)
+            delivered += len(streams)
+        self.stats["delivered"] += delivered
+        return delivered
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._subscriptions
+
+    async def stream(
+        self,
+        subscription: Subscription,
+        is_disconnected: Callable[[], Awaitable[bool]],
+    ) -> AsyncIterator[str]:
+        """Yield SSE messages for a subscription until the client disconnects"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.wakeup.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+
+                subscription.wakeup.clear()
+                if subscription.dropped:
+                    self.stats["dropped"] += subscription.dropped
+                    yield self._format("overflow", {"dropped": subscription.dropped})
+                    subscription.dropped = 0
+                while subscription.buffer:
+                    yield subscription.buffer.popleft()
+        finally:
+            self.unsubscribe(subscription)
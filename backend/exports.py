@@ -0,0 +1,165 @@
+"""
+AllBlackery Order Export
+
+Streaming NDJSON/CSV export of orders for back-office analytics:
+- Orders are walked through a sorted order-id index; ids are time-sortable,
+  so a creation date range is just an id range found by bisection
+- Output is produced in chunks of CHUNK_SIZE orders, and control goes back to
+  the event loop between chunks, so exports run in constant memory and never
+  block other requests
+- Resumable: every row carries its order id, and an export restarted with
+  after=<last id received> continues right after it
+
+Memory benchmark (peak allocations while exporting synthetic orders):
+    python exports.py 1000000
+"""
+
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterable
+from bisect import bisect_left, bisect_right
+import asyncio
+import csv
+import io
+import json
+
+CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_FIELDS = (
+    "id", "orderNumber", "userId", "status", "totalAmount", "itemCount", "units",
+    "paymentMethod", "paymentIntentId", "createdAt", "updatedAt",
+)
+
+
+class OrderIndex:
+    """Order ids in ascending (creation) order"""
+
+    def __init__(self):
+        self.ids: List[str] = []
+
+    def add(self, order_id: str):
+        # New ids are almost always the largest, so this is an append
+        if not self.ids or order_id > self.ids[-1]:
+            self.ids.append(order_id)
+            return
+        position = bisect_left(self.ids, order_id)
+        if self.ids[position] != order_id:
+            self.ids.insert(position, order_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def range(self, after: Optional[str] = None, start: Optional[str] = None,
+              stop: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+        """Yield chunks of ids with start <= id < stop, strictly after `after`"""
+        last = after
+        while True:
+            # Re-bisect from the last id each chunk, so ids inserted meanwhile can't shift the walk
+            if last is not None and (start is None or last >= start):
+                position = bisect_right(self.ids, last)
+            else:
+                position = bisect_left(self.ids, start) if start is not None else 0
+            chunk = self.ids[position:position + chunk_size]
+            if stop is not None and chunk and chunk[-1] >= stop:
+                chunk = chunk[:bisect_left(chunk, stop)]
+            if not chunk:
+                return
+            yield chunk
+            last = chunk[-1]
+
+
+def csv_row(order: Dict[str, Any]) -> List[Any]:
+    items = order.get("items", [])
+    return [
+        order["id"], order.get("orderNumber"), order.get("userId"), order.get("status"),
+        order.get("totalAmount"), len(items), sum(item.get("quantity", 0) for item in items),
+        order.get("paymentMethod"), order.get("paymentIntentId"), order.get("createdAt"), order.get("updatedAt"),
+    ]
+
+
+async def stream_orders(
+    orders_db: Dict[str, Dict[str, Any]],
+    index: OrderIndex,
+    export_format: str = "ndjson",
+    statuses: Optional[set] = None,
+    start: Optional[str] = None,
+    stop: Optional[str] = None,
+    after: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[str]:
+    """Yield the export one chunk of orders at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(CSV_FIELDS)
+
+    for ids in index.range(after, start, stop, chunk_size):
+        for order_id in ids:
+            order = orders_db.get(order_id)
+            if order is None or (statuses and order.get("status") not in statuses):
+                continue
+            if export_format == "csv":
+                writer.writerow(csv_row(order))
+            else:
+                buffer.write(json.dumps(order, default=str))
+                buffer.write("\n")
+        if buffer.tell():
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Let other requests run between chunks
+        await asyncio.sleep(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def benchmark(count: int = 1_000_000) -> Dict[str, Any]:
+    """Export `count` synthetic orders and report bytes produced and peak allocations"""
+    import time
+    import tracemalloc
+    from ids import IdGenerator
+
+    generator = IdGenerator(1)
+    orders_db = {}
+    index = OrderIndex()
+    for i in range(count):
+        order_id = generator.next_id()
+        orders_db[order_id] = {
+            "id": order_id, "orderNumber": f"AB{order_id}", "userId": f"user-{i % 5000}",
+            "items": [{"productId": str(i % 40), "quantity": 1 + i % 3}],
+            "totalAmount": 100.0 + i % 400, "shippingAddress": {}, "paymentMethod": "card",
+            "paymentIntentId": None, "status": ("pending", "paid", "refunded")[i % 3],
+            "createdAt": "2026-01-01T00:00:00", "updatedAt": "2026-01-01T00:00:00",
+        }
+        index.add(order_id)
+
+    async def drain(export_format: str) -> int:
+        produced = 0
+        async for chunk in stream_orders(orders_db, index, export_format):
+            produced += len(chunk)
+        return produced
+
+    results = {"orders": count}
+    for export_format in EXPORT_FORMATS:
+        tracemalloc.start()
+        started = time.perf_counter()
+        produced = asyncio.run(drain(export_format))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[export_format] = {
+            "megabytes": round(produced / 1e6, 1),
+            "seconds": round(elapsed, 2),
+            "peakKB": round(peak / 1024),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000), indent=2))
@@ -0,0 +1,181 @@
+"""
+AllBlackery Google ID Token Verification
+
+Offline verification of Google sign-in ID tokens:
+- GoogleKeyring: Google's signing keys (JWKS) held locally. A background
+  task refreshes them shortly before the Cache-Control max-age runs out,
+  backs off on errors and keeps serving the old keys meanwhile, so sign-ins
+  never wait on the network in steady state. A token signed with an unknown
+  key id (key rotation) triggers one rate-limited, single-flight refresh.
+- GoogleTokenVerifier: RS256 signature, audience, issuer and expiry checks
+  with python-jose against the local keys, and a verified email (accounts are
+  linked by email), plus a short-lived LRU of
+  verified tokens keyed by token hash, so repeat sign-ins skip the RSA check
+
+Tests (locally generated keypairs, key rotation, no network):
+    python -m pytest tests/test_google_keys.py
+"""
+
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import re
+import time
+
+from http_clients import ProviderClient
+from integrations import jose_jwt
+
+ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+CERTS_PATH = "/oauth2/v3/certs"
+
+DEFAULT_MAX_AGE_SECONDS = 3600.0
+REFRESH_MARGIN = 0.1              # refresh when 10% of max-age is left
+MIN_UNKNOWN_KID_REFRESH_SECONDS = 30.0
+RETRY_MIN_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+# fetch() -> (JWKS document, max-age in seconds)
+Fetcher = Callable[[], Awaitable[Tuple[Dict[str, Any], float]]]
+
+
+class InvalidGoogleToken(ValueError):
+    pass
+
+
+def cache_max_age(cache_control: Optional[str], age: Optional[str] = None) -> float:
+    """Remaining freshness from Cache-Control max-age minus Age, or the default"""
+    match = _MAX_AGE.search(cache_control or "")
+    if not match:
+        return DEFAULT_MAX_AGE_SECONDS
+    return max(0.0, int(match.group(1)) - int(age or 0))
+
+
+def certs_fetcher(client: ProviderClient, path: str = CERTS_PATH) -> Fetcher:
+    """Fetch Google's JWKS through the pooled provider client"""
+    async def fetch() -> Tuple[Dict[str, Any], float]:
+        response = await client.request("GET", path)
+        response.raise_for_status()
+        return response.json(), cache_max_age(response.headers.get("cache-control"), response.headers.get("age"))
+    return fetch
+
+
+class GoogleKeyring:
+    """Google's signing keys by key id, refreshed in the background ahead of expiry"""
+
+    def __init__(self, fetch: Fetcher):
+        self.fetch = fetch
+        self.keys: Dict[str, Dict[str, Any]] = {}
+        self.expires_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._last_refresh = 0.0
+        self.stats = {"refreshes": 0, "refreshErrors": 0, "unknownKid": 0, "waitedForRefresh": 0}
+
+    def load(self, jwks: Dict[str, Any], max_age: float):
+        self.keys = {key["kid"]: key for key in jwks.get("keys", ()) if key.get("kid")}
+        self.expires_at = time.monotonic() + max_age
+
+    async def _refresh(self):
+        self._last_refresh = time.monotonic()
+        try:
+            jwks, max_age = await self.fetch()
+            self.load(jwks, max_age)
+            self.stats["refreshes"] += 1
+        except Exception:
+            self.stats["refreshErrors"] += 1
+            raise
+
+    async def refresh(self):
+        """Fetch the keys now; concurrent callers share one fetch"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def key_for(self, kid: str) -> Optional[Dict[str, Any]]:
+        key = self.keys.get(kid)
+        if key is not None:
+            return key
+        # Unknown kid: Google may have rotated keys since the last refresh
+        self.stats["unknownKid"] += 1
+        if not self.keys or time.monotonic() - self._last_refresh >= MIN_UNKNOWN_KID_REFRESH_SECONDS:
+            self.stats["waitedForRefresh"] += 1
+            try:
+                await self.refresh()
+            except Exception as e:
+                if not self.keys:
+                    # Nothing to fall back on: surface the outage rather than reject the token
+                    raise
+                print(f"⚠️ Google certificate refresh failed: {str(e)}")
+        return self.keys.get(kid)
+
+    async def run(self):
+        """Keep the keyring fresh: refresh ahead of expiry, retry with backoff on errors"""
+        retry = RETRY_MIN_SECONDS
+        while True:
+            try:
+                await self.refresh()
+                retry = RETRY_MIN_SECONDS
+                remaining = self.expires_at - time.monotonic()
+                await asyncio.sleep(max(RETRY_MIN_SECONDS, remaining * (1 - REFRESH_MARGIN)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Google certificate refresh failed, retrying in {retry:.0f}s: {str(e)}")
+                await asyncio.sleep(retry)
+                retry = min(RETRY_MAX_SECONDS, retry * 2)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "keys": len(self.keys), "expiresInSeconds": round(self.expires_at - time.monotonic(), 1)}
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against the keyring, caching verified claims briefly"""
+
+    def __init__(self, keyring: GoogleKeyring, client_id: Optional[str], cache_ttl: float = 300.0, max_entries: int = 10_000):
+        self.keyring = keyring
+        self.client_id = client_id
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self._verified: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"verified": 0, "cacheHits": 0, "rejected": 0}
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises InvalidGoogleToken otherwise"""
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        entry = self._verified.get(digest)
+        if entry is not None:
+            if entry[0] > now:
+                self._verified.move_to_end(digest)
+                self.stats["cacheHits"] += 1
+                return entry[1]
+            del self._verified[digest]
+
+        try:
+            header = jose_jwt.get_unverified_header(token)
+            key = await self.keyring.key_for(header.get("kid", ""))
+            if key is None:
+                raise InvalidGoogleToken("Unknown signing key")
+            claims = jose_jwt.decode(
+                token, key, algorithms=["RS256"], audience=self.client_id, issuer=ISSUERS,
+                options={"verify_at_hash": False}
+            )
+            # Users are matched by email, so an unverified address could take over an account
+            if not claims.get("email") or claims.get("email_verified") is not True:
+                raise InvalidGoogleToken("Email address is not verified")
+        except (jose_jwt.JWTError, InvalidGoogleToken) as e:
+            self.stats["rejected"] += 1
+            raise InvalidGoogleToken(str(e))
+
+        self.stats["verified"] += 1
+        # Never cache past the token's own expiry
+        self._verified[digest] = (min(now + self.cache_ttl, claims["exp"]), claims)
+        if len(self._verified) > self.max_entries:
+            self._verified.popitem(last=False)
+        return claims
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "cached": len(self._verified), "keyring": self.keyring.metrics()}
+
@@ -0,0 +1,261 @@
+"""
+AllBlackery Integration HTTP Clients
+
+Shared async HTTP layer for third-party providers (Stripe, SendGrid, Twilio, Google):
+- One httpx.AsyncClient per provider with its own connection pool, keep-alive
+  and connect/read timeouts. A slow provider can only exhaust its own pool.
+- Retries with jittered exponential backoff. Connection failures are always
+  retried, because the request never reached the provider. Timeouts, 429 and
+  5xx are retried only for idempotent requests (GET, or an Idempotency-Key
+  header). Every retry spends from a per-provider retry budget that refills
+  as a fraction of first attempts, so an outage can't multiply traffic.
+- Circuit breaker per provider: after consecutive failures, calls fail fast
+  with CircuitOpenError for a cool-down, then a single probe decides whether
+  to close it again
+- Base URLs can be overridden per provider (<PROVIDER>_API_BASE) to point at
+  stand-ins; tests pass an httpx transport instead
+
+Tests (retries, retry budget, circuit breaker against a stand-in transport):
+    python -m pytest tests/test_http_clients.py
+"""
+
+from typing import Optional, Dict, Any
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+MAX_CONNECTIONS = int(os.environ.get("INTEGRATION_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.environ.get("INTEGRATION_MAX_KEEPALIVE", "10"))
+KEEPALIVE_SECONDS = 30.0
+
+BACKOFF_BASE_SECONDS = 0.1
+BACKOFF_MAX_SECONDS = 2.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Provider -> default base URL, connect and read timeouts (seconds), retries per call
+PROVIDERS = {
+    "stripe": {"base_url": "https://api.stripe.com", "connect": 2.0, "read": 10.0, "retries": 2},
+    "sendgrid": {"base_url": "https://api.sendgrid.com", "connect": 2.0, "read": 5.0, "retries": 2},
+    "twilio": {"base_url": "https://api.twilio.com", "connect": 2.0, "read": 5.0, "retries": 2},
+    "google": {"base_url": "https://www.googleapis.com", "connect": 2.0, "read": 3.0, "retries": 2},
+}
+
+
+class IntegrationError(Exception):
+    """A provider call failed after retries"""
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+class CircuitOpenError(IntegrationError):
+    """The provider's circuit is open; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after reset_timeout lets one probe through"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """A call ended without an outcome (cancelled): let the next one probe"""
+        self._probing = False
+
+
+class RetryBudget:
+    """Token bucket for retries: each first attempt deposits `ratio` tokens, each retry spends one"""
+
+    def __init__(self, ratio: float = 0.2, reserve: float = 10.0):
+        self.ratio = ratio
+        self.capacity = reserve
+        self.tokens = reserve
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ProviderClient:
+    """Pooled client for one provider, with retries, a retry budget and a circuit breaker"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        connect: float = 2.0,
+        read: float = 5.0,
+        retries: int = 2,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive: int = MAX_KEEPALIVE,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read, connect=connect, pool=connect)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        )
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {
+            "requests": 0, "attempts": 0, "retries": 0, "budgetExhausted": 0,
+            "failures": 0, "rejected": 0, "latencySeconds": 0.0,
+        }
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created on first use, inside the running loop it will be bound to
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout, limits=self.limits, transport=self.transport
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request; returns the final response (any status) or raises IntegrationError"""
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, "circuit open")
+
+        headers = kwargs.get("headers") or {}
+        idempotent = method.upper() in ("GET", "HEAD") or any(key.lower() == "idempotency-key" for key in headers)
+        self.stats["requests"] += 1
+        self.budget.deposit()
+        started = time.perf_counter()
+        settled = False
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                self.stats["attempts"] += 1
+                response = None
+                delay = None
+                try:
+                    response = await self._http().request(method, path, **kwargs)
+                    failed = response.status_code in RETRYABLE_STATUS
+                    retryable = failed and idempotent
+                    delay = _retry_after(response)
+                    error = f"HTTP {response.status_code}"
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    # Never reached the provider, so safe to retry whatever the method
+                    failed, retryable, error = True, True, f"{type(e).__name__}: {e}"
+                except httpx.TransportError as e:
+                    failed, retryable, error = True, idempotent, f"{type(e).__name__}: {e}"
+
+                if not failed:
+                    self.breaker.success()
+                    settled = True
+                    return response
+
+                if retryable and attempt <= self.retries:
+                    if delay is None:
+                        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                    if delay <= BACKOFF_MAX_SECONDS:
+                        if self.budget.withdraw():
+                            self.stats["retries"] += 1
+                            await asyncio.sleep(delay)
+                            continue
+                        self.stats["budgetExhausted"] += 1
+
+                self.breaker.failure()
+                settled = True
+                self.stats["failures"] += 1
+                if response is not None:
+                    # Let the caller see the provider's error body
+                    return response
+                raise IntegrationError(self.name, error)
+        finally:
+            if not settled:
+                self.breaker.release()
+            self.stats["latencySeconds"] += time.perf_counter() - started
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "circuit": self.breaker.state,
+            "circuitTrips": self.breaker.trips,
+            "retryTokens": round(self.budget.tokens, 2),
+        }
+
+
+class IntegrationClients:
+    """Registry of ProviderClients built from PROVIDERS and <PROVIDER>_API_BASE overrides"""
+
+    def __init__(self, providers: Dict[str, Dict[str, Any]] = PROVIDERS):
+        self.clients: Dict[str, ProviderClient] = {}
+        for name, config in providers.items():
+            base_url = os.environ.get(f"{name.upper()}_API_BASE", config["base_url"])
+            self.clients[name] = ProviderClient(
+                name, base_url, connect=config["connect"], read=config["read"], retries=config["retries"]
+            )
+
+    def __getitem__(self, name: str) -> ProviderClient:
+        return self.clients[name]
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {name: client.metrics() for name, client in self.clients.items()}
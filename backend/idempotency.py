@@ -0,0 +1,106 @@
+"""
+AllBlackery Idempotency Keys
+
+Idempotency-Key support for non-idempotent endpoints (order creation, payment intents):
+- Completed responses are stored per key in a bounded, TTL-evicted store
+- Retries with the same key replay the stored response instead of re-running
+- Concurrent retries coalesce onto the in-flight execution and wait for it
+- Reusing a key with a different request body is rejected
+
+Client errors (4xx) are stored and replayed like successes; server errors are
+not stored, so the client can retry them with the same key.
+"""
+
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+from collections import OrderedDict
+from fastapi import HTTPException
+import asyncio
+import hashlib
+import json
+import time
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(body: Any) -> str:
+    """Stable hash of a request body, used to detect key reuse with a different request"""
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires", "future")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.expires = float("inf")
+        self.future = future
+
+
+class IdempotencyStore:
+    """Bounded, TTL-evicted store of responses keyed by idempotency key"""
+
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.stats = {"executed": 0, "replayed": 0, "coalesced": 0, "conflicts": 0}
+
+    def _evict(self):
+        """Drop expired entries and, past capacity, the oldest completed ones"""
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            in_flight = not entry.future.done()
+            if in_flight or (entry.expires > now and len(self._entries) <= self.max_entries):
+                break
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def execute(
+        self,
+        key: str,
+        fingerprint: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """Run func once per key; returns (result, replayed)"""
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+
+        self._evict()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.stats["conflicts"] += 1
+                raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+            if entry.future.done():
+                self.stats["replayed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            # shield: a cancelled retry must not cancel the shared execution
+            return await asyncio.shield(entry.future), True
+
+        entry = self._entries[key] = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        self.stats["executed"] += 1
+        try:
+            result = await func()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                del self._entries[key]
+            else:
+                entry.expires = time.monotonic() + self.ttl
+            entry.future.set_exception(e)
+            # Mark retrieved so an exception nobody awaited doesn't log a warning
+            entry.future.exception()
+            raise
+        except BaseException as e:
+            del self._entries[key]
+            entry.future.set_exception(e if isinstance(e, Exception) else HTTPException(status_code=500))
+            entry.future.exception()
+            raise
+
+        entry.expires = time.monotonic() + self.ttl
+        entry.future.set_result(result)
+        return result, False
@@ -0,0 +1,183 @@
+"""
+AllBlackery ID Service
+
+Time-sortable, collision-free ids for every entity (snowflake layout):
+- 41 bits: milliseconds since 2024-01-01 UTC (good until ~2093)
+- 10 bits: worker id (0-1023), leased per process
+- 12 bits: per-millisecond sequence (4096 ids/ms per worker)
+
+Ids are rendered as 13-character Crockford base32 strings, so string order is
+creation order. Ids are monotonic within a worker, even if the clock steps
+back. Each process (including forked server workers) leases its worker id
+on first use by locking a slot file in WORKER_ID_DIR. The lock is held until
+the process exits, so no two live processes sharing that directory get the
+same worker id:
+- WORKER_ID=n: use exactly n, and fail if another process holds it
+- WORKER_ID_RANGE=lo-hi: lease a free id in the range (give each host its
+  own range when hosts don't share WORKER_ID_DIR)
+- neither: lease a free id in 0-1023
+Human-facing order numbers are derived from the order id, with no lookup or
+uniqueness check.
+"""
+
+from typing import Optional, Tuple
+from datetime import datetime, timezone
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+EPOCH_MS = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+ID_LENGTH = 13
+ORDER_NUMBER_PREFIX = "AB"
+
+WORKER_ID_DIR = os.environ.get("WORKER_ID_DIR", os.path.join(tempfile.gettempdir(), "allblackery-worker-ids"))
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(_ALPHABET)}
+
+
+def encode(value: int) -> str:
+    """Fixed-width Crockford base32 encoding of a 64-bit id"""
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def decode(id_string: str) -> int:
+    value = 0
+    for c in id_string.upper():
+        value = (value << 5) | _DECODE[c]
+    return value
+
+
+class WorkerIdUnavailable(RuntimeError):
+    pass
+
+
+def worker_id_range() -> Tuple[int, int]:
+    """Inclusive range of worker ids this process may lease, from WORKER_ID or WORKER_ID_RANGE"""
+    configured = os.environ.get("WORKER_ID")
+    if configured is not None:
+        low = high = int(configured)
+    elif os.environ.get("WORKER_ID_RANGE"):
+        low, _, high = os.environ["WORKER_ID_RANGE"].partition("-")
+        low, high = int(low), int(high or low)
+    else:
+        low, high = 0, MAX_WORKER_ID
+    if not 0 <= low <= high <= MAX_WORKER_ID:
+        raise ValueError(f"Worker ids must be between 0 and {MAX_WORKER_ID}")
+    return low, high
+
+
+class WorkerIdLease:
+    """Exclusive lock on one worker id slot, held until release() or process exit"""
+
+    def __init__(self, directory: str = WORKER_ID_DIR):
+        self.directory = directory
+        self.worker_id: Optional[int] = None
+        self._fd: Optional[int] = None
+
+    def acquire(self, low: int, high: int) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        # Start from a pid-dependent slot so concurrent workers rarely probe the same files
+        span = high - low + 1
+        start = os.getpid() % span
+        for offset in range(span):
+            worker_id = low + (start + offset) % span
+            fd = os.open(os.path.join(self.directory, f"worker-{worker_id}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self.worker_id, self._fd = worker_id, fd
+            return worker_id
+        if low == high:
+            raise WorkerIdUnavailable(f"WORKER_ID {low} is already in use by another process")
+        raise WorkerIdUnavailable(f"All worker ids {low}-{high} are in use")
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self.worker_id = None
+
+
+def default_worker_id() -> int:
+    """Lease a worker id for this process from WORKER_ID, WORKER_ID_RANGE or the full range"""
+    global _lease
+    _lease = WorkerIdLease()
+    return _lease.acquire(*worker_id_range())
+
+
+class IdGenerator:
+    """Snowflake-style id generator; thread-safe and monotonic"""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_int(self) -> int:
+        with self._lock:
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Same millisecond or clock stepped back: keep counting on the last timestamp
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    # Sequence exhausted: borrow the next millisecond rather than sleeping
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self) -> str:
+        return encode(self.next_int())
+
+
+_generator = None
+_generator_pid = None
+_lease: Optional[WorkerIdLease] = None
+_generator_lock = threading.Lock()
+
+
+def new_id() -> str:
+    """New time-sortable id string"""
+    global _generator, _generator_pid
+    # Forked children (e.g. multi-worker servers) lease their own worker id and generator
+    if _generator is None or _generator_pid != os.getpid():
+        with _generator_lock:
+            if _generator is None or _generator_pid != os.getpid():
+                _generator = IdGenerator(default_worker_id())
+                _generator_pid = os.getpid()
+    return _generator.next_id()
+
+
+def id_timestamp(id_string: str) -> datetime:
+    """Creation time embedded in an id"""
+    ms = (decode(id_string) >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def first_id_at(moment: datetime) -> str:
+    """Smallest id that can be issued at or after a moment; naive datetimes are local time, like stored createdAt"""
+    ms = max(int(moment.timestamp() * 1000) - EPOCH_MS, 0)
+    return encode(ms << (WORKER_BITS + SEQUENCE_BITS))
+
+
+def order_number(order_id: str) -> str:
+    """Human-facing order number derived from an order id"""
+    return f"{ORDER_NUMBER_PREFIX}{order_id}"
@@ -0,0 +1,168 @@
+"""
+AllBlackery Product Image Pipeline
+
+Upload and derivative service for product images:
+- Streaming upload to disk with aiofiles, hashed while it is written
+- Content-addressed storage: identical uploads share one original and one set of variants
+- Thumbnail/card/zoom WebP derivatives rendered with Pillow in a process pool,
+  so resizing never blocks the event loop
+- Variants are immutable files served with long-lived cache headers
+- Images over MAX_IMAGE_PIXELS (or that Pillow flags as decompression bombs)
+  are rejected with 413 before they are decoded
+
+Layout under MEDIA_DIR:
+    originals/<ab>/<sha256>
+    variants/<ab>/<sha256>/<variant>.webp
+"""
+
+from typing import Optional, Dict
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, UploadFile
+import asyncio
+import hashlib
+import os
+import re
+
+import aiofiles
+
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_IMAGE_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+# Width x height cap, checked from the image header before any pixel is decoded
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", str(40_000_000)))
+CHUNK_SIZE = 1024 * 1024
+WEBP_QUALITY = 80
+
+# Variant name -> longest edge in pixels
+VARIANTS = {
+    "thumbnail": 200,
+    "card": 400,
+    "zoom": 1200,
+}
+
+# Variants never change for a given digest, so clients and CDNs may cache them forever
+VARIANT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageTooLarge(ValueError):
+    """Raised in the worker process; a plain exception so the web worker never unpickles a Pillow type"""
+
+
+def _original_path(digest: str) -> str:
+    return os.path.join(MEDIA_DIR, "originals", digest[:2], digest)
+
+
+def variant_path(digest: str, variant: str) -> Optional[str]:
+    """Path of a variant file, or None for malformed digests or unknown variants"""
+    if not _DIGEST_PATTERN.match(digest) or variant not in VARIANTS:
+        return None
+    return os.path.join(MEDIA_DIR, "variants", digest[:2], digest, f"{variant}.webp")
+
+
+def variant_url(digest: str, variant: str) -> str:
+    return f"/api/images/{digest}/{variant}.webp"
+
+
+async def save_upload(upload: UploadFile) -> str:
+    """Stream an upload to content-addressed storage; returns its sha256 digest"""
+    os.makedirs(os.path.join(MEDIA_DIR, "tmp"), exist_ok=True)
+    tmp_path = os.path.join(MEDIA_DIR, "tmp", f"upload-{os.getpid()}-{id(upload)}")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Image too large")
+                sha256.update(chunk)
+                await f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+
+        digest = sha256.hexdigest()
+        path = _original_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return digest
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_variants(media_dir: str, digest: str, max_pixels: int = MAX_IMAGE_PIXELS) -> Dict[str, str]:
+    """Resize an original into every missing WebP variant (runs in a worker process)"""
+    # Pillow is only imported in the worker processes, never in the web worker
+    from PIL import Image, ImageOps
+
+    source = os.path.join(media_dir, "originals", digest[:2], digest)
+    target_dir = os.path.join(media_dir, "variants", digest[:2], digest)
+
+    try:
+        opened = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from None
+
+    paths = {}
+    with opened as original:
+        if original.width * original.height > max_pixels:
+            raise ImageTooLarge(f"{original.width}x{original.height} exceeds {max_pixels} pixels")
+        os.makedirs(target_dir, exist_ok=True)
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+        for variant, edge in VARIANTS.items():
+            path = os.path.join(target_dir, f"{variant}.webp")
+            if not os.path.exists(path):
+                image = original.copy()
+                image.thumbnail((edge, edge), Image.LANCZOS)
+                tmp_path = f"{path}.tmp.{os.getpid()}"
+                image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+                os.replace(tmp_path, path)
+            paths[variant] = path
+    return paths
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+def _remove_original(digest: str):
+    if os.path.exists(_original_path(digest)):
+        os.remove(_original_path(digest))
+
+
+async def create_variants(digest: str) -> Dict[str, str]:
+    """Render variants in the process pool; returns variant name -> URL"""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_executor(), render_variants, MEDIA_DIR, digest, MAX_IMAGE_PIXELS)
+    except ImageTooLarge:
+        _remove_original(digest)
+        raise HTTPException(status_code=413, detail="Image dimensions too large")
+    except (OSError, ValueError):
+        # Pillow raises UnidentifiedImageError (an OSError) for non-images
+        _remove_original(digest)
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    return {variant: variant_url(digest, variant) for variant in VARIANTS}
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
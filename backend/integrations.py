@@ -0,0 +1,71 @@
+"""
+AllBlackery Lazy Integrations
+
+Optional third-party SDKs (jose, brotli, redis) are exposed as lazy module
+proxies. The real import happens on first attribute access, so a worker that
+never verifies a Google token never pays for importing jose at cold start.
+Import durations are recorded for the startup profile.
+
+Usage:
+    from integrations import jose_jwt
+    jose_jwt.decode(...)            # first access imports jose.jwt
+"""
+
+from typing import Dict, Optional
+from types import ModuleType
+import importlib
+import importlib.util
+import threading
+import time
+
+# Seconds spent importing each lazily loaded module, in load order
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                IMPORT_TIMINGS[self._name] = time.perf_counter() - started
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    @property
+    def available(self) -> bool:
+        """Whether the module is installed, checked without importing it"""
+        return self._module is not None or importlib.util.find_spec(self._name.partition(".")[0]) is not None
+
+    def __getattr__(self, attr: str):
+        module = self._module or self._load()
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for `name` that defers the import until first use"""
+    return LazyModule(name)
+
+
+# Google ID token verification (jose_jwt.decode, used by google_keys)
+jose_jwt = lazy_import("jose.jwt")
+
+# Brotli response compression (optional; gzip is used when it isn't installed)
+brotli = lazy_import("brotli")
+
+# Redis shared cache tier (optional; redis_asyncio.from_url)
+redis_asyncio = lazy_import("redis.asyncio")
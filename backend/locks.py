@@ -0,0 +1,81 @@
+"""
+AllBlackery Keyed Locks
+
+Per-key asyncio locks for read-modify-write handlers (cart, wishlist, orders):
+- One lock per key (user id), created on first use and dropped once nobody
+  holds or waits for it, so memory tracks in-flight users, not all users
+- Distinct keys never share a lock, so unrelated users never wait on each other
+- Contention metrics: acquisitions, how many had to wait, total and worst wait
+
+Usage (current_user_key(kwargs) returns kwargs["current_user"]["id"]):
+    @app.post("/api/cart/add")
+    @user_locks.serialize(current_user_key)
+    async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_current_user)):
+        ...
+"""
+
+from typing import Dict, Any, Callable, Hashable, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import time
+
+
+class _KeyLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # holders + waiters
+
+
+class KeyedLocks:
+    """asyncio locks keyed by an arbitrary hashable, with contention metrics"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, _KeyLock] = {}
+        self.stats = {"acquisitions": 0, "contended": 0, "waitSeconds": 0.0, "maxWaitSeconds": 0.0}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        entry.users += 1
+        try:
+            if entry.lock.locked():
+                self.stats["contended"] += 1
+                started = time.perf_counter()
+                await entry.lock.acquire()
+                waited = time.perf_counter() - started
+                self.stats["waitSeconds"] += waited
+                self.stats["maxWaitSeconds"] = max(self.stats["maxWaitSeconds"], waited)
+            else:
+                await entry.lock.acquire()
+            self.stats["acquisitions"] += 1
+            try:
+                yield
+            finally:
+                entry.lock.release()
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[key]
+
+    def serialize(self, key: Callable[[Dict[str, Any]], Hashable]):
+        """Decorator: run an async handler under the lock for key(kwargs)"""
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(*args, **kwargs):
+                async with self.hold(key(kwargs)):
+                    return await handler(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def metrics(self) -> Dict[str, Any]:
+        acquisitions = self.stats["acquisitions"]
+        return {
+            **self.stats,
+            "activeKeys": len(self._locks),
+            "contentionRate": round(self.stats["contended"] / acquisitions, 4) if acquisitions else 0.0,
+        }
@@ -0,0 +1,299 @@
+"""
+AllBlackery Event Loop Monitor
+
+Keeps CPU work from stalling every connection on a worker:
+- LoopMonitor: a heartbeat task measures how late the event loop wakes up
+  (lag percentiles, worst lag). A watchdog thread notices when the
+  heartbeat stops and captures the loop thread's stack mid-stall. The stall
+  is attributed to the route whose handler is on that stack.
+- CpuExecutor: a bounded thread pool for CPU-heavy calls (catalog queries,
+  invoice rendering). While a call runs in a worker thread, the interpreter
+  switches back to the loop every few milliseconds, so other requests keep
+  being served. Per-function metrics record queue wait and how many seconds
+  of work were kept off the loop.
+
+Usage:
+    loop_monitor.register_routes(app.routes)
+    asyncio.create_task(loop_monitor.run())
+    rows, total = await cpu_executor.run(select_rows, StoreSnapshot(products_db, **filters), **filters)
+
+Benchmark (worst loop lag with a CPU-bound call inline vs offloaded):
+    python loop_monitor.py 0.2
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Iterable, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+
+LAG_THRESHOLD_SECONDS = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+MONITOR_INTERVAL_SECONDS = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "25")) / 1000
+CPU_WORKERS = int(os.environ.get("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+MAX_STACK_FRAMES = 30
+NO_ROUTE = "(no route)"
+
+
+def format_stack(frame, limit: int = MAX_STACK_FRAMES) -> List[str]:
+    """Innermost-last "file:line in function" lines for a frame and its callers"""
+    summary = traceback.extract_stack(frame, limit=limit)
+    return [f"{os.path.basename(entry.filename)}:{entry.lineno} in {entry.name}" for entry in summary]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class LoopMonitor:
+    """Event-loop lag sampler with a watchdog thread that captures stall stacks"""
+
+    def __init__(
+        self,
+        threshold: float = LAG_THRESHOLD_SECONDS,
+        interval: float = MONITOR_INTERVAL_SECONDS,
+        history: int = 50,
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self._route_codes: Dict[Any, str] = {}
+        self._samples: deque = deque(maxlen=max(1, int(60 / interval)))
+        self.stalls: deque = deque(maxlen=history)
+        self.by_route: Dict[str, Dict[str, float]] = {}
+        self.stats = {"samples": 0, "stalls": 0, "stallSeconds": 0.0, "maxLagSeconds": 0.0}
+        # (sequence, monotonic time) of the last heartbeat, replaced atomically by the loop
+        self._beat: Tuple[int, float] = (0, time.monotonic())
+        self._capture: Optional[Tuple[int, str, List[str]]] = None
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+
+    def register_routes(self, routes: Iterable[Any]):
+        """Map each endpoint's code object to "METHOD /path" so stacks can be attributed to routes"""
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is None:
+                continue
+            label = f"{','.join(sorted(getattr(route, 'methods', None) or ()))} {route.path}".strip()
+            # Decorated handlers (user_locks.serialize) share a wrapper; the wrapped function is unique
+            self._route_codes[inspect.unwrap(endpoint).__code__] = label
+
+    def route_of(self, frame) -> str:
+        """Route of the innermost registered handler on a frame's call chain"""
+        while frame is not None:
+            label = self._route_codes.get(frame.f_code)
+            if label is not None:
+                return label
+            frame = frame.f_back
+        return NO_ROUTE
+
+    # Watchdog thread: runs while the loop is stuck, so it sees the culprit's stack
+    def _watch(self):
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(poll):
+            sequence, beat = self._beat
+            if time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if self._capture is not None and self._capture[0] == sequence:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._capture = (sequence, self.route_of(frame), format_stack(frame))
+            del frame
+
+    # Heartbeat task on the loop
+    async def run(self):
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            sequence = 0
+            while True:
+                started = time.monotonic()
+                self._beat = (sequence, started)
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - started - self.interval)
+                self._record(sequence, lag)
+                sequence += 1
+        finally:
+            self._stopped.set()
+
+    def _record(self, sequence: int, lag: float):
+        self._samples.append(lag)
+        self.stats["samples"] += 1
+        self.stats["maxLagSeconds"] = max(self.stats["maxLagSeconds"], lag)
+        if lag < self.threshold:
+            return
+
+        capture = self._capture
+        if capture is not None and capture[0] == sequence:
+            _, route, stack = capture
+        else:
+            # Shorter than the watchdog's poll: the duration is known, the culprit isn't
+            route, stack = NO_ROUTE, []
+        self.stats["stalls"] += 1
+        self.stats["stallSeconds"] += lag
+        totals = self.by_route.setdefault(route, {"stalls": 0, "stallSeconds": 0.0, "maxSeconds": 0.0})
+        totals["stalls"] += 1
+        totals["stallSeconds"] += lag
+        totals["maxSeconds"] = max(totals["maxSeconds"], lag)
+        self.stalls.append({
+            "at": time.time(),
+            "seconds": round(lag, 4),
+            "route": route,
+            "stack": stack,
+        })
+        print(f"🐢 EVENT LOOP STALLED {lag * 1000:.0f}ms ({route})")
+
+    def metrics(self, include_stacks: bool = False) -> Dict[str, Any]:
+        samples = list(self._samples)
+        stalls = list(self.stalls)
+        if not include_stacks:
+            stalls = [{key: value for key, value in stall.items() if key != "stack"} for stall in stalls]
+        return {
+            **self.stats,
+            "thresholdSeconds": self.threshold,
+            "lagP50Seconds": round(_percentile(samples, 0.5), 5),
+            "lagP99Seconds": round(_percentile(samples, 0.99), 5),
+            # Routes that stall the loop most are the candidates for CpuExecutor
+            "byRoute": dict(sorted(self.by_route.items(), key=lambda item: -item[1]["stallSeconds"])),
+            "recentStalls": stalls,
+        }
+
+
+class CpuExecutor:
+    """Bounded thread pool for CPU-heavy calls, with per-function wait and run metrics"""
+
+    def __init__(self, max_workers: int = CPU_WORKERS):
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Callers beyond max_workers wait here, on the loop, rather than in the pool's unbounded queue
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.by_function: Dict[str, Dict[str, float]] = {}
+        # Set by the profiler while it runs: worker thread id -> route that submitted its current call
+        self.route_of: Optional[Callable[[Any], str]] = None
+        self.origins: Dict[int, str] = {}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu")
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in a worker thread once a slot is free"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        origin = self.route_of(sys._getframe()) if self.route_of is not None else None
+        name = getattr(func, "__name__", repr(func))
+        totals = self.by_function.setdefault(name, {
+            "calls": 0, "errors": 0, "waitSeconds": 0.0, "maxWaitSeconds": 0.0,
+            "offloadedSeconds": 0.0, "maxRunSeconds": 0.0,
+        })
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            started = time.perf_counter()
+            waited = started - queued
+            totals["waitSeconds"] += waited
+            totals["maxWaitSeconds"] = max(totals["maxWaitSeconds"], waited)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor(), self._call, origin, func, args, kwargs)
+            except Exception:
+                totals["errors"] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                totals["calls"] += 1
+                totals["offloadedSeconds"] += elapsed
+                totals["maxRunSeconds"] = max(totals["maxRunSeconds"], elapsed)
+        finally:
+            self._slots.release()
+
+    def _call(self, origin: Optional[str], func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        if origin is None:
+            return func(*args, **kwargs)
+        thread = threading.get_ident()
+        self.origins[thread] = origin
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.origins.pop(thread, None)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "waiting": self.waiting,
+            # Seconds of CPU work that ran in worker threads instead of blocking the loop
+            "offloadedSeconds": round(sum(totals["offloadedSeconds"] for totals in self.by_function.values()), 4),
+            "byFunction": self.by_function,
+        }
+
+
+def benchmark(work_seconds: float = 0.2) -> Dict[str, Any]:
+    """Worst loop lag seen by a 5ms ticker while a CPU-bound call runs inline, then offloaded"""
+
+    def burn(seconds: float) -> int:
+        deadline = time.perf_counter() + seconds
+        count = 0
+        while time.perf_counter() < deadline:
+            count += 1
+        return count
+
+    async def measure(offload: bool) -> Dict[str, Any]:
+        executor = CpuExecutor(max_workers=1)
+        lags: List[float] = []
+        done = False
+
+        async def ticker():
+            while not done:
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - started - 0.005)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        if offload:
+            await executor.run(burn, work_seconds)
+        else:
+            burn(work_seconds)
+        done = True
+        await task
+        executor.shutdown()
+        return {
+            "maxLagMs": round(max(lags) * 1000, 2),
+            "p99LagMs": round(_percentile(lags, 0.99) * 1000, 2),
+            "ticks": len(lags),
+        }
+
+    return {
+        "workSeconds": work_seconds,
+        "switchIntervalMs": sys.getswitchinterval() * 1000,
+        "inline": asyncio.run(measure(offload=False)),
+        "offloaded": asyncio.run(measure(offload=True)),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2), indent=2))
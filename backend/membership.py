@@ -0,0 +1,94 @@
+"""
+AllBlackery Membership Indexes
+
+Per-user "is this product in my cart / wishlist" lookups for product grids:
+- Each user's cart or wishlist is indexed as product id -> number of lines,
+  built lazily from the store on first lookup
+- Handlers keep indexes current with add/remove, called before the item list
+  itself changes (so a lazy build can't count the change twice), or drop a
+  user's index with invalidate when the items are replaced wholesale
+- Lookups are O(1) per product id, so checking a page of N tiles is O(N)
+  instead of a scan of the item list per tile
+- WatcherIndex is the reverse direction: product id -> users whose wishlist
+  holds it, so a repriced product finds its watchers without scanning every
+  wishlist
+"""
+
+from typing import List, Dict, Any, Iterable, KeysView
+from collections import Counter
+
+MAX_MEMBERSHIP_IDS = 100
+
+
+class MembershipIndex:
+    """Lazily built per-user product-id counters over a store of {"items": [...]} documents"""
+
+    def __init__(self, store: Dict[str, Dict[str, Any]]):
+        self.store = store
+        self._counts: Dict[str, Counter] = {}
+
+    def _for(self, user_id: str) -> Counter:
+        counts = self._counts.get(user_id)
+        if counts is None:
+            document = self.store.get(user_id)
+            items = document["items"] if document else []
+            counts = self._counts[user_id] = Counter(item["productId"] for item in items)
+        return counts
+
+    def contains(self, user_id: str, product_id: str) -> bool:
+        return product_id in self._for(user_id)
+
+    def lookup(self, user_id: str, product_ids: Iterable[str]) -> List[bool]:
+        counts = self._for(user_id)
+        return [product_id in counts for product_id in product_ids]
+
+    def add(self, user_id: str, product_id: str):
+        self._for(user_id)[product_id] += 1
+
+    def remove(self, user_id: str, product_id: str):
+        counts = self._for(user_id)
+        counts[product_id] -= 1
+        if counts[product_id] <= 0:
+            del counts[product_id]
+
+    def invalidate(self, user_id: str):
+        self._counts.pop(user_id, None)
+
+
+class WatcherIndex:
+    """product id -> {user id: number of lines} over all wishlists, kept current by the wishlist handlers"""
+
+    def __init__(self):
+        self._watchers: Dict[str, Counter] = {}
+
+    def rebuild(self, store: Dict[str, Dict[str, Any]]):
+        self._watchers.clear()
+        for user_id, document in store.items():
+            for item in document["items"]:
+                self.add(user_id, item["productId"])
+
+    def add(self, user_id: str, product_id: str):
+        self._watchers.setdefault(product_id, Counter())[user_id] += 1
+
+    def remove(self, user_id: str, product_id: str):
+        users = self._watchers.get(product_id)
+        if users is None:
+            return
+        users[user_id] -= 1
+        if users[user_id] <= 0:
+            del users[user_id]
+            if not users:
+                del self._watchers[product_id]
+
+    def watchers(self, product_id: str) -> KeysView:
+        users = self._watchers.get(product_id)
+        return users.keys() if users is not None else {}.keys()
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._watchers
+
+    def products(self) -> KeysView:
+        return self._watchers.keys()
+
+    def __len__(self) -> int:
+        return len(self._watchers)
@@ -0,0 +1,268 @@
+"""
+AllBlackery Wishlist Alerts
+
+Price-drop and back-in-stock notifications for wishlisted products:
+- Only watched products (those in some wishlist, per WatcherIndex) have a
+  remembered price and stock. The change listener (on products_db, and on
+  the promotions price table, so sales count as price drops) compares
+  changed rows against that baseline: O(changed products), nothing else.
+- Detected changes are batched per product, and a background job flushes
+  them every FLUSH_INTERVAL_SECONDS. Fan-out walks each changed product's
+  watchers, so a catalog-wide sale costs O(affected wishlist lines), not
+  O(users x items).
+- Per-user coalescing: a user's alerts merge into one pending notification,
+  queued at most once and sent at most once per USER_COOLDOWN_SECONDS. A
+  price that recovers before delivery drops out of the notification.
+- Delivery runs on a few worker tasks draining a queue, through a
+  caller-supplied deliver(user_id, alerts) coroutine
+
+Benchmark (sale over a synthetic catalog with many wishlists):
+    python notifications.py 100000
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Iterable, Tuple
+import asyncio
+import os
+import time
+
+from membership import WatcherIndex
+from product_store import ProductStore
+
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("WISHLIST_ALERT_INTERVAL_SECONDS", "2"))
+USER_COOLDOWN_SECONDS = float(os.environ.get("WISHLIST_ALERT_COOLDOWN_SECONDS", "300"))
+DELIVERY_WORKERS = 4
+FANOUT_CHUNK = 5000
+
+
+class WishlistNotifier:
+    """Detects price drops / restocks of watched products and delivers coalesced per-user alerts"""
+
+    def __init__(
+        self,
+        store: ProductStore,
+        watchers: WatcherIndex,
+        deliver: Callable[[str, List[Dict[str, Any]]], Awaitable[None]],
+        interval: float = FLUSH_INTERVAL_SECONDS,
+        cooldown: float = USER_COOLDOWN_SECONDS,
+        price_at: Optional[Callable[[int], float]] = None,
+    ):
+        self.store = store
+        # Price customers pay for a row; defaults to the list price
+        self.price_at = price_at or (lambda row: float(store.price[row]))
+        self.watchers = watchers
+        self.deliver = deliver
+        self.interval = interval
+        self.cooldown = cooldown
+        self._baseline: Dict[str, Tuple[float, int]] = {}
+        # product id -> (price, stock) before the first unflushed change
+        self._changed: Dict[str, Tuple[float, int]] = {}
+        # user id -> product id -> (price, stock) before the change the user hasn't been told about
+        self._pending: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._queued: set = set()
+        self._next_allowed: Dict[str, float] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.stats = {"changes": 0, "fanout": 0, "coalesced": 0, "notifications": 0, "alerts": 0, "errors": 0}
+
+    def _current(self, product_id: str):
+        row = self.store.row_of(product_id)
+        if row is None:
+            return None
+        return self.price_at(row), int(self.store.stock[row])
+
+    # Baseline
+    def watch(self, product_id: str):
+        """Remember a product's price and stock; call when it gains a watcher"""
+        if product_id not in self._baseline:
+            current = self._current(product_id)
+            if current is not None:
+                self._baseline[product_id] = current
+
+    def seed(self):
+        self._baseline.clear()
+        for product_id in self.watchers.products():
+            self.watch(product_id)
+
+    # products_db listener
+    def on_products_changed(self, product_ids: Iterable[str]):
+        for product_id in product_ids:
+            before = self._baseline.get(product_id)
+            if before is None:
+                continue
+            if product_id not in self.watchers:
+                del self._baseline[product_id]
+                continue
+            current = self._current(product_id)
+            if current is None:
+                del self._baseline[product_id]
+                continue
+            if current == before:
+                continue
+            self._baseline[product_id] = current
+            self._changed.setdefault(product_id, before)
+            self.stats["changes"] += 1
+
+    # Background job
+    async def flush(self):
+        """Fan batched product changes out to watchers and queue users whose cooldown has passed"""
+        changed, self._changed = self._changed, {}
+        fanout = 0
+        for product_id, before in changed.items():
+            for user_id in self.watchers.watchers(product_id):
+                alerts = self._pending.setdefault(user_id, {})
+                if product_id in alerts:
+                    self.stats["coalesced"] += 1
+                else:
+                    alerts[product_id] = before
+                fanout += 1
+            if fanout >= FANOUT_CHUNK:
+                # Let requests run between chunks of a large sale
+                self.stats["fanout"] += fanout
+                fanout = 0
+                await asyncio.sleep(0)
+        self.stats["fanout"] += fanout
+
+        now = time.monotonic()
+        for user_id in self._pending:
+            if user_id not in self._queued and self._next_allowed.get(user_id, 0.0) <= now:
+                self._queued.add(user_id)
+                self._queue.put_nowait(user_id)
+
+        if len(self._next_allowed) > 10_000:
+            self._next_allowed = {user: at for user, at in self._next_allowed.items() if at > now}
+
+    def _alerts(self, user_id: str, pending: Dict[str, Tuple[float, int]]) -> List[Dict[str, Any]]:
+        alerts = []
+        for product_id, (old_price, old_stock) in pending.items():
+            if product_id not in self.watchers or user_id not in self.watchers.watchers(product_id):
+                continue
+            current = self._current(product_id)
+            if current is None:
+                continue
+            price, stock = current
+            back_in_stock = old_stock <= 0 < stock
+            if price < old_price or back_in_stock:
+                record = self.store.record(product_id)
+                alerts.append({
+                    "productId": product_id,
+                    "name": record.name,
+                    "oldPrice": old_price,
+                    "price": price,
+                    "stock": stock,
+                    "priceDrop": price < old_price,
+                    "backInStock": back_in_stock,
+                })
+        return alerts
+
+    async def _worker(self):
+        while True:
+            user_id = await self._queue.get()
+            self._queued.discard(user_id)
+            pending = self._pending.pop(user_id, None)
+            if not pending:
+                continue
+            alerts = self._alerts(user_id, pending)
+            if not alerts:
+                continue
+            self._next_allowed[user_id] = time.monotonic() + self.cooldown
+            try:
+                await self.deliver(user_id, alerts)
+                self.stats["notifications"] += 1
+                self.stats["alerts"] += len(alerts)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Wishlist alert for user {user_id} failed: {str(e)}")
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(DELIVERY_WORKERS)]
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await self.flush()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "watchedProducts": len(self._baseline),
+            "pendingUsers": len(self._pending),
+            "queued": self._queue.qsize(),
+        }
+
+
+def benchmark(users: int = 100_000, per_user: int = 10, products: int = 50_000) -> Dict[str, Any]:
+    """A 30% sale on every product, with `users` wishlists of `per_user` items each"""
+    import random
+    from catalog import generate_synthetic_products
+
+    store = ProductStore()
+    with store.batch():
+        for product in generate_synthetic_products(products, seed=3):
+            store[product["id"]] = product
+    product_ids = list(store.keys())
+
+    rng = random.Random(7)
+    wishlists = {
+        f"user-{i}": {"items": [{"productId": pid} for pid in rng.sample(product_ids, per_user)]}
+        for i in range(users)
+    }
+    watchers = WatcherIndex()
+    started = time.perf_counter()
+    watchers.rebuild(wishlists)
+    index_seconds = time.perf_counter() - started
+
+    delivered: Dict[str, int] = {}
+
+    async def deliver(user_id: str, alerts: List[Dict[str, Any]]):
+        delivered[user_id] = len(alerts)
+
+    async def run() -> Dict[str, Any]:
+        notifier = WishlistNotifier(store, watchers, deliver, cooldown=0)
+        notifier.seed()
+        store.on_change(notifier.on_products_changed)
+
+        started = time.perf_counter()
+        with store.batch():
+            for product_id in product_ids:
+                product = store[product_id]
+                product["price"] = round(product["price"] * 0.7, 2)
+                store[product_id] = product
+        sale_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await notifier.flush()
+        flush_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(notifier._worker()) for _ in range(DELIVERY_WORKERS)]
+        while notifier._queue.qsize():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        for worker in workers:
+            worker.cancel()
+        deliver_seconds = time.perf_counter() - started
+        return {
+            "saleWriteSecondsIncludingListener": round(sale_seconds, 3),
+            "flushSeconds": round(flush_seconds, 3),
+            "deliverySeconds": round(deliver_seconds, 3),
+            "metrics": notifier.metrics(),
+        }
+
+    result = asyncio.run(run())
+    return {
+        "users": users,
+        "products": products,
+        "wishlistLines": users * per_user,
+        "indexBuildSeconds": round(index_seconds, 3),
+        **result,
+        "notifiedUsers": len(delivered),
+        "alertsPerNotification": round(sum(delivered.values()) / max(1, len(delivered)), 2),
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000), indent=2))
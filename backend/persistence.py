@@ -0,0 +1,301 @@
+"""
+AllBlackery Snapshot & Write-Ahead Log
+
+Durable restarts for the in-memory stores (users, products, carts, ...):
+- Append-only write-ahead log of mutations, one full value per put/delete
+- Periodic copy-on-write snapshots: the worker forks and the child serializes
+  the stores while the parent keeps serving (inline fallback without fork)
+- Startup restores by memory-mapping the snapshot and replaying the log tail
+
+On-disk format (all integers little-endian):
+    snapshot.bin   b"ABSNAP01" + frames; first frame is the header
+                   {"format", "walSegment", "createdAt"}, then
+                   [store, [[key, value], ...]] chunks
+    wal-NNNNNN.log b"ABWAL001" + frames of [store, "put"|"delete", key, value]
+    frame          u32 length + u32 crc32 + msgpack payload
+
+A snapshot covers every mutation logged before segment `walSegment`; restore
+replays segments >= walSegment and stops at the first torn or corrupt frame.
+
+Configuration:
+    DATA_DIR=/var/lib/allblackery        # enables persistence
+    SNAPSHOT_INTERVAL_SECONDS=300
+    WAL_FSYNC=everysec                   # or "always"
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Iterator
+from contextlib import ExitStack
+from datetime import datetime
+import asyncio
+import mmap
+import os
+import struct
+import zlib
+
+import msgpack
+
+SNAPSHOT_MAGIC = b"ABSNAP01"
+WAL_MAGIC = b"ABWAL001"
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_CHUNK = 1024
+
+_FRAME = struct.Struct("<II")
+
+
+def _pack_frame(value: Any) -> bytes:
+    payload = msgpack.packb(value, use_bin_type=True)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_frames(buffer, offset: int) -> Iterator[Any]:
+    """Yield decoded frames from a buffer, stopping at the first torn or corrupt frame"""
+    end = len(buffer)
+    while offset + _FRAME.size <= end:
+        length, crc = _FRAME.unpack_from(buffer, offset)
+        start = offset + _FRAME.size
+        payload = buffer[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        offset = start + length
+
+
+def _map_file(path: str, magic: bytes):
+    """Memory-map a file and check its magic; returns None for empty or foreign files"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(magic):
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(magic)] != magic:
+        mapped.close()
+        return None
+    return mapped
+
+
+def write_snapshot(path: str, stores: Dict[str, Any], wal_segment: int):
+    """Serialize all stores to `path` atomically (write temp file, fsync, rename)"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(_pack_frame({
+            "format": SNAPSHOT_FORMAT,
+            "walSegment": wal_segment,
+            "createdAt": datetime.now().isoformat(),
+        }))
+        for name, store in stores.items():
+            chunk = []
+            for key, value in store.items():
+                chunk.append([key, value])
+                if len(chunk) >= SNAPSHOT_CHUNK:
+                    f.write(_pack_frame([name, chunk]))
+                    chunk = []
+            if chunk:
+                f.write(_pack_frame([name, chunk]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Persistence:
+    """Write-ahead log and snapshot manager for a set of named in-memory stores"""
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        stores: Dict[str, Any],
+        snapshot_interval: float = 300.0,
+        fsync: str = "everysec",
+        use_fork: bool = True,
+    ):
+        self.directory = directory
+        self.stores = stores
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.use_fork = use_fork and hasattr(os, "fork")
+        self.segment = 0
+        self.records_since_snapshot = 0
+        self._wal = None
+        self._child: Optional[int] = None
+        self._child_segment = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.bin")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"wal-{segment:06d}.log")
+
+    def _segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log"):
+                segments.append(int(name[4:-4]))
+        return sorted(segments)
+
+    # Write-ahead log
+    def _open_segment(self, segment: int):
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._wal.close()
+        self.segment = segment
+        self._wal = open(self._segment_path(segment), "ab")
+        self._wal.write(WAL_MAGIC)
+        self._wal.flush()
+
+    def _append(self, record: List[Any]):
+        self._wal.write(_pack_frame(record))
+        # Flushing per record means a process crash loses nothing; fsync bounds power-loss exposure
+        self._wal.flush()
+        if self.fsync == "always":
+            os.fsync(self._wal.fileno())
+        self.records_since_snapshot += 1
+
+    def log_put(self, store: str, key: str):
+        """Log the current value of stores[store][key]"""
+        if self._wal is not None:
+            self._append([store, "put", key, self.stores[store][key]])
+
+    def log_delete(self, store: str, key: str):
+        if self._wal is not None:
+            self._append([store, "delete", key, None])
+
+    def sync(self):
+        """Flush and fsync the active log segment"""
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+
+    # Restore
+    def _replay_segment(self, segment: int) -> int:
+        mapped = _map_file(self._segment_path(segment), WAL_MAGIC)
+        if mapped is None:
+            return 0
+        applied = 0
+        try:
+            for store, op, key, value in _read_frames(mapped, len(WAL_MAGIC)):
+                if op == "put":
+                    self.stores[store][key] = value
+                else:
+                    self.stores[store].pop(key, None)
+                applied += 1
+        finally:
+            mapped.close()
+        return applied
+
+    def restore(self, initialize: Callable[[], None]) -> Dict[str, Any]:
+        """Load the snapshot (or run `initialize` if there is none), replay the log, open a new segment"""
+        if not self.enabled:
+            initialize()
+            return {"snapshot": False, "walRecords": 0}
+
+        first_segment = 0
+        mapped = _map_file(self.snapshot_path, SNAPSHOT_MAGIC) if os.path.exists(self.snapshot_path) else None
+        with ExitStack() as batches:
+            # Stores with change listeners (ProductStore) notify them once for the whole restore
+            for store in self.stores.values():
+                if hasattr(store, "batch"):
+                    batches.enter_context(store.batch())
+
+            if mapped is None:
+                initialize()
+            else:
+                try:
+                    frames = _read_frames(mapped, len(SNAPSHOT_MAGIC))
+                    header = next(frames)
+                    first_segment = header["walSegment"]
+                    for store in self.stores.values():
+                        store.clear()
+                    for name, chunk in frames:
+                        store = self.stores[name]
+                        for key, value in chunk:
+                            store[key] = value
+                finally:
+                    mapped.close()
+
+            segments = self._segments()
+            applied = sum(self._replay_segment(s) for s in segments if s >= first_segment)
+
+        # Never append to a segment that may end in a torn frame
+        self._open_segment((segments[-1] if segments else first_segment) + 1)
+        self.records_since_snapshot = applied
+        return {"snapshot": mapped is not None, "walRecords": applied}
+
+    # Snapshots
+    def _drop_segments_before(self, segment: int):
+        for s in self._segments():
+            if s < segment:
+                os.remove(self._segment_path(s))
+
+    def snapshot(self) -> bool:
+        """Start a snapshot; returns False if one is already running"""
+        if not self.enabled or self._child is not None:
+            return False
+
+        # Everything logged before the new segment is covered by this snapshot
+        self._open_segment(self.segment + 1)
+        self.records_since_snapshot = 0
+        covered = self.segment
+
+        if not self.use_fork:
+            write_snapshot(self.snapshot_path, self.stores, covered)
+            self._drop_segments_before(covered)
+            return True
+
+        pid = os.fork()
+        if pid == 0:
+            # Child: the fork is a copy-on-write image of the stores at this instant
+            status = 0
+            try:
+                write_snapshot(self.snapshot_path, self.stores, covered)
+            except BaseException:
+                status = 1
+            os._exit(status)
+
+        self._child = pid
+        self._child_segment = covered
+        return True
+
+    def poll_snapshot(self) -> Optional[bool]:
+        """Reap a finished snapshot child; returns its success, or None if none finished"""
+        if self._child is None:
+            return None
+        pid, status = os.waitpid(self._child, os.WNOHANG)
+        if pid == 0:
+            return None
+        self._child = None
+        succeeded = os.waitstatus_to_exitcode(status) == 0
+        if succeeded:
+            self._drop_segments_before(self._child_segment)
+        return succeeded
+
+    async def run(self):
+        """Background loop: fsync the log every second and snapshot every interval"""
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(1.0)
+            elapsed += 1.0
+            self.sync()
+            if self.poll_snapshot() is False:
+                print("⚠️ SNAPSHOT FAILED: keeping write-ahead log segments")
+            if elapsed >= self.snapshot_interval and self.records_since_snapshot:
+                elapsed = 0.0
+                self.snapshot()
+
+    def close(self):
+        """Wait for a running snapshot and fsync the log"""
+        if self._child is not None:
+            _, status = os.waitpid(self._child, 0)
+            self._child = None
+            if os.waitstatus_to_exitcode(status) == 0:
+                self._drop_segments_before(self._child_segment)
+        if self._wal is not None:
+            self.sync()
+            self._wal.close()
+            self._wal = None
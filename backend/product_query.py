@@ -0,0 +1,190 @@
+"""
+AllBlackery Columnar Product Query Engine
+
+Vectorized evaluation of the /api/products filters over ProductStore columns:
+- category, featured and price predicates as NumPy boolean masks; price
+  filters and sorts can run on a sale-price column (promotions.PriceTable)
+- Text search only over rows that survive the column predicates
+- Top-k selection with argpartition, so only the requested page is sorted
+- Only the `limit` rows on the requested page are materialized as dicts
+- StoreSnapshot copies just the columns a query reads, so row selection can
+  run on a worker thread while the event loop keeps writing to the store
+
+Usage:
+    python product_query.py 1000000   # filter+sort+page benchmark
+"""
+
+from typing import List, Optional, Dict, Any, Tuple
+import numpy as np
+
+from product_store import ProductStore
+
+# Sort orders: column name and whether it sorts descending
+SORT_COLUMNS = {
+    "price_low": ("price", False),
+    "price_high": ("price", True),
+    "rating": ("rating", True),
+    "newest": ("created_at", True),
+}
+
+
+class StoreSnapshot:
+    """Private copies of the store columns a query reads, taken on the thread that writes the store"""
+
+    def __init__(
+        self,
+        store: ProductStore,
+        category: Optional[str] = None,
+        featured: Optional[bool] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort_by: Optional[str] = "newest",
+        prices: Optional[np.ndarray] = None,
+        **_,
+    ):
+        n = self.size = store.size
+        self.alive = store.alive[:n].copy()
+        self._codes = {category: store.category_code(category)} if category else {}
+        if category:
+            self.category = store.category[:n].copy()
+        if featured is not None:
+            self.featured = store.featured[:n].copy()
+        column = SORT_COLUMNS.get(sort_by, (None,))[0]
+        if min_price is not None or max_price is not None or column == "price":
+            self.price = (store.price if prices is None else prices)[:n].copy()
+        if column in ("rating", "created_at"):
+            setattr(self, column, getattr(store, column)[:n].copy())
+        self._records = store.records() if search else []
+
+    def category_code(self, category_id: str) -> Optional[int]:
+        return self._codes.get(category_id)
+
+    def record_at(self, row: int):
+        return self._records[row]
+
+
+def filter_mask(
+    store: ProductStore,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    prices: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Boolean mask over store rows matching all column predicates"""
+    n = store.size
+    mask = store.alive[:n].copy()
+
+    if category:
+        code = store.category_code(category)
+        if code is None:
+            mask[:] = False
+        else:
+            mask &= store.category[:n] == code
+
+    if featured is not None:
+        mask &= store.featured[:n] == featured
+
+    if min_price is not None or max_price is not None:
+        prices = (store.price if prices is None else prices)[:n]
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+
+    return mask
+
+
+def search_rows(store: ProductStore, rows: np.ndarray, search: str) -> np.ndarray:
+    """Keep rows whose name, description or brand contains the search text"""
+    search_lower = search.lower()
+    keep = []
+    for row in rows.tolist():
+        record = store.record_at(row)
+        if (search_lower in record.name.lower() or
+                search_lower in record.description.lower() or
+                search_lower in record.brand.lower()):
+            keep.append(row)
+    return np.asarray(keep, dtype=np.int64)
+
+
+def top_k(keys: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+    """Rows of the k smallest keys in (key, row) order, matching a stable full sort"""
+    if k <= 0:
+        return rows[:0]
+    if k < len(keys):
+        # Partition around the k-th key; ties at the boundary go to the lowest rows
+        kth = np.partition(keys, k - 1)[k - 1]
+        below = keys < kth
+        tied = np.flatnonzero(keys == kth)[:k - int(below.sum())]
+        selected = np.concatenate([np.flatnonzero(below), tied])
+        keys, rows = keys[selected], rows[selected]
+    return rows[np.lexsort((rows, keys))]
+
+
+def select_rows(
+    store: ProductStore,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = "newest",
+    page: int = 1,
+    limit: int = 20,
+    prices: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, int]:
+    """Filter, sort and paginate store rows, pricing by `prices` if given; returns the page's rows and the total match count"""
+    rows = np.flatnonzero(filter_mask(store, category, featured, min_price, max_price, prices))
+    if search:
+        rows = search_rows(store, rows, search)
+    total = len(rows)
+
+    start_index = (page - 1) * limit
+    end_index = start_index + limit
+
+    if sort_by in SORT_COLUMNS:
+        column, descending = SORT_COLUMNS[sort_by]
+        values = prices if column == "price" and prices is not None else getattr(store, column)
+        keys = values[rows]
+        if descending:
+            keys = -keys
+        rows = top_k(keys, rows, min(end_index, total))
+
+    return rows[start_index:end_index], total
+
+
+def query_products(store: ProductStore, **filters) -> Tuple[List[Dict[str, Any]], int]:
+    """select_rows, materializing the page as dicts; returns the page and the total match count"""
+    rows, total = select_rows(store, **filters)
+    return [store.to_dict(row) for row in rows.tolist()], total
+
+
+def benchmark(count: int, repeat: int = 20) -> Dict[str, Any]:
+    """Time a filter+sort+page query over a synthetic catalog"""
+    import time
+    from catalog import load_products, generate_synthetic_products
+
+    store = ProductStore()
+    load_products(generate_synthetic_products(count), store, {})
+
+    cases = {
+        "category+price+rating": dict(category="shoes", min_price=50, max_price=300, sort_by="rating"),
+        "featured+newest": dict(featured=True, sort_by="newest"),
+        "all+price_low+page50": dict(sort_by="price_low", page=50),
+    }
+    results = {"products": count}
+    for name, params in cases.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query_products(store, **params)
+        results[name] = f"{(time.perf_counter() - started) / repeat * 1000:.2f}ms"
+    return results
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000), indent=2))
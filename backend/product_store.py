@@ -0,0 +1,338 @@
+"""
+AllBlackery Compact Product Store
+
+Memory-efficient replacement for the dict-of-dicts products_db:
+- Slotted ProductRecord objects instead of ~20-key dicts
+- Interned enum-like strings and tuples (categoryId, brand, sizes, colors);
+  free-form per-product values (images, materials, careInstructions) are
+  stored as given, since the pool only shrinks on clear()
+- Columnar NumPy arrays for price, rating, stock and createdAt, plus
+  featured, category-code and brand-code columns for vectorized filtering
+- Dict-like API that still produces the existing product JSON shape
+- Change listeners notified once per write batch, so secondary indexes and
+  caches are rebuilt per batch rather than per product
+
+Usage:
+    python product_store.py 100000   # memory benchmark: dict layout vs compact store
+"""
+
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Callable
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# Naive timestamps are stored as microseconds since this epoch (no timezone conversion)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Initial column capacity; columns double when full
+_INITIAL_CAPACITY = 1024
+
+_COLUMNS = ("price", "rating", "stock", "created_at", "featured", "category", "brand", "alive")
+
+# Product keys in the order the API has always returned them
+PRODUCT_FIELDS = (
+    "id", "name", "description", "price", "originalPrice", "discount", "categoryId",
+    "images", "sizes", "colors", "stock", "featured", "rating", "reviews", "brand",
+    "materials", "careInstructions", "createdAt", "updatedAt",
+)
+_FIELD_SET = frozenset(PRODUCT_FIELDS)
+
+
+def timestamp_to_micros(value: str) -> int:
+    """Convert an ISO timestamp into microseconds since the epoch"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def micros_to_timestamp(value: int) -> str:
+    """Convert microseconds since the epoch back into an ISO timestamp"""
+    return (_EPOCH + timedelta(microseconds=int(value))).isoformat()
+
+
+class ProductRecord:
+    """Row-oriented product fields; numeric hot fields live in the store's columns"""
+
+    __slots__ = (
+        "row", "id", "name", "description", "originalPrice", "discount", "categoryId",
+        "images", "sizes", "colors", "featured", "reviews", "brand", "materials",
+        "careInstructions", "updatedAt", "extra",
+    )
+
+
+class ProductStore:
+    """Compact product catalog with a dict-like interface keyed by product id"""
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self._rows: Dict[str, int] = {}
+        self._records: List[Optional[ProductRecord]] = []
+        self._by_category: Dict[str, Dict[str, None]] = {}
+        self._pool: Dict[Any, Any] = {}
+        self._category_codes: Dict[str, int] = {}
+        self._brand_codes: Dict[str, int] = {}
+        self._allocate(capacity)
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._batch_depth = 0
+        self._changed: Dict[str, None] = {}
+        self.version = 0
+
+    def _allocate(self, capacity: int):
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.rating = np.zeros(capacity, dtype=np.float64)
+        self.stock = np.zeros(capacity, dtype=np.int32)
+        self.created_at = np.zeros(capacity, dtype=np.int64)
+        self.featured = np.zeros(capacity, dtype=bool)
+        self.category = np.zeros(capacity, dtype=np.int32)
+        self.brand = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        """Double column capacity, keeping existing rows"""
+        capacity = len(self.price) * 2
+        for name in _COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _intern(self, value):
+        """Share one instance of each repeated enum-like string or tuple across all products"""
+        return self._pool.setdefault(value, value)
+
+    def category_code(self, category_id: str) -> Optional[int]:
+        """Integer code of a category in the category column, or None if no product uses it"""
+        return self._category_codes.get(category_id)
+
+    def brand_code(self, brand: str) -> Optional[int]:
+        """Integer code of a brand in the brand column, or None if no product uses it"""
+        return self._brand_codes.get(brand)
+
+    # Change notification
+    def on_change(self, listener: Callable[[List[str]], None]):
+        """Register listener(product_ids), called after each write or write batch"""
+        self._listeners.append(listener)
+
+    @contextmanager
+    def batch(self):
+        """Group writes so listeners run once with every changed id when the batch ends"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush()
+
+    def _touch(self, product_id: str):
+        self._changed[product_id] = None
+        if self._batch_depth == 0:
+            self._flush()
+
+    def _flush(self):
+        if not self._changed:
+            return
+        changed = list(self._changed)
+        self._changed.clear()
+        self.version += 1
+        for listener in self._listeners:
+            listener(changed)
+
+    @property
+    def size(self) -> int:
+        """Number of allocated rows, including deleted ones"""
+        return len(self._records)
+
+    # Writes
+    def __setitem__(self, product_id: str, product: Dict[str, Any]):
+        """Insert or replace a product from its API dict"""
+        row = self._rows.get(product_id)
+        if row is None:
+            row = len(self._records)
+            if row >= len(self.price):
+                self._grow()
+            self._records.append(None)
+            self._rows[product_id] = row
+        else:
+            self._by_category[self._records[row].categoryId].pop(product_id, None)
+
+        intern = self._intern
+        record = ProductRecord()
+        record.row = row
+        record.id = product_id
+        record.name = product["name"]
+        record.description = product.get("description", "")
+        record.originalPrice = product.get("originalPrice")
+        record.discount = product.get("discount", 0)
+        record.categoryId = intern(product["categoryId"])
+        record.images = tuple(product.get("images", ()))
+        record.sizes = intern(tuple(intern(s) for s in product.get("sizes", ())))
+        record.colors = intern(tuple(intern(c) for c in product.get("colors", ())))
+        record.featured = bool(product.get("featured", False))
+        record.reviews = product.get("reviews", 0)
+        record.brand = intern(product.get("brand", ""))
+        record.materials = tuple(product.get("materials", ()))
+        record.careInstructions = product.get("careInstructions", "")
+        record.updatedAt = timestamp_to_micros(product["updatedAt"]) if product.get("updatedAt") else None
+        extra = {k: v for k, v in product.items() if k not in _FIELD_SET}
+        record.extra = extra or None
+
+        self._records[row] = record
+        self.price[row] = product["price"]
+        self.rating[row] = product.get("rating", 0.0)
+        self.stock[row] = product.get("stock", 0)
+        self.created_at[row] = timestamp_to_micros(product["createdAt"]) if product.get("createdAt") else 0
+        self.featured[row] = record.featured
+        self.category[row] = self._category_codes.setdefault(record.categoryId, len(self._category_codes))
+        self.brand[row] = self._brand_codes.setdefault(record.brand, len(self._brand_codes))
+        self.alive[row] = True
+        self._by_category.setdefault(record.categoryId, {})[product_id] = None
+        self._touch(product_id)
+
+    def __delitem__(self, product_id: str):
+        row = self._rows.pop(product_id)
+        record = self._records[row]
+        self._by_category[record.categoryId].pop(product_id, None)
+        self._records[row] = None
+        self.alive[row] = False
+        self._touch(product_id)
+
+    def update(self, products: Dict[str, Dict[str, Any]]):
+        for product_id, product in products.items():
+            self[product_id] = product
+
+    def pop(self, product_id: str, default=None):
+        if product_id not in self._rows:
+            return default
+        product = self[product_id]
+        del self[product_id]
+        return product
+
+    def clear(self):
+        with self.batch():
+            self._changed.update(dict.fromkeys(self._rows))
+            self._clear()
+
+    def _clear(self):
+        self._rows.clear()
+        self._records.clear()
+        self._by_category.clear()
+        self._pool.clear()
+        self._category_codes.clear()
+        self._brand_codes.clear()
+        self._allocate(_INITIAL_CAPACITY)
+
+    # Reads
+    def to_dict(self, row: int) -> Dict[str, Any]:
+        """Materialize a row in the existing product JSON shape"""
+        record = self._records[row]
+        product = {
+            "id": record.id,
+            "name": record.name,
+            "description": record.description,
+            "price": float(self.price[row]),
+            "originalPrice": record.originalPrice,
+            "discount": record.discount,
+            "categoryId": record.categoryId,
+            "images": list(record.images),
+            "sizes": list(record.sizes),
+            "colors": list(record.colors),
+            "stock": int(self.stock[row]),
+            "featured": record.featured,
+            "rating": float(self.rating[row]),
+            "reviews": record.reviews,
+            "brand": record.brand,
+            "materials": list(record.materials),
+            "careInstructions": record.careInstructions,
+            "createdAt": micros_to_timestamp(self.created_at[row]),
+            "updatedAt": micros_to_timestamp(record.updatedAt) if record.updatedAt is not None else None,
+        }
+        if record.extra:
+            product.update(record.extra)
+        return product
+
+    def __getitem__(self, product_id: str) -> Dict[str, Any]:
+        return self.to_dict(self._rows[product_id])
+
+    def get(self, product_id: str, default=None):
+        row = self._rows.get(product_id)
+        return default if row is None else self.to_dict(row)
+
+    def record(self, product_id: str) -> Optional[ProductRecord]:
+        row = self._rows.get(product_id)
+        return None if row is None else self._records[row]
+
+    def record_at(self, row: int) -> Optional[ProductRecord]:
+        return self._records[row]
+
+    def records(self) -> List[Optional[ProductRecord]]:
+        """Copy of the row -> record list; records are replaced on write, never mutated"""
+        return self._records[:]
+
+    def row_of(self, product_id: str) -> Optional[int]:
+        return self._rows.get(product_id)
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def keys(self):
+        return self._rows.keys()
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        for row in self._rows.values():
+            yield self.to_dict(row)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for product_id, row in self._rows.items():
+            yield product_id, self.to_dict(row)
+
+    def ids_in_category(self, category_id: str) -> Iterator[str]:
+        """Iterate product ids in a category, in insertion order"""
+        return iter(self._by_category.get(category_id, ()))
+
+    def category_counts(self) -> Dict[str, int]:
+        """Number of products per category"""
+        return {category_id: len(ids) for category_id, ids in self._by_category.items() if ids}
+
+    def price_range(self) -> Dict[str, float]:
+        """Minimum and maximum price over live products"""
+        prices = self.price[:self.size][self.alive[:self.size]]
+        if not len(prices):
+            raise ValueError("price_range() of an empty store")
+        return {"min": float(prices.min()), "max": float(prices.max())}
+
+
+def benchmark_memory(count: int) -> Dict[str, Any]:
+    """Compare traced allocations of the dict-of-dicts layout and the compact store"""
+    import gc
+    import tracemalloc
+    from catalog import load_products, generate_synthetic_products
+
+    results = {}
+    for layout in ("dict", "compact"):
+        gc.collect()
+        tracemalloc.start()
+        store = {} if layout == "dict" else ProductStore()
+        load_products(generate_synthetic_products(count), store, {})
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[layout] = {"bytes": current, "peakBytes": peak, "bytesPerProduct": current // count}
+        del store
+
+    results["savings"] = round(1 - results["compact"]["bytes"] / results["dict"]["bytes"], 3)
+    return results
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(json.dumps(benchmark_memory(count), indent=2))
@@ -0,0 +1,153 @@
+"""
+AllBlackery Sampling Profiler
+
+On-demand statistical profiler for a live worker:
+- A sampler thread reads every thread's stack with sys._current_frames at a
+  fixed interval. Nothing is installed on the hot path, so no profile means
+  no overhead.
+- Each sample is weighted by the wall time since the previous one. Samples
+  from threads waiting for work (selector poll, idle pool workers) are
+  counted separately, so the totals are CPU-ish time, not wall time.
+- Output: collapsed stacks ("thread;frame;frame count", the input format of
+  flamegraph.pl and speedscope) plus per-route and per-thread attribution.
+  Loop samples are attributed to the handler on the stack. CpuExecutor
+  samples are attributed to the route that submitted the call.
+- Limits: one profile at a time, bounded duration and interval, bounded
+  stack depth and distinct stacks. The sampler measures its own CPU time and
+  halves its rate whenever it exceeds MAX_OVERHEAD of one core.
+
+Usage:
+    profiler = SamplingProfiler(route_of=loop_monitor.route_of, executors=[cpu_executor])
+    result = await profiler.profile(seconds=10, interval=0.005)
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Iterable
+from collections import Counter
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from loop_monitor import CpuExecutor, NO_ROUTE
+
+MAX_PROFILE_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "30"))
+MIN_INTERVAL_SECONDS = 0.001
+MAX_OVERHEAD = 0.02
+MAX_DEPTH = 64
+MAX_STACKS = 20_000
+TRUNCATED = "[too many stacks]"
+
+# Innermost frames of a thread that is waiting for work rather than running it
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+}
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples all thread stacks from a background thread for a bounded time"""
+
+    def __init__(
+        self,
+        route_of: Callable[[Any], str] = lambda frame: NO_ROUTE,
+        executors: Iterable[CpuExecutor] = (),
+    ):
+        self.route_of = route_of
+        self.executors = list(executors)
+        self.running = False
+        self.stats = {"profiles": 0, "samples": 0}
+
+    async def profile(self, seconds: float, interval: float = 0.005) -> Dict[str, Any]:
+        """Sample for `seconds` (clamped to MAX_PROFILE_SECONDS); callers must check `running` first"""
+        seconds = max(0.1, min(seconds, MAX_PROFILE_SECONDS))
+        interval = max(MIN_INTERVAL_SECONDS, interval)
+        self.running = True
+        for executor in self.executors:
+            executor.route_of = self.route_of
+        try:
+            return await asyncio.to_thread(self._sample, threading.get_ident(), seconds, interval)
+        finally:
+            for executor in self.executors:
+                executor.route_of = None
+                executor.origins.clear()
+            self.running = False
+
+    def _sample(self, loop_thread: int, seconds: float, interval: float) -> Dict[str, Any]:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        routes: Counter = Counter()
+        threads: Counter = Counter()
+        idle = 0.0
+        samples = 0
+        slowdowns = 0
+
+        started = last = time.perf_counter()
+        cpu_started = time.thread_time()
+        deadline = started + seconds
+        while True:
+            time.sleep(interval)
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            weight, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            origins = {}
+            for executor in self.executors:
+                origins.update(executor.origins)
+
+            for thread, frame in sys._current_frames().items():
+                if thread == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    idle += weight
+                    continue
+                name = "event-loop" if thread == loop_thread else names.get(thread, str(thread))
+                labels = []
+                walker = frame
+                while walker is not None and len(labels) < MAX_DEPTH:
+                    labels.append(_frame_label(walker.f_code))
+                    walker = walker.f_back
+                labels.append(name)
+                key = ";".join(reversed(labels))
+                if key not in stacks and len(stacks) >= MAX_STACKS:
+                    key = f"{name};{TRUNCATED}"
+                stacks[key] += weight
+                threads[name] += weight
+                route = origins.get(thread) or (self.route_of(frame) if thread == loop_thread else NO_ROUTE)
+                routes[route] += weight
+            del frame
+            samples += 1
+
+            # Stay inside the overhead budget: halve the sampling rate when over it
+            overhead = (time.thread_time() - cpu_started) / (now - started)
+            if overhead > MAX_OVERHEAD:
+                interval *= 2
+                slowdowns += 1
+
+        elapsed = time.perf_counter() - started
+        self.stats["profiles"] += 1
+        self.stats["samples"] += samples
+        busy = sum(threads.values())
+        return {
+            "durationSeconds": round(elapsed, 3),
+            "samples": samples,
+            "finalIntervalSeconds": interval,
+            "rateReductions": slowdowns,
+            "overheadPercent": round(100 * (time.thread_time() - cpu_started) / elapsed, 3),
+            "busySeconds": round(busy, 4),
+            "idleSeconds": round(idle, 4),
+            "byRoute": {
+                route: {"seconds": round(value, 4), "percent": round(100 * value / busy, 1) if busy else 0.0}
+                for route, value in routes.most_common()
+            },
+            "byThread": {name: round(value, 4) for name, value in threads.most_common()},
+            # Collapsed stack weights in microseconds, heaviest first
+            "collapsed": [f"{stack} {round(value * 1e6)}" for stack, value in stacks.most_common()],
+        }
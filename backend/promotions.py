@@ -0,0 +1,367 @@
+"""
+AllBlackery Promotions
+
+Campaign pricing compiled into a per-product price table:
+- Rules target the whole catalog, a category, a brand or one product, take a
+  percentage or a fixed amount off, and can be limited to a startsAt/endsAt
+  window. Rules don't stack: a product gets the lowest price any live rule
+  gives it.
+- PriceTable compiles the live rules into NumPy columns aligned with the
+  ProductStore rows (sale price and winning rule per row), with one
+  vectorized pass per rule over the category/brand code columns. Listings,
+  carts and orders then price a product with an array lookup instead of
+  evaluating rules.
+- The table recompiles when rules change and when the clock passes the next
+  rule start or end (valid_until). Product writes reprice only the changed
+  rows. A recompile notifies listeners with the products whose price or
+  promotion changed, so caches drop exactly those.
+
+Usage:
+    price_table = PriceTable(products_db, promotions_db)
+    products_db.on_change(price_table.on_products_changed)
+    price_table.on_change(product_cache.invalidate)
+    price_table.decorate(product)   # sale price, originalPrice, discount, promotion
+
+Benchmark (compile and lookup over a synthetic catalog):
+    python promotions.py 1000000
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Iterable
+from datetime import datetime
+import asyncio
+import math
+import time
+import numpy as np
+
+from product_store import ProductStore
+
+SCOPES = ("all", "category", "brand", "product")
+
+# Product batches touching more than this fraction of the rows recompile the whole table
+BULK_REPRICE_FRACTION = 0.125
+# Longest the background task sleeps between checks for a rule start or end
+MAX_SLEEP_SECONDS = 1.0
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """ISO timestamp (naive means local time) as epoch seconds"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def validate_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Check a promotion's fields; raises ValueError describing the first problem"""
+    scope = rule.get("scope", "all")
+    if scope not in SCOPES:
+        raise ValueError(f"scope must be one of: {', '.join(SCOPES)}")
+    if scope != "all" and not rule.get("target"):
+        raise ValueError(f"A {scope} promotion needs a target")
+
+    percent_off, amount_off = rule.get("percentOff"), rule.get("amountOff")
+    if (percent_off is None) == (amount_off is None):
+        raise ValueError("Set exactly one of percentOff and amountOff")
+    if percent_off is not None and not 0 < percent_off <= 100:
+        raise ValueError("percentOff must be greater than 0 and at most 100")
+    if amount_off is not None and amount_off <= 0:
+        raise ValueError("amountOff must be greater than 0")
+
+    starts, ends = parse_time(rule.get("startsAt")), parse_time(rule.get("endsAt"))
+    if starts is not None and ends is not None and ends <= starts:
+        raise ValueError("endsAt must be after startsAt")
+    return rule
+
+
+class CompiledRule:
+    """A promotion with parsed times and a stable integer code for the promotion column"""
+
+    __slots__ = ("code", "id", "name", "scope", "target", "percent_off", "amount_off", "starts", "ends", "ends_at")
+
+    def __init__(self, code: int, rule: Dict[str, Any]):
+        self.code = code
+        self.id = rule["id"]
+        self.name = rule["name"]
+        self.scope = rule.get("scope", "all")
+        self.target = rule.get("target")
+        self.percent_off = rule.get("percentOff")
+        self.amount_off = rule.get("amountOff")
+        self.starts = parse_time(rule.get("startsAt"))
+        self.ends = parse_time(rule.get("endsAt"))
+        self.ends_at = rule.get("endsAt")
+
+    def live(self, now: float) -> bool:
+        return (self.starts is None or self.starts <= now) and (self.ends is None or now < self.ends)
+
+    def sale_price(self, base):
+        """Discounted price of a price or price column, rounded to cents"""
+        if self.percent_off is not None:
+            return np.round(base * (1 - self.percent_off / 100), 2)
+        return np.round(np.maximum(base - self.amount_off, 0.0), 2)
+
+    def matches(self, record) -> bool:
+        if self.scope == "all":
+            return True
+        if self.scope == "category":
+            return record.categoryId == self.target
+        if self.scope == "brand":
+            return record.brand == self.target
+        return record.id == self.target
+
+
+class PriceTable:
+    """Sale price and winning promotion per ProductStore row, compiled from the live rules"""
+
+    def __init__(self, store: ProductStore, rules: Dict[str, Dict[str, Any]]):
+        self.store = store
+        self.rules = rules
+        self.prices = np.zeros(0, dtype=np.float64)
+        # Code of the winning rule per row, -1 for full price
+        self.promotion = np.full(0, -1, dtype=np.int32)
+        # Store rows the table covers; the columns may have spare capacity past them
+        self.rows = 0
+        self._codes: Dict[str, int] = {}
+        self._by_code: Dict[int, CompiledRule] = {}
+        self._live: List[CompiledRule] = []
+        self.valid_until = math.inf
+        self.version = 0
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self.stats = {"compiles": 0, "compileSeconds": 0.0, "rowUpdates": 0, "repriced": 0}
+
+    def on_change(self, listener: Callable[[List[str]], None]):
+        """Register listener(product_ids), called with the products a recompile repriced"""
+        self._listeners.append(listener)
+
+    # Compilation
+    def _mask(self, rule: CompiledRule, n: int) -> Optional[np.ndarray]:
+        store = self.store
+        if rule.scope == "all":
+            return store.alive[:n]
+        if rule.scope == "product":
+            row = store.row_of(rule.target)
+            if row is None:
+                return None
+            mask = np.zeros(n, dtype=bool)
+            mask[row] = True
+            return mask
+        column, code = (
+            (store.category, store.category_code(rule.target)) if rule.scope == "category"
+            else (store.brand, store.brand_code(rule.target))
+        )
+        if code is None:
+            return None
+        return (column[:n] == code) & store.alive[:n]
+
+    def compile(self, now: Optional[float] = None, notify: bool = True) -> int:
+        """Recompile the whole table; returns how many products were repriced"""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        rules = []
+        for rule_id, rule in self.rules.items():
+            if not rule.get("active", True):
+                continue
+            code = self._codes.setdefault(rule_id, len(self._codes))
+            rules.append(CompiledRule(code, rule))
+        self._by_code = {rule.code: rule for rule in rules}
+        live = [rule for rule in rules if rule.live(now)]
+        # The table is correct until the next time any rule starts or ends
+        boundaries = [t for rule in rules for t in (rule.starts, rule.ends) if t is not None and t > now]
+        valid_until = min(boundaries, default=math.inf)
+
+        n = self.store.size
+        base = self.store.price[:n]
+        prices = base.copy()
+        promotion = np.full(n, -1, dtype=np.int32)
+        for rule in live:
+            mask = self._mask(rule, n)
+            if mask is None:
+                continue
+            sale = rule.sale_price(base)
+            better = mask & (sale < prices)
+            prices[better] = sale[better]
+            promotion[better] = rule.code
+
+        old_prices, old_promotion, old_rows = self.prices, self.promotion, self.rows
+        self.prices, self.promotion, self._live = prices, promotion, live
+        self.rows = n
+        self.valid_until = valid_until
+        self.version += 1
+        self.stats["compiles"] += 1
+        self.stats["compileSeconds"] += time.perf_counter() - started
+        if not notify:
+            return 0
+
+        shared = min(old_rows, n)
+        changed = (old_prices[:shared] != prices[:shared]) | (old_promotion[:shared] != promotion[:shared])
+        alive = self.store.alive[:shared]
+        product_ids = [self.store.record_at(row).id for row in np.flatnonzero(changed & alive).tolist()]
+        self.stats["repriced"] += len(product_ids)
+        if product_ids:
+            for listener in self._listeners:
+                listener(product_ids)
+        return len(product_ids)
+
+    def _reprice_row(self, row: int):
+        record = self.store.record_at(row)
+        price = self.store.price[row]
+        best, code = price, -1
+        for rule in self._live:
+            if rule.matches(record):
+                sale = rule.sale_price(price)
+                if sale < best:
+                    best, code = sale, rule.code
+        self.prices[row] = best
+        self.promotion[row] = code
+
+    # products_db listener: product caches were already invalidated for these ids
+    def on_products_changed(self, product_ids: Iterable[str]):
+        product_ids = list(product_ids)
+        n = self.store.size
+        if n < self.rows or len(product_ids) > max(64, n * BULK_REPRICE_FRACTION):
+            # Store cleared or bulk-loaded: rows moved or most of them changed
+            self.compile(notify=False)
+            return
+        if n > len(self.prices):
+            # Grow geometrically, like ProductStore columns, so appends don't copy the table each time
+            capacity = max(n, 2 * len(self.prices), 1024)
+            prices = np.zeros(capacity, dtype=np.float64)
+            promotion = np.full(capacity, -1, dtype=np.int32)
+            prices[:len(self.prices)] = self.prices
+            promotion[:len(self.promotion)] = self.promotion
+            self.prices, self.promotion = prices, promotion
+        self.rows = n
+        for product_id in product_ids:
+            row = self.store.row_of(product_id)
+            if row is not None:
+                self._reprice_row(row)
+        self.stats["rowUpdates"] += len(product_ids)
+        self.version += 1
+
+    def refresh(self) -> int:
+        """Recompile if a rule started or ended since the last compile; returns the table version"""
+        if time.time() >= self.valid_until:
+            self.compile()
+        return self.version
+
+    async def run(self):
+        """Recompile as soon as the next promotion starts or ends"""
+        while True:
+            await asyncio.sleep(max(0.0, min(self.valid_until - time.time(), MAX_SLEEP_SECONDS)))
+            self.refresh()
+
+    # Reads
+    def decorate(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply the product's promotion to a freshly materialized product dict, in place"""
+        row = self.store.row_of(product["id"])
+        if row is None or row >= self.rows or self.promotion[row] < 0:
+            return product
+        rule = self._by_code[int(self.promotion[row])]
+        # Keep the product's own compare-at price when it is above the list price
+        original = max(product.get("originalPrice") or 0, product["price"])
+        sale = float(self.prices[row])
+        product["price"] = sale
+        product["originalPrice"] = original
+        product["discount"] = round(100 * (1 - sale / original)) if original else 0
+        product["promotion"] = {"id": rule.id, "name": rule.name, "endsAt": rule.ends_at}
+        return product
+
+    def price_at(self, row: int) -> float:
+        """Sale price of a store row"""
+        return float(self.prices[row] if row < self.rows else self.store.price[row])
+
+    def price_range(self) -> Dict[str, float]:
+        """Minimum and maximum sale price over live products"""
+        n = min(self.store.size, self.rows)
+        prices = self.prices[:n][self.store.alive[:n]]
+        if not len(prices):
+            raise ValueError("price_range() of an empty store")
+        return {"min": float(prices.min()), "max": float(prices.max())}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "rules": len(self.rules),
+            "live": len(self._live),
+            "promotedProducts": int((self.promotion >= 0).sum()),
+            "validForSeconds": round(self.valid_until - time.time(), 1) if self.valid_until != math.inf else None,
+            "version": self.version,
+        }
+
+
+def benchmark(count: int = 1_000_000, lookups: int = 100_000) -> Dict[str, Any]:
+    """Compile a catalog sale plus category and brand campaigns, then time lookups and repricing"""
+    import random
+    from catalog import load_products, generate_synthetic_products
+
+    store = ProductStore()
+    load_products(generate_synthetic_products(count), store, {})
+    product_ids = list(store.keys())
+    some_product = store[product_ids[0]]
+    rules = {
+        "sitewide": {"id": "sitewide", "name": "Sitewide 10%", "scope": "all", "percentOff": 10},
+        "category": {
+            "id": "category", "name": "Category 25%", "scope": "category",
+            "target": some_product["categoryId"], "percentOff": 25,
+        },
+        "brand": {
+            "id": "brand", "name": "Brand $20 off", "scope": "brand",
+            "target": some_product["brand"], "amountOff": 20,
+        },
+        "later": {
+            "id": "later", "name": "Starts tomorrow", "scope": "all", "percentOff": 50,
+            "startsAt": datetime.fromtimestamp(time.time() + 86400).isoformat(),
+        },
+    }
+    for rule in rules.values():
+        validate_rule(rule)
+    table = PriceTable(store, rules)
+    store.on_change(table.on_products_changed)
+
+    started = time.perf_counter()
+    table.compile(notify=False)
+    compile_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    repriced = table.compile()
+    recompile_seconds = time.perf_counter() - started
+
+    rng = random.Random(5)
+    sample = [store.to_dict(store.row_of(pid)) for pid in rng.sample(product_ids, min(lookups, count))]
+    started = time.perf_counter()
+    for product in sample:
+        table.decorate(product)
+    lookup_us = (time.perf_counter() - started) * 1e6 / len(sample)
+
+    # Evaluating the same rules per product, as a per-request engine would
+    records = [store.record(product["id"]) for product in sample]
+    live = table._live
+    started = time.perf_counter()
+    for record in records:
+        price = float(store.price[record.row])
+        best = price
+        for rule in live:
+            if rule.matches(record):
+                best = min(best, float(rule.sale_price(price)))
+    per_product_rules_us = (time.perf_counter() - started) * 1e6 / len(records)
+
+    started = time.perf_counter()
+    product = store[product_ids[1]]
+    product["price"] = product["price"] + 1
+    store[product_ids[1]] = product
+    single_write_us = (time.perf_counter() - started) * 1e6
+
+    return {
+        "products": count,
+        "rules": len(rules),
+        "compileMs": round(compile_seconds * 1000, 2),
+        "unchangedRecompileMs": round(recompile_seconds * 1000, 2),
+        "repricedOnRecompile": repriced,
+        "decorateMicroseconds": round(lookup_us, 2),
+        "evaluateRulesMicroseconds": round(per_product_rules_us, 2),
+        "singleProductWriteMicroseconds": round(single_write_us, 1),
+        "metrics": table.metrics(),
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000), indent=2))
@@ -44,39 +44,161 @@ Third-party Integration Setup:
 Tech Stack: FastAPI + MongoDB + JWT + Stripe + SendGrid + Twilio
 """
 
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, BackgroundTasks
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, BackgroundTasks, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from contextlib import asynccontextmanager
+import asyncio
 import json
-import uuid
 import random
 import string
 import hashlib
 import base64
 from datetime import datetime, timedelta
 from io import BytesIO
+from itertools import islice
 import os
 
-# Mock imports - replace with actual imports when using real services
-# from google.oauth2 import id_token
-# from google.auth.transport import requests as google_requests
-# import stripe
-# from twilio.rest import Client as TwilioClient
-# from sendgrid import SendGridAPIClient
-# from sendgrid.helpers.mail import Mail
-# from reportlab.pdfgen import canvas
-# from reportlab.lib.pagesizes import letter
+from catalog import (
+    BATCH_SIZE, load_products, load_catalog_file, generate_synthetic_products,
+    read_ndjson_batches, apply_product_batch, apply_category_batch
+)
+from product_store import ProductStore
+from product_query import StoreSnapshot, query_products, select_rows
+from persistence import Persistence
+from idempotency import IdempotencyStore, request_fingerprint
+from ids import new_id, order_number, first_id_at
+import images
+from events import EventHub
+from exports import OrderIndex, EXPORT_FORMATS, stream_orders
+from analytics import SalesRollup, GROUPINGS
+from membership import MembershipIndex, WatcherIndex, MAX_MEMBERSHIP_IDS
+from notifications import WishlistNotifier
+from promotions import PriceTable, validate_rule
+from compression import ResponseCompressor
+from locks import KeyedLocks
+from autocomplete import Autocomplete
+from cache import ReadThroughCache, RedisTier
+from loop_monitor import LoopMonitor, CpuExecutor
+from profiler import SamplingProfiler
+from http_clients import IntegrationClients, IntegrationError
+from google_keys import GoogleKeyring, GoogleTokenVerifier, InvalidGoogleToken, certs_fetcher
+from webhooks import (
+    WebhookProcessor, SignatureError, verify_signature, payment_intent_id,
+    PAYMENT_EVENT_STATUS, ALLOWED_TRANSITIONS
+)
+
+# Optional SDKs (jose, brotli, redis) are lazy proxies in integrations; their
+# import times are reported in the startup profile
+from integrations import IMPORT_TIMINGS
+
+# Startup profile (seconds per phase) and readiness state
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", "2.0"))
+startup_profile: Dict[str, float] = {}
+readiness = {"ready": False, "phase": "starting", "error": None}
+
+async def warm_up():
+    """Restore state (or load the catalog) off the event loop, mark the worker ready, then run persistence"""
+    try:
+        readiness["phase"] = "loading_catalog"
+        started = time.perf_counter()
+        restored = await asyncio.to_thread(persistence.restore, initialize_catalog)
+        price_table.compile(notify=False)
+        for order in orders_db.values():
+            index_order(order)
+        for user in users_db.values():
+            index_user(user)
+        wishlist_watchers.rebuild(wishlists_db)
+        wishlist_notifier.seed()
+        sales_rollup.backfill(orders_db.values())
+        seed_stock_levels()
+        startup_profile["catalog"] = time.perf_counter() - started
+        if restored["snapshot"] or restored["walRecords"]:
+            print(f"💾 STATE RESTORED: snapshot={restored['snapshot']}, {restored['walRecords']} log records replayed")
+        readiness.update(ready=True, phase="ready")
+    except Exception as e:
+        readiness.update(phase="failed", error=str(e))
+        print(f"❌ STARTUP FAILED: {str(e)}")
+        return
+    
+    if persistence.enabled:
+        await persistence.run()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start catalog warm-up in the background so liveness probes answer immediately"""
+    warm_up_task = asyncio.create_task(warm_up())
+    webhook_task = asyncio.create_task(webhook_processor.run())
+    cache_task = asyncio.create_task(product_cache.run())
+    alerts_task = asyncio.create_task(wishlist_notifier.run())
+    pricing_task = asyncio.create_task(price_table.run())
+    keyring_task = None if MOCK_INTEGRATIONS else asyncio.create_task(google_keyring.run())
+    loop_monitor.register_routes(app.routes)
+    monitor_task = asyncio.create_task(loop_monitor.run())
+    yield
+    warm_up_task.cancel()
+    webhook_task.cancel()
+    cache_task.cancel()
+    monitor_task.cancel()
+    alerts_task.cancel()
+    pricing_task.cancel()
+    if keyring_task is not None:
+        keyring_task.cancel()
+    persistence.close()
+    images.shutdown()
+    cpu_executor.shutdown()
+    await integration_clients.aclose()
+
+# Event-loop lag watchdog, and the thread pool that keeps CPU-heavy work off the loop
+loop_monitor = LoopMonitor()
+cpu_executor = CpuExecutor()
+profiler = SamplingProfiler(route_of=loop_monitor.route_of, executors=[cpu_executor])
 
 # Create FastAPI app
 app = FastAPI(
     title="AllBlackery API",
     description="Premium Black Fashion E-commerce Platform API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Public catalog reads are cached compressed per catalog version
+CACHEABLE_PREFIXES = ("/api/products", "/api/categories")
+response_compressor = ResponseCompressor()
+
+# Bumped on category writes; product writes bump products_db.version, promotions bump price_table.version
+catalog_versions = {"categories": 0}
+
+@app.middleware("http")
+async def compress_responses(request: Request, call_next):
+    """gzip/brotli responses; catalog GETs come from the precompressed cache until the catalog changes"""
+    cache_version = None
+    if (
+        request.method == "GET"
+        and request.url.path.startswith(CACHEABLE_PREFIXES)
+        and "authorization" not in request.headers
+    ):
+        cache_version = (products_db.version, price_table.refresh(), catalog_versions["categories"])
+    return await response_compressor.handle(request, call_next, cache_version)
+
+# Registered after compression, so it runs first
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    """Reject API traffic with 503 until catalog warm-up has finished"""
+    if not readiness["ready"] and request.url.path.startswith("/api/"):
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "1"},
+            content={"success": False, "message": "Service is starting up", "data": None}
+        )
+    return await call_next(request)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -88,24 +210,100 @@ app.add_middleware(
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Mock data storage (replace with MongoDB in production)
 users_db = {}
-products_db = {}
+products_db = ProductStore()
 categories_db = {}
 carts_db = {}
 wishlists_db = {}
 orders_db = {}
+promotions_db = {}
 otps_db = {}
 sessions_db = {}
 
+# Snapshot + write-ahead log of the stores above; disabled unless DATA_DIR is set
+persistence = Persistence(
+    os.environ.get("DATA_DIR"),
+    {
+        "users": users_db,
+        "products": products_db,
+        "categories": categories_db,
+        "carts": carts_db,
+        "wishlists": wishlists_db,
+        "orders": orders_db,
+        "promotions": promotions_db
+    },
+    snapshot_interval=float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", "300")),
+    fsync=os.environ.get("WAL_FSYNC", "everysec")
+)
+
+# Secondary indexes: Stripe payment intent id -> order id, and all order ids in creation order
+orders_by_payment_intent: Dict[str, str] = {}
+order_index = OrderIndex()
+
+# Email -> user id, so sign-in and registration don't scan every user
+users_by_email: Dict[str, str] = {}
+
+def index_user(user: Dict[str, Any]):
+    users_by_email[user['email']] = user['id']
+
+def find_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+    user_id = users_by_email.get(email)
+    return users_db.get(user_id) if user_id is not None else None
+
+def index_order(order: Dict[str, Any]):
+    """Add an order to the secondary order indexes"""
+    order_index.add(order["id"])
+    # The first order to claim a payment intent keeps it; place_order refuses reused intents
+    if order.get("paymentIntentId"):
+        orders_by_payment_intent.setdefault(order["paymentIntentId"], order["id"])
+
+# Read-through product cache for single-product lookups (product pages, carts, suggestions, orders)
+async def fetch_products_for_cache(product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Cache loader: the catalog fetch a cache miss falls through to, at current promotional prices"""
+    return {
+        product_id: price_table.decorate(products_db[product_id])
+        for product_id in product_ids if product_id in products_db
+    }
+
+product_cache = ReadThroughCache(
+    fetch_products_for_cache,
+    max_bytes=int(os.environ.get("PRODUCT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    shared=RedisTier(os.environ["CACHE_REDIS_URL"]) if os.environ.get("CACHE_REDIS_URL") else None
+)
+products_db.on_change(product_cache.invalidate)
+
+# Active promotions compiled into a sale price per product; recompiles drop repriced products from the cache
+price_table = PriceTable(products_db, promotions_db)
+products_db.on_change(price_table.on_products_changed)
+price_table.on_change(product_cache.invalidate)
+
+# Per-user product membership of carts and wishlists, for product grid badges
+cart_membership = MembershipIndex(carts_db)
+wishlist_membership = MembershipIndex(wishlists_db)
+
+# Product id -> users wishlisting it, for price-drop and restock alerts
+wishlist_watchers = WatcherIndex()
+
+# Search-box completions over product names, brands and categories, kept current on every catalog write
+product_autocomplete = Autocomplete(lambda category_id: categories_db.get(category_id, {}).get("name", category_id))
+products_db.on_change(lambda product_ids: product_autocomplete.apply(product_ids, products_db))
+
+# Sales rollups for the admin dashboard, fed by order creation and status changes
+def product_category(product_id: str) -> Optional[str]:
+    record = products_db.record(product_id)
+    return record.categoryId if record else None
+
+sales_rollup = SalesRollup(product_category)
+
 # Initialize mock data
 def initialize_mock_data():
     """Initialize mock products and categories"""
-    global products_db, categories_db
-    
     # Mock categories
-    categories_db = {
+    categories_db.clear()
+    categories_db.update({
         "jackets": {
             "id": "jackets",
             "name": "Jackets",
@@ -141,10 +339,11 @@ def initialize_mock_data():
             "image": "https://images.unsplash.com/photo-1611652022419-a9419f74343d?w=400",
             "productCount": 15
         }
-    }
+    })
     
     # Mock products
-    products_db = {
+    products_db.clear()
+    products_db.update({
         "1": {
             "id": "1",
             "name": "Premium Black Leather Jacket",
@@ -266,10 +465,31 @@ def initialize_mock_data():
             "createdAt": datetime.now().isoformat(),
             "updatedAt": datetime.now().isoformat()
         }
-    }
+    })
 
-# Initialize data
-initialize_mock_data()
+def initialize_catalog():
+    """Load the catalog from CATALOG_PATH or SYNTHETIC_CATALOG_SIZE, falling back to mock data"""
+    initialize_mock_data()
+    
+    catalog_path = os.environ.get("CATALOG_PATH")
+    synthetic_size = int(os.environ.get("SYNTHETIC_CATALOG_SIZE", "0"))
+    if not catalog_path and not synthetic_size:
+        return
+    
+    # Bulk catalogs replace the mock products and recompute real category counts
+    products_db.clear()
+    for category in categories_db.values():
+        category["productCount"] = 0
+    
+    with products_db.batch():
+        if catalog_path:
+            report = load_catalog_file(catalog_path, products_db, categories_db)
+        else:
+            report = load_products(generate_synthetic_products(synthetic_size), products_db, categories_db)
+    
+    print(f"📦 CATALOG LOADED: {report.loaded} products, {report.rejected} rejected in {report.seconds:.2f}s")
+    for error in report.errors[:10]:
+        print(f"Row {error['row']}: {error['error']}")
 
 # Pydantic Models
 class APIResponse(BaseModel):
@@ -318,6 +538,16 @@ class CreateOrder(BaseModel):
     paymentMethod: str
     paymentIntentId: Optional[str] = None
 
+class PromotionRule(BaseModel):
+    name: str
+    scope: str = "all"  # all, category, brand, product
+    target: Optional[str] = None
+    percentOff: Optional[float] = None
+    amountOff: Optional[float] = None
+    startsAt: Optional[str] = None
+    endsAt: Optional[str] = None
+    active: bool = True
+
 # Mock helper functions
 def generate_jwt_token(user_id: str) -> str:
     """Mock JWT token generation"""
@@ -366,6 +596,7 @@ def mock_google_verify_token(token: str) -> Dict[str, Any]:
     return {
         "sub": "mock_google_user_id",
         "email": "user@gmail.com",
+        "email_verified": True,
         "name": "John Doe",
         "picture": "https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=100"
     }
@@ -378,9 +609,10 @@ def mock_stripe_create_payment_intent(amount: int, currency: str = "usd") -> Dic
     # TODO: Replace with actual Stripe implementation
     # stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
     # intent = stripe.PaymentIntent.create(amount=amount, currency=currency)
+    intent_id = new_id()
     return {
-        "id": f"pi_mock_{random.randint(10000, 99999)}",
-        "client_secret": f"pi_mock_{random.randint(10000, 99999)}_secret",
+        "id": f"pi_mock_{intent_id}",
+        "client_secret": f"pi_mock_{intent_id}_secret",
         "amount": amount,
         "currency": currency,
         "status": "requires_payment_method"
@@ -398,28 +630,215 @@ def mock_generate_invoice_pdf(order_data: Dict[str, Any]) -> bytes:
     # return buffer.getvalue()
     return b"Mock PDF Invoice Content"
 
-def get_product_suggestions(product_ids: List[str]) -> List[Dict[str, Any]]:
+# Provider calls: mocks by default, real APIs through pooled clients with MOCK_INTEGRATIONS=false
+MOCK_INTEGRATIONS = os.environ.get("MOCK_INTEGRATIONS", "true").lower() != "false"
+integration_clients = IntegrationClients()
+
+# Google's signing keys are refreshed in the background (see lifespan); sign-ins verify locally
+google_keyring = GoogleKeyring(certs_fetcher(integration_clients["google"]))
+google_verifier = GoogleTokenVerifier(google_keyring, os.environ.get("GOOGLE_CLIENT_ID"))
+
+async def send_email(to_email: str, subject: str, content: str) -> bool:
+    """Send an HTML email through SendGrid; failures are logged, not raised"""
+    if MOCK_INTEGRATIONS:
+        mock_send_email(to_email, subject, content)
+        return True
+    try:
+        response = await integration_clients["sendgrid"].request(
+            "POST", "/v3/mail/send",
+            headers={"Authorization": f"Bearer {os.environ.get('SENDGRID_API_KEY', '')}"},
+            json={
+                "personalizations": [{"to": [{"email": to_email}]}],
+                "from": {"email": os.environ.get("SENDGRID_FROM_EMAIL", "noreply@allblackery.com")},
+                "subject": subject,
+                "content": [{"type": "text/html", "value": content}]
+            }
+        )
+        response.raise_for_status()
+        return True
+    except Exception as e:
+        print(f"⚠️ Email to {to_email} failed: {str(e)}")
+        return False
+
+async def send_sms(phone: str, message: str) -> bool:
+    """Send an SMS through Twilio; failures are logged, not raised"""
+    if MOCK_INTEGRATIONS:
+        mock_send_sms(phone, message)
+        return True
+    try:
+        account_sid = os.environ.get("TWILIO_ACCOUNT_SID", "")
+        response = await integration_clients["twilio"].request(
+            "POST", f"/2010-04-01/Accounts/{account_sid}/Messages.json",
+            auth=(account_sid, os.environ.get("TWILIO_AUTH_TOKEN", "")),
+            data={"To": phone, "From": os.environ.get("TWILIO_PHONE_NUMBER", ""), "Body": message}
+        )
+        response.raise_for_status()
+        return True
+    except Exception as e:
+        print(f"⚠️ SMS to {phone} failed: {str(e)}")
+        return False
+
+async def verify_google_token(token: str) -> Dict[str, Any]:
+    """Google ID token claims, verified offline against the cached keyring; raises 401 for invalid tokens"""
+    if MOCK_INTEGRATIONS:
+        return mock_google_verify_token(token)
+    try:
+        return await google_verifier.verify(token)
+    except InvalidGoogleToken as e:
+        raise HTTPException(status_code=401, detail=f"Invalid Google token: {str(e)}")
+
+async def create_stripe_payment_intent(amount: int, currency: str, idempotency_key: str) -> Dict[str, Any]:
+    """Create a Stripe PaymentIntent; the Idempotency-Key makes the client's retries safe"""
+    if MOCK_INTEGRATIONS:
+        return mock_stripe_create_payment_intent(amount, currency)
+    response = await integration_clients["stripe"].request(
+        "POST", "/v1/payment_intents",
+        headers={
+            "Authorization": f"Bearer {os.environ.get('STRIPE_SECRET_KEY', '')}",
+            "Idempotency-Key": idempotency_key
+        },
+        data={"amount": amount, "currency": currency}
+    )
+    if response.status_code != 200:
+        # Error bodies from Stripe are JSON, but a proxy in front of it may answer with HTML
+        try:
+            message = response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = f"HTTP {response.status_code}"
+        raise IntegrationError("stripe", message)
+    intent = response.json()
+    return {key: intent.get(key) for key in ("id", "client_secret", "amount", "currency", "status")}
+
+async def get_product_suggestions(product_ids: List[str]) -> List[Dict[str, Any]]:
     """Generate product suggestions based on cart/wishlist items"""
-    suggestions = []
-    for product_id in product_ids:
-        if product_id in products_db:
-            product = products_db[product_id]
-            category_id = product['categoryId']
-            
-            # Find similar products in same category
-            similar_products = [
-                p for p in products_db.values() 
-                if p['categoryId'] == category_id and p['id'] != product_id
-            ]
-            
-            suggestions.extend(similar_products[:2])  # Add 2 suggestions per product
+    suggestion_ids = []
+    for product_id, product in (await product_cache.get_many(product_ids)).items():
+        category_id = product['categoryId']
+        
+        # Find similar products in same category
+        similar_ids = islice(
+            (pid for pid in products_db.ids_in_category(category_id) if pid != product_id), 2
+        )
+        
+        suggestion_ids.extend(similar_ids)  # Add 2 suggestions per product
+    
+    suggestions = await product_cache.get_many(suggestion_ids[:5])
+    return [suggestions[pid] for pid in suggestion_ids[:5] if pid in suggestions]  # Return top 5 suggestions
+
+def apply_payment_event(event: Dict[str, Any]) -> bool:
+    """Apply a Stripe event's status transition; returns False if its order doesn't exist yet"""
+    status = PAYMENT_EVENT_STATUS.get(event.get("type"))
+    if status is None:
+        return True
     
-    return suggestions[:5]  # Return top 5 suggestions
+    order_id = orders_by_payment_intent.get(payment_intent_id(event))
+    if order_id is None:
+        return False
+    
+    order = orders_db[order_id]
+    if status in ALLOWED_TRANSITIONS.get(order["status"], ()):
+        sales_rollup.transition(order, order["status"], status)
+        order["status"] = status
+        order["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("orders", order_id)
+        publish_order_status(order)
+    return True
+
+webhook_processor = WebhookProcessor(apply_payment_event)
+
+# Server-Sent Events: per-user push of order status and stock alerts for wishlisted products
+event_hub = EventHub(
+    buffer_size=int(os.environ.get("EVENT_BUFFER_SIZE", "100")),
+    heartbeat=float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+)
+
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "5"))
+
+# Products currently out of stock or low on stock -> "out" / "low"
+stock_levels: Dict[str, str] = {}
+
+def stock_level(stock: int) -> str:
+    if stock <= 0:
+        return "out"
+    return "low" if stock <= LOW_STOCK_THRESHOLD else "in"
+
+def seed_stock_levels():
+    """Record which products start out of stock or low, so later changes only alert on crossings"""
+    stock_levels.clear()
+    for product_id in products_db.keys():
+        level = stock_level(int(products_db.stock[products_db.row_of(product_id)]))
+        if level != "in":
+            stock_levels[product_id] = level
+
+def publish_stock_alerts(product_ids: List[str]):
+    """Alert the users watching a product when it goes out of stock, low, or back in stock"""
+    if not readiness["ready"]:
+        return
+    for product_id in product_ids:
+        row = products_db.row_of(product_id)
+        if row is None:
+            stock_levels.pop(product_id, None)
+            continue
+        stock = int(products_db.stock[row])
+        level = stock_level(stock)
+        if level == stock_levels.get(product_id, "in"):
+            continue
+        if level == "in":
+            del stock_levels[product_id]
+        else:
+            stock_levels[product_id] = level
+        watchers = wishlist_watchers.watchers(product_id)
+        if watchers:
+            event_hub.publish_many(watchers, "product.stock", {"productId": product_id, "stock": stock, "level": level})
+
+products_db.on_change(publish_stock_alerts)
+
+async def deliver_wishlist_alerts(user_id: str, alerts: List[Dict[str, Any]]):
+    """Push wishlist alerts to open event streams; email users who aren't connected"""
+    if event_hub.publish(user_id, "wishlist.alert", {"alerts": alerts}):
+        return
+    user = users_db.get(user_id)
+    if not user:
+        return
+    lines = "".join(
+        f"<li>{alert['name']}: "
+        + (f"now ${alert['price']:.2f} (was ${alert['oldPrice']:.2f})" if alert['priceDrop'] else "back in stock")
+        + "</li>"
+        for alert in alerts
+    )
+    email_content = f"""
+    <h2>Good news from your wishlist</h2>
+    <p>Hello {user['firstName']},</p>
+    <ul>{lines}</ul>
+    <p>Thank you for shopping with AllBlackery!</p>
+    """
+    await send_email(user['email'], "Wishlist Update - AllBlackery", email_content)
+
+# Batches price/stock changes of wishlisted products into one alert per user
+# Alerts compare sale prices, so a promotion starting counts as a price drop
+wishlist_notifier = WishlistNotifier(
+    products_db, wishlist_watchers, deliver_wishlist_alerts, price_at=price_table.price_at
+)
+products_db.on_change(wishlist_notifier.on_products_changed)
+price_table.on_change(wishlist_notifier.on_products_changed)
+
+def publish_order_status(order: Dict[str, Any]):
+    event_hub.publish(order["userId"], "order.status", {
+        "orderId": order["id"],
+        "orderNumber": order["orderNumber"],
+        "status": order["status"],
+        "updatedAt": order["updatedAt"]
+    })
+
+# Stored responses for Idempotency-Key retries of orders and payment intents
+idempotency_store = IdempotencyStore(
+    ttl=float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600))),
+    max_entries=int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "100000"))
+)
 
 # Authentication dependency
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
-    token = credentials.credentials
+def user_from_token(token: str) -> dict:
+    """Resolve a bearer token to its user"""
     # Mock user verification
     if token.startswith("mock_jwt_token_"):
         user_id = token.split("_")[3]
@@ -427,6 +846,22 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             return users_db[user_id]
     raise HTTPException(status_code=401, detail="Invalid token")
 
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current authenticated user"""
+    return user_from_token(credentials.credentials)
+
+def get_current_admin(current_user: dict = Depends(get_current_user)):
+    """Get current authenticated user, requiring the admin role"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# Per-user locks: cart, wishlist and order handlers read-modify-write the user's documents
+user_locks = KeyedLocks()
+
+def current_user_key(kwargs: Dict[str, Any]) -> str:
+    return kwargs["current_user"]["id"]
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -459,17 +894,32 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe with the startup-time profile"""
+    content = {
+        "status": readiness["phase"],
+        "ready": readiness["ready"],
+        "error": readiness["error"],
+        "startup": {
+            "budgetSeconds": STARTUP_BUDGET_SECONDS,
+            "phases": {name: round(seconds, 4) for name, seconds in startup_profile.items()},
+            "lazyImports": {name: round(seconds, 4) for name, seconds in IMPORT_TIMINGS.items()}
+        }
+    }
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=content)
+
 # Authentication Endpoints
 @app.post("/api/auth/register")
 async def register(user_data: UserRegister):
     """Register new user with OTP verification"""
     try:
         # Check if user exists
-        if any(u['email'] == user_data.email for u in users_db.values()):
+        if find_user_by_email(user_data.email):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Generate user ID and OTP
-        user_id = str(uuid.uuid4())
+        user_id = new_id()
         otp = generate_otp()
         
         # Store user (unverified)
@@ -485,6 +935,8 @@ async def register(user_data: UserRegister):
             "createdAt": datetime.now().isoformat(),
             "updatedAt": datetime.now().isoformat()
         }
+        index_user(users_db[user_id])
+        persistence.log_put("users", user_id)
         
         # Store OTP
         otps_db[user_data.email] = {
@@ -500,7 +952,7 @@ async def register(user_data: UserRegister):
         <p>This code will expire in 10 minutes.</p>
         <p>Enter this code to complete your registration.</p>
         """
-        mock_send_email(user_data.email, "Verify Your AllBlackery Account", email_content)
+        await send_email(user_data.email, "Verify Your AllBlackery Account", email_content)
         
         return {
             "success": True,
@@ -536,11 +988,11 @@ async def verify_otp(otp_data: VerifyOTP):
         
         # Mark user as verified if registration OTP
         if stored_otp['type'] == 'registration':
-            for user in users_db.values():
-                if user['email'] == email:
-                    user['isVerified'] = True
-                    user['updatedAt'] = datetime.now().isoformat()
-                    break
+            user = find_user_by_email(email)
+            if user:
+                user['isVerified'] = True
+                user['updatedAt'] = datetime.now().isoformat()
+                persistence.log_put("users", user['id'])
         
         # Clean up OTP
         del otps_db[email]
@@ -560,11 +1012,7 @@ async def login(login_data: UserLogin):
     """Login user with email and password"""
     try:
         # Find user
-        user = None
-        for u in users_db.values():
-            if u['email'] == login_data.email:
-                user = u
-                break
+        user = find_user_by_email(login_data.email)
         
         if not user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -588,7 +1036,7 @@ async def login(login_data: UserLogin):
         <p>Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
         <p>If this wasn't you, please contact support immediately.</p>
         """
-        mock_send_email(user['email'], "Login Notification - AllBlackery", email_content)
+        await send_email(user['email'], "Login Notification - AllBlackery", email_content)
         
         return {
             "success": True,
@@ -616,22 +1064,20 @@ async def google_auth(auth_data: GoogleAuth):
     """Google OAuth authentication"""
     try:
         # Verify Google token
-        user_info = mock_google_verify_token(auth_data.token)
+        user_info = await verify_google_token(auth_data.token)
         
         # Check if user exists
-        user = None
-        for u in users_db.values():
-            if u['email'] == user_info['email']:
-                user = u
-                break
+        user = find_user_by_email(user_info['email'])
         
         # Create user if doesn't exist
         if not user:
-            user_id = str(uuid.uuid4())
+            user_id = new_id()
+            # The name claim is optional; fall back to the email's local part
+            names = (user_info.get('name') or user_info['email'].split('@')[0]).split()
             user = {
                 "id": user_id,
-                "firstName": user_info['name'].split()[0],
-                "lastName": user_info['name'].split()[-1] if len(user_info['name'].split()) > 1 else "",
+                "firstName": names[0] if names else "",
+                "lastName": names[-1] if len(names) > 1 else "",
                 "email": user_info['email'],
                 "password": "",  # No password for Google users
                 "phone": None,
@@ -643,6 +1089,8 @@ async def google_auth(auth_data: GoogleAuth):
                 "updatedAt": datetime.now().isoformat()
             }
             users_db[user_id] = user
+            index_user(user)
+            persistence.log_put("users", user_id)
         
         # Generate token
         token = generate_jwt_token(user['id'])
@@ -666,6 +1114,8 @@ async def google_auth(auth_data: GoogleAuth):
         }
     except HTTPException:
         raise
+    except IntegrationError as e:
+        raise HTTPException(status_code=503, detail=f"Google sign-in unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Google authentication failed: {str(e)}")
 
@@ -674,11 +1124,7 @@ async def forgot_password(forgot_data: ForgotPassword):
     """Send OTP for password reset"""
     try:
         # Find user
-        user = None
-        for u in users_db.values():
-            if u['email'] == forgot_data.email:
-                user = u
-                break
+        user = find_user_by_email(forgot_data.email)
         
         if not user:
             # Don't reveal if email exists or not
@@ -707,7 +1153,7 @@ async def forgot_password(forgot_data: ForgotPassword):
         <p>This code will expire in 10 minutes.</p>
         <p>If you didn't request this, please ignore this email.</p>
         """
-        mock_send_email(forgot_data.email, "Password Reset - AllBlackery", email_content)
+        await send_email(forgot_data.email, "Password Reset - AllBlackery", email_content)
         
         return {
             "success": True,
@@ -740,11 +1186,7 @@ async def reset_password(reset_data: ResetPassword):
             raise HTTPException(status_code=400, detail="Invalid reset code")
         
         # Find and update user password
-        user = None
-        for u in users_db.values():
-            if u['email'] == email:
-                user = u
-                break
+        user = find_user_by_email(email)
         
         if not user:
             raise HTTPException(status_code=400, detail="User not found")
@@ -752,6 +1194,7 @@ async def reset_password(reset_data: ResetPassword):
         # Update password
         user['password'] = hash_password(reset_data.newPassword)
         user['updatedAt'] = datetime.now().isoformat()
+        persistence.log_put("users", user['id'])
         
         # Clean up OTP
         del otps_db[email]
@@ -764,7 +1207,7 @@ async def reset_password(reset_data: ResetPassword):
         <p>Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
         <p>If you didn't make this change, please contact support immediately.</p>
         """
-        mock_send_email(email, "Password Reset Confirmation - AllBlackery", email_content)
+        await send_email(email, "Password Reset Confirmation - AllBlackery", email_content)
         
         return {
             "success": True,
@@ -777,6 +1220,20 @@ async def reset_password(reset_data: ResetPassword):
         raise HTTPException(status_code=500, detail=f"Password reset failed: {str(e)}")
 
 # Products API with advanced features
+async def run_products_query(**filters) -> Tuple[List[Dict[str, Any]], int]:
+    """Select rows in the CPU executor over a snapshot of the columns, so a catalog scan doesn't stall other requests"""
+    price_table.refresh()
+    version = (products_db.version, price_table.version)
+    # Copied on the loop: the worker thread never sees a write in progress
+    snapshot = StoreSnapshot(products_db, prices=price_table.prices, **filters)
+    rows, total = await cpu_executor.run(select_rows, snapshot, **filters)
+    if (products_db.version, price_table.version) == version:
+        products = [products_db.to_dict(row) for row in rows.tolist()]
+    else:
+        # The catalog or its prices changed mid-query: redo it against the live store
+        products, total = query_products(products_db, prices=price_table.prices, **filters)
+    return [price_table.decorate(product) for product in products], total
+
 @app.get("/api/products")
 async def get_products(
     category: Optional[str] = None,
@@ -790,44 +1247,17 @@ async def get_products(
 ):
     """Get products with advanced filtering and sorting"""
     try:
-        filtered_products = list(products_db.values())
-        
-        # Apply filters
-        if category:
-            filtered_products = [p for p in filtered_products if p["categoryId"] == category]
-        
-        if featured is not None:
-            filtered_products = [p for p in filtered_products if p["featured"] == featured]
-        
-        if search:
-            search_lower = search.lower()
-            filtered_products = [
-                p for p in filtered_products 
-                if (search_lower in p["name"].lower() or 
-                    search_lower in p["description"].lower() or
-                    search_lower in p["brand"].lower())
-            ]
-        
-        if min_price is not None:
-            filtered_products = [p for p in filtered_products if p["price"] >= min_price]
-        
-        if max_price is not None:
-            filtered_products = [p for p in filtered_products if p["price"] <= max_price]
-        
-        # Apply sorting
-        if sort_by == "price_low":
-            filtered_products.sort(key=lambda x: x["price"])
-        elif sort_by == "price_high":
-            filtered_products.sort(key=lambda x: x["price"], reverse=True)
-        elif sort_by == "rating":
-            filtered_products.sort(key=lambda x: x["rating"], reverse=True)
-        elif sort_by == "newest":
-            filtered_products.sort(key=lambda x: x["createdAt"], reverse=True)
-        
-        # Pagination
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        paginated_products = filtered_products[start_index:end_index]
+        # Filter, sort and paginate over the catalog columns; only the page is materialized
+        paginated_products, total = await run_products_query(
+            category=category,
+            featured=featured,
+            search=search,
+            min_price=min_price,
+            max_price=max_price,
+            sort_by=sort_by,
+            page=page,
+            limit=limit
+        )
         
         return {
             "success": True,
@@ -837,35 +1267,43 @@ async def get_products(
                 "pagination": {
                     "page": page,
                     "limit": limit,
-                    "total": len(filtered_products),
-                    "pages": (len(filtered_products) + limit - 1) // limit
+                    "total": total,
+                    "pages": (total + limit - 1) // limit
                 },
                 "filters": {
                     "categories": list(categories_db.keys()),
-                    "priceRange": {
-                        "min": min([p["price"] for p in products_db.values()]),
-                        "max": max([p["price"] for p in products_db.values()])
-                    }
+                    "priceRange": price_table.price_range()
                 }
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve products: {str(e)}")
 
+@app.get("/api/products/autocomplete")
+async def autocomplete_products(q: str, limit: int = 8):
+    """Ranked, typo-tolerant completions for the search box"""
+    try:
+        return {
+            "success": True,
+            "message": "Suggestions retrieved successfully",
+            "data": {"query": q, "suggestions": product_autocomplete.complete(q, limit)}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve suggestions: {str(e)}")
+
 @app.get("/api/products/{product_id}")
 async def get_product(product_id: str):
     """Get single product by ID with recommendations"""
     try:
-        if product_id not in products_db:
+        product = await product_cache.get(product_id)
+        if product is None:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        product = products_db[product_id]
-        
         # Get related products
-        related_products = [
-            p for p in products_db.values() 
-            if p["categoryId"] == product["categoryId"] and p["id"] != product_id
-        ][:4]  # Get 4 related products
+        related_ids = islice(
+            (pid for pid in products_db.ids_in_category(product["categoryId"]) if pid != product_id), 4
+        )  # Get 4 related products
+        related_products = list((await product_cache.get_many(related_ids)).values())
         
         return {
             "success": True,
@@ -887,7 +1325,7 @@ async def get_product_suggestions_endpoint(product_id: str):
         if product_id not in products_db:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        suggestions = get_product_suggestions([product_id])
+        suggestions = await get_product_suggestions([product_id])
         
         return {
             "success": True,
@@ -899,6 +1337,203 @@ async def get_product_suggestions_endpoint(product_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get suggestions: {str(e)}")
 
+# Product images API
+@app.post("/api/products/{product_id}/images")
+async def upload_product_image(
+    product_id: str,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Upload a product image and generate its thumbnail/card/zoom WebP variants"""
+    try:
+        if product_id not in products_db:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        digest = await images.save_upload(file)
+        variants = await images.create_variants(digest)
+        
+        # The product may have changed while the variants were rendering
+        if product_id not in products_db:
+            raise HTTPException(status_code=404, detail="Product not found")
+        product = products_db[product_id]
+        image_variants = product.get("imageVariants", [])
+        if variants not in image_variants:
+            product["images"].append(variants["zoom"])
+            product["imageVariants"] = image_variants + [variants]
+            product["updatedAt"] = datetime.now().isoformat()
+            products_db[product_id] = product
+            persistence.log_put("products", product_id)
+        
+        return {
+            "success": True,
+            "message": "Image uploaded successfully",
+            "data": {"productId": product_id, "digest": digest, "variants": variants}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+
+@app.get("/api/images/{digest}/{variant}.webp")
+async def get_image_variant(digest: str, variant: str):
+    """Serve an image variant with long-lived cache headers"""
+    path = images.variant_path(digest, variant)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": images.VARIANT_CACHE_CONTROL, "ETag": f'"{digest}-{variant}"'}
+    )
+
+# Admin bulk catalog writes
+def refresh_category_counts():
+    """Recompute every category's productCount from the catalog's category index"""
+    counts = products_db.category_counts()
+    for category_id, category in categories_db.items():
+        count = counts.get(category_id, 0)
+        if category["productCount"] != count:
+            category["productCount"] = count
+            persistence.log_put("categories", category_id)
+
+def bulk_response(kind: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {
+        "success": "error" not in summary,
+        "message": f"Bulk {kind} write completed",
+        "data": {"summary": summary, "results": results}
+    }
+
+@app.post("/api/admin/products/bulk")
+async def bulk_write_products(request: Request, current_user: dict = Depends(get_current_admin)):
+    """Bulk upsert/delete products from a streamed NDJSON body; lines are products or {"op": "delete", "id": ...}"""
+    # Each batch is one catalog write, so indexes and aggregates update once per batch
+    try:
+        results = []
+        async for batch in read_ndjson_batches(request.stream(), BATCH_SIZE):
+            batch_results = apply_product_batch(batch, products_db, categories_db)
+            for result in batch_results:
+                if result["status"] in ("created", "updated"):
+                    persistence.log_put("products", result["id"])
+                elif result["status"] == "deleted":
+                    persistence.log_delete("products", result["id"])
+            refresh_category_counts()
+            results.extend(batch_results)
+        
+        return bulk_response("product", results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk product write failed: {str(e)}")
+
+@app.post("/api/admin/categories/bulk")
+async def bulk_write_categories(request: Request, current_user: dict = Depends(get_current_admin)):
+    """Bulk upsert/delete categories from a streamed NDJSON body, one line per category"""
+    try:
+        results = []
+        async for batch in read_ndjson_batches(request.stream(), BATCH_SIZE):
+            names = {category_id: category["name"] for category_id, category in categories_db.items()}
+            batch_results = apply_category_batch(batch, categories_db, products_db)
+            catalog_versions["categories"] += 1
+            # Autocomplete's category terms hold the name the products were indexed under
+            product_autocomplete.reindex_categories(
+                {result["id"] for result in batch_results if result["status"] in ("created", "updated")
+                 and names.get(result["id"]) != categories_db.get(result["id"], {}).get("name")},
+                products_db
+            )
+            for result in batch_results:
+                if result["status"] in ("created", "updated"):
+                    persistence.log_put("categories", result["id"])
+                elif result["status"] == "deleted":
+                    persistence.log_delete("categories", result["id"])
+            results.extend(batch_results)
+        
+        return bulk_response("category", results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk category write failed: {str(e)}")
+
+# Admin promotions
+def save_promotion(promotion_id: str, rule_data: PromotionRule, created_at: str) -> Dict[str, Any]:
+    """Validate and store a promotion, then reprice the catalog"""
+    try:
+        rule = validate_rule({"id": promotion_id, **rule_data.model_dump()})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    rule.update(createdAt=created_at, updatedAt=datetime.now().isoformat())
+    promotions_db[promotion_id] = rule
+    persistence.log_put("promotions", promotion_id)
+    return {"promotion": rule, "repriced": price_table.compile()}
+
+@app.get("/api/admin/promotions")
+async def get_promotions(current_user: dict = Depends(get_current_admin)):
+    """List promotions"""
+    try:
+        return {
+            "success": True,
+            "message": "Promotions retrieved successfully",
+            "data": {"promotions": list(promotions_db.values())}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve promotions: {str(e)}")
+
+@app.post("/api/admin/promotions")
+async def create_promotion(rule_data: PromotionRule, current_user: dict = Depends(get_current_admin)):
+    """Create a promotion; prices update as soon as it is live"""
+    try:
+        now = datetime.now().isoformat()
+        return {
+            "success": True,
+            "message": "Promotion created successfully",
+            "data": save_promotion(new_id(), rule_data, now)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create promotion: {str(e)}")
+
+@app.put("/api/admin/promotions/{promotion_id}")
+async def update_promotion(promotion_id: str, rule_data: PromotionRule, current_user: dict = Depends(get_current_admin)):
+    """Replace a promotion's rule"""
+    try:
+        if promotion_id not in promotions_db:
+            raise HTTPException(status_code=404, detail="Promotion not found")
+        
+        return {
+            "success": True,
+            "message": "Promotion updated successfully",
+            "data": save_promotion(promotion_id, rule_data, promotions_db[promotion_id]["createdAt"])
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update promotion: {str(e)}")
+
+@app.delete("/api/admin/promotions/{promotion_id}")
+async def delete_promotion(promotion_id: str, current_user: dict = Depends(get_current_admin)):
+    """Delete a promotion and restore the prices it set"""
+    try:
+        if promotion_id not in promotions_db:
+            raise HTTPException(status_code=404, detail="Promotion not found")
+        
+        del promotions_db[promotion_id]
+        persistence.log_delete("promotions", promotion_id)
+        
+        return {
+            "success": True,
+            "message": "Promotion deleted successfully",
+            "data": {"repriced": price_table.compile()}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete promotion: {str(e)}")
+
 # Categories API
 @app.get("/api/categories")
 async def get_categories():
@@ -913,36 +1548,42 @@ async def get_categories():
         raise HTTPException(status_code=500, detail=f"Failed to retrieve categories: {str(e)}")
 
 # Cart API with CRUD operations
+async def load_cart(user_id: str) -> Dict[str, Any]:
+    """User's cart (or an empty one) with totals recalculated from current prices"""
+    cart = carts_db.get(user_id, {
+        "id": new_id(),
+        "userId": user_id,
+        "items": [],
+        "totalAmount": 0,
+        "totalItems": 0,
+        "createdAt": datetime.now().isoformat(),
+        "updatedAt": datetime.now().isoformat()
+    })
+    
+    # Calculate totals
+    total_amount = 0
+    total_items = 0
+    price_table.refresh()
+    products = await product_cache.get_many(item["productId"] for item in cart["items"])
+    for item in cart["items"]:
+        if item["productId"] in products:
+            product = products[item["productId"]]
+            total_amount += product["price"] * item["quantity"]
+            total_items += item["quantity"]
+    
+    cart["totalAmount"] = total_amount
+    cart["totalItems"] = total_items
+    return cart
+
 @app.get("/api/cart")
 async def get_cart(current_user: dict = Depends(get_current_user)):
     """Get user's cart"""
     try:
-        user_id = current_user['id']
-        cart = carts_db.get(user_id, {
-            "id": str(uuid.uuid4()),
-            "userId": user_id,
-            "items": [],
-            "totalAmount": 0,
-            "totalItems": 0,
-            "createdAt": datetime.now().isoformat(),
-            "updatedAt": datetime.now().isoformat()
-        })
-        
-        # Calculate totals
-        total_amount = 0
-        total_items = 0
-        for item in cart["items"]:
-            if item["productId"] in products_db:
-                product = products_db[item["productId"]]
-                total_amount += product["price"] * item["quantity"]
-                total_items += item["quantity"]
-        
-        cart["totalAmount"] = total_amount
-        cart["totalItems"] = total_items
+        cart = await load_cart(current_user['id'])
         
         # Get product suggestions
         product_ids = [item["productId"] for item in cart["items"]]
-        suggestions = get_product_suggestions(product_ids) if product_ids else []
+        suggestions = await get_product_suggestions(product_ids) if product_ids else []
         
         return {
             "success": True,
@@ -958,6 +1599,7 @@ async def get_cart(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve cart: {str(e)}")
 
 @app.post("/api/cart/add")
+@user_locks.serialize(current_user_key)
 async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_current_user)):
     """Add item to cart"""
     try:
@@ -970,7 +1612,7 @@ async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_curr
         # Get or create cart
         if user_id not in carts_db:
             carts_db[user_id] = {
-                "id": str(uuid.uuid4()),
+                "id": new_id(),
                 "userId": user_id,
                 "items": [],
                 "totalAmount": 0,
@@ -993,8 +1635,9 @@ async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_curr
         if existing_item:
             existing_item["quantity"] += item_data.quantity
         else:
+            cart_membership.add(user_id, item_data.productId)
             cart["items"].append({
-                "id": str(uuid.uuid4()),
+                "id": new_id(),
                 "productId": item_data.productId,
                 "quantity": item_data.quantity,
                 "size": item_data.size,
@@ -1003,6 +1646,7 @@ async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_curr
             })
         
         cart["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("carts", user_id)
         
         return {
             "success": True,
@@ -1015,6 +1659,7 @@ async def add_to_cart(item_data: CartItem, current_user: dict = Depends(get_curr
         raise HTTPException(status_code=500, detail=f"Failed to add to cart: {str(e)}")
 
 @app.put("/api/cart/update/{item_id}")
+@user_locks.serialize(current_user_key)
 async def update_cart_item(item_id: str, quantity: int, current_user: dict = Depends(get_current_user)):
     """Update cart item quantity"""
     try:
@@ -1030,6 +1675,7 @@ async def update_cart_item(item_id: str, quantity: int, current_user: dict = Dep
         for item in cart["items"]:
             if item["id"] == item_id:
                 if quantity <= 0:
+                    cart_membership.remove(user_id, item["productId"])
                     cart["items"].remove(item)
                 else:
                     item["quantity"] = quantity
@@ -1040,6 +1686,7 @@ async def update_cart_item(item_id: str, quantity: int, current_user: dict = Dep
             raise HTTPException(status_code=404, detail="Item not found in cart")
         
         cart["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("carts", user_id)
         
         return {
             "success": True,
@@ -1052,6 +1699,7 @@ async def update_cart_item(item_id: str, quantity: int, current_user: dict = Dep
         raise HTTPException(status_code=500, detail=f"Failed to update cart: {str(e)}")
 
 @app.delete("/api/cart/remove/{item_id}")
+@user_locks.serialize(current_user_key)
 async def remove_from_cart(item_id: str, current_user: dict = Depends(get_current_user)):
     """Remove item from cart"""
     try:
@@ -1066,6 +1714,7 @@ async def remove_from_cart(item_id: str, current_user: dict = Depends(get_curren
         item_found = False
         for item in cart["items"]:
             if item["id"] == item_id:
+                cart_membership.remove(user_id, item["productId"])
                 cart["items"].remove(item)
                 item_found = True
                 break
@@ -1074,6 +1723,7 @@ async def remove_from_cart(item_id: str, current_user: dict = Depends(get_curren
             raise HTTPException(status_code=404, detail="Item not found in cart")
         
         cart["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("carts", user_id)
         
         return {
             "success": True,
@@ -1086,6 +1736,7 @@ async def remove_from_cart(item_id: str, current_user: dict = Depends(get_curren
         raise HTTPException(status_code=500, detail=f"Failed to remove from cart: {str(e)}")
 
 @app.delete("/api/cart/clear")
+@user_locks.serialize(current_user_key)
 async def clear_cart(current_user: dict = Depends(get_current_user)):
     """Clear all items from cart"""
     try:
@@ -1096,7 +1747,9 @@ async def clear_cart(current_user: dict = Depends(get_current_user)):
         
         cart = carts_db[user_id]
         cart["items"] = []
+        cart_membership.invalidate(user_id)
         cart["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("carts", user_id)
         
         return {
             "success": True,
@@ -1109,23 +1762,26 @@ async def clear_cart(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to clear cart: {str(e)}")
 
 # Wishlist API with CRUD operations
+def load_wishlist(user_id: str) -> Dict[str, Any]:
+    """User's wishlist, or an empty one"""
+    return wishlists_db.get(user_id, {
+        "id": new_id(),
+        "userId": user_id,
+        "items": [],
+        "totalItems": 0,
+        "createdAt": datetime.now().isoformat(),
+        "updatedAt": datetime.now().isoformat()
+    })
+
 @app.get("/api/wishlist")
 async def get_wishlist(current_user: dict = Depends(get_current_user)):
     """Get user's wishlist"""
     try:
-        user_id = current_user['id']
-        wishlist = wishlists_db.get(user_id, {
-            "id": str(uuid.uuid4()),
-            "userId": user_id,
-            "items": [],
-            "totalItems": 0,
-            "createdAt": datetime.now().isoformat(),
-            "updatedAt": datetime.now().isoformat()
-        })
+        wishlist = load_wishlist(current_user['id'])
         
         # Get product suggestions
         product_ids = [item["productId"] for item in wishlist["items"]]
-        suggestions = get_product_suggestions(product_ids) if product_ids else []
+        suggestions = await get_product_suggestions(product_ids) if product_ids else []
         
         return {
             "success": True,
@@ -1141,6 +1797,7 @@ async def get_wishlist(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve wishlist: {str(e)}")
 
 @app.post("/api/wishlist/add")
+@user_locks.serialize(current_user_key)
 async def add_to_wishlist(item_data: WishlistItem, current_user: dict = Depends(get_current_user)):
     """Add item to wishlist"""
     try:
@@ -1153,7 +1810,7 @@ async def add_to_wishlist(item_data: WishlistItem, current_user: dict = Depends(
         # Get or create wishlist
         if user_id not in wishlists_db:
             wishlists_db[user_id] = {
-                "id": str(uuid.uuid4()),
+                "id": new_id(),
                 "userId": user_id,
                 "items": [],
                 "totalItems": 0,
@@ -1163,24 +1820,25 @@ async def add_to_wishlist(item_data: WishlistItem, current_user: dict = Depends(
         
         wishlist = wishlists_db[user_id]
         
-        # Check if item already exists
-        existing_item = any(item["productId"] == item_data.productId for item in wishlist["items"])
-        
-        if existing_item:
+        if wishlist_membership.contains(user_id, item_data.productId):
             return {
                 "success": True,
                 "message": "Item already in wishlist",
                 "data": {"wishlistId": wishlist["id"], "itemId": item_data.productId}
             }
         
+        wishlist_membership.add(user_id, item_data.productId)
+        wishlist_watchers.add(user_id, item_data.productId)
+        wishlist_notifier.watch(item_data.productId)
         wishlist["items"].append({
-            "id": str(uuid.uuid4()),
+            "id": new_id(),
             "productId": item_data.productId,
             "addedAt": datetime.now().isoformat()
         })
         
         wishlist["totalItems"] = len(wishlist["items"])
         wishlist["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("wishlists", user_id)
         
         return {
             "success": True,
@@ -1193,6 +1851,7 @@ async def add_to_wishlist(item_data: WishlistItem, current_user: dict = Depends(
         raise HTTPException(status_code=500, detail=f"Failed to add to wishlist: {str(e)}")
 
 @app.delete("/api/wishlist/remove/{item_id}")
+@user_locks.serialize(current_user_key)
 async def remove_from_wishlist(item_id: str, current_user: dict = Depends(get_current_user)):
     """Remove item from wishlist"""
     try:
@@ -1207,6 +1866,8 @@ async def remove_from_wishlist(item_id: str, current_user: dict = Depends(get_cu
         item_found = False
         for item in wishlist["items"]:
             if item["id"] == item_id:
+                wishlist_membership.remove(user_id, item["productId"])
+                wishlist_watchers.remove(user_id, item["productId"])
                 wishlist["items"].remove(item)
                 item_found = True
                 break
@@ -1216,6 +1877,7 @@ async def remove_from_wishlist(item_id: str, current_user: dict = Depends(get_cu
         
         wishlist["totalItems"] = len(wishlist["items"])
         wishlist["updatedAt"] = datetime.now().isoformat()
+        persistence.log_put("wishlists", user_id)
         
         return {
             "success": True,
@@ -1227,6 +1889,30 @@ async def remove_from_wishlist(item_id: str, current_user: dict = Depends(get_cu
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to remove from wishlist: {str(e)}")
 
+# Batch cart/wishlist membership for product grids
+@app.get("/api/membership")
+async def get_membership(ids: str, current_user: dict = Depends(get_current_user)):
+    """Whether each of a comma-separated list of product ids is in the user's wishlist and cart"""
+    try:
+        product_ids = [product_id for product_id in ids.split(",") if product_id]
+        if len(product_ids) > MAX_MEMBERSHIP_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_MEMBERSHIP_IDS} product ids per request")
+        
+        user_id = current_user['id']
+        return {
+            "success": True,
+            "message": "Membership retrieved successfully",
+            "data": {
+                "productIds": product_ids,
+                "inWishlist": wishlist_membership.lookup(user_id, product_ids),
+                "inCart": cart_membership.lookup(user_id, product_ids)
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve membership: {str(e)}")
+
 # Orders API with invoice generation
 @app.get("/api/orders")
 async def get_orders(current_user: dict = Depends(get_current_user)):
@@ -1235,6 +1921,9 @@ async def get_orders(current_user: dict = Depends(get_current_user)):
         user_id = current_user['id']
         user_orders = [order for order in orders_db.values() if order["userId"] == user_id]
         
+        # Ids are time-sortable, so the newest orders come first in id order
+        user_orders.sort(key=lambda order: order["id"], reverse=True)
+        
         return {
             "success": True,
             "message": "Orders retrieved successfully",
@@ -1253,20 +1942,21 @@ async def get_orders(current_user: dict = Depends(get_current_user)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve orders: {str(e)}")
 
-@app.post("/api/orders")
-async def create_order(order_data: CreateOrder, current_user: dict = Depends(get_current_user)):
+async def place_order(order_data: CreateOrder, current_user: dict):
     """Create new order"""
     try:
         user_id = current_user['id']
-        order_id = str(uuid.uuid4())
+        order_id = new_id()
         
         # Calculate total amount
         total_amount = 0
         order_items = []
         
+        price_table.refresh()
+        products = await product_cache.get_many(item.productId for item in order_data.items)
         for item in order_data.items:
-            if item.productId in products_db:
-                product = products_db[item.productId]
+            if item.productId in products:
+                product = products[item.productId]
                 item_total = product["price"] * item.quantity
                 total_amount += item_total
                 
@@ -1274,17 +1964,23 @@ async def create_order(order_data: CreateOrder, current_user: dict = Depends(get
                     "productId": item.productId,
                     "productName": product["name"],
                     "productPrice": product["price"],
+                    "promotionId": (product.get("promotion") or {}).get("id"),
+                    "categoryId": product["categoryId"],
                     "quantity": item.quantity,
                     "size": item.size,
                     "color": item.color,
                     "itemTotal": item_total
                 })
         
+        # Payment intent ids come from the client: one that already pays for an order can't be reattached
+        if order_data.paymentIntentId and order_data.paymentIntentId in orders_by_payment_intent:
+            raise HTTPException(status_code=400, detail="Payment intent is already attached to an order")
+        
         # Create order
         order = {
             "id": order_id,
             "userId": user_id,
-            "orderNumber": f"AB{random.randint(100000, 999999)}",
+            "orderNumber": order_number(order_id),
             "items": order_items,
             "totalAmount": total_amount,
             "shippingAddress": order_data.shippingAddress,
@@ -1296,13 +1992,19 @@ async def create_order(order_data: CreateOrder, current_user: dict = Depends(get
         }
         
         orders_db[order_id] = order
+        persistence.log_put("orders", order_id)
+        index_order(order)
+        sales_rollup.record(order)
+        
+        # Apply payment webhooks that arrived before the order existed
+        webhook_processor.release(order["paymentIntentId"])
+        publish_order_status(order)
         
         # Clear cart after successful order
         if user_id in carts_db:
             carts_db[user_id]["items"] = []
-        
-        # Generate invoice
-        invoice_pdf = mock_generate_invoice_pdf(order)
+            cart_membership.invalidate(user_id)
+            persistence.log_put("carts", user_id)
         
         # Send order confirmation email
         user = current_user
@@ -1316,7 +2018,7 @@ async def create_order(order_data: CreateOrder, current_user: dict = Depends(get
         <p>We'll send you another email when your order ships.</p>
         <p>Thank you for shopping with AllBlackery!</p>
         """
-        mock_send_email(user['email'], f"Order Confirmation - {order['orderNumber']}", email_content)
+        await send_email(user['email'], f"Order Confirmation - {order['orderNumber']}", email_content)
         
         return {
             "success": True,
@@ -1333,6 +2035,27 @@ async def create_order(order_data: CreateOrder, current_user: dict = Depends(get
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
+@app.post("/api/orders")
+@user_locks.serialize(current_user_key)
+async def create_order(
+    order_data: CreateOrder,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Create new order; retries with the same Idempotency-Key replay the first result"""
+    if not idempotency_key:
+        return await place_order(order_data, current_user)
+    
+    result, replayed = await idempotency_store.execute(
+        f"orders:{current_user['id']}:{idempotency_key}",
+        request_fingerprint(order_data.model_dump()),
+        lambda: place_order(order_data, current_user)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 @app.get("/api/orders/{order_id}")
 async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
     """Get specific order details"""
@@ -1374,7 +2097,7 @@ async def get_order_invoice(order_id: str, current_user: dict = Depends(get_curr
             raise HTTPException(status_code=403, detail="Access denied")
         
         # Generate PDF invoice
-        invoice_pdf = mock_generate_invoice_pdf(order)
+        await cpu_executor.run(mock_generate_invoice_pdf, order)
         
         return {
             "success": True,
@@ -1391,51 +2114,281 @@ async def get_order_invoice(order_id: str, current_user: dict = Depends(get_curr
         raise HTTPException(status_code=500, detail=f"Failed to generate invoice: {str(e)}")
 
 # Payments API with Stripe integration
-@app.post("/api/payments/create-intent")
-async def create_payment_intent(amount: float, currency: str = "usd"):
+async def create_intent(amount: float, currency: str, idempotency_key: Optional[str] = None):
     """Create Stripe payment intent"""
     try:
         # Convert amount to cents for Stripe
         amount_cents = int(amount * 100)
         
         # Create payment intent
-        intent = mock_stripe_create_payment_intent(amount_cents, currency)
+        intent = await create_stripe_payment_intent(amount_cents, currency, idempotency_key or new_id())
         
         return {
             "success": True,
             "message": "Payment intent created successfully",
             "data": intent
         }
+    except IntegrationError as e:
+        raise HTTPException(status_code=503, detail=f"Payment provider unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create payment intent: {str(e)}")
 
+@app.post("/api/payments/create-intent")
+async def create_payment_intent(
+    response: Response,
+    amount: float,
+    currency: str = "usd",
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Create Stripe payment intent; the same user's retries with the same Idempotency-Key return the same intent"""
+    if not idempotency_key:
+        return await create_intent(amount, currency)
+    
+    # Scoped per user: a stored intent (and its client_secret) is only replayed to the caller who created it
+    result, replayed = await idempotency_store.execute(
+        f"payment_intents:{current_user['id']}:{idempotency_key}",
+        request_fingerprint({"amount": amount, "currency": currency}),
+        lambda: create_intent(amount, currency, idempotency_key)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 @app.post("/api/payments/webhook")
-async def stripe_webhook(request: dict):
-    """Handle Stripe webhook events"""
+async def stripe_webhook(request: Request):
+    """Verify, deduplicate and queue Stripe webhook events; acknowledged before processing"""
     try:
-        print("🔔 MOCK STRIPE WEBHOOK RECEIVED")
-        print(f"Event: {request}")
-        
-        # TODO: Replace with actual Stripe webhook handling
-        # event = stripe.Webhook.construct_event(
-        #     payload, sig_header, os.environ.get('STRIPE_WEBHOOK_SECRET')
-        # )
-        
-        # Handle the event
-        event_type = request.get('type', 'payment_intent.succeeded')
-        
-        if event_type == 'payment_intent.succeeded':
-            payment_intent = request.get('data', {}).get('object', {})
-            print(f"Payment succeeded: {payment_intent.get('id')}")
-            
-            # Update order status
-            # Find order by payment intent ID and update status
-            
-        return {"success": True}
+        payload = await request.body()
+        
+        # Unsigned events are only accepted with mock integrations and no configured secret
+        webhook_secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
+        if webhook_secret:
+            verify_signature(payload, request.headers.get("Stripe-Signature"), webhook_secret)
+        elif not MOCK_INTEGRATIONS:
+            raise HTTPException(status_code=400, detail="Webhook signing secret is not configured")
+        
+        event = json.loads(payload)
+        result = webhook_processor.submit(event)
+        if result == "busy":
+            # Stripe retries non-2xx responses, so back-pressure loses nothing
+            raise HTTPException(status_code=503, detail="Webhook queue full")
+        
+        return {"success": True, "duplicate": result == "duplicate"}
+    except HTTPException:
+        raise
+    except SignatureError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid signature: {str(e)}")
     except Exception as e:
         print(f"Webhook error: {str(e)}")
         raise HTTPException(status_code=400, detail="Webhook error")
 
+# Page bootstrap
+@app.get("/api/bootstrap")
+async def get_bootstrap(
+    featured_limit: int = 8,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Featured products, categories and, when signed in, cart and wishlist in one response"""
+    try:
+        current_user = user_from_token(credentials.credentials) if credentials else None
+
+        # Sections reference products by id; each product is serialized once in the shared map
+        products: Dict[str, Dict[str, Any]] = {}
+
+        def collect(section_products: List[Dict[str, Any]]) -> List[str]:
+            for product in section_products:
+                products.setdefault(product["id"], product)
+            return [product["id"] for product in section_products]
+
+        async def collect_ids(product_ids: List[str]) -> List[str]:
+            for product_id, product in (await product_cache.get_many(product_ids)).items():
+                products.setdefault(product_id, product)
+            return product_ids
+
+        async def featured_section():
+            featured, _ = await run_products_query(featured=True, sort_by="rating", page=1, limit=featured_limit)
+            return collect(featured)
+
+        async def categories_section():
+            return list(categories_db.values())
+
+        async def cart_section():
+            if current_user is None:
+                return None
+            cart = await load_cart(current_user["id"])
+            product_ids = [item["productId"] for item in cart["items"]]
+            await collect_ids(product_ids)
+            suggestions = await get_product_suggestions(product_ids) if product_ids else []
+            return {"cart": cart, "suggestions": collect(suggestions)}
+
+        async def wishlist_section():
+            if current_user is None:
+                return None
+            wishlist = load_wishlist(current_user["id"])
+            product_ids = [item["productId"] for item in wishlist["items"]]
+            await collect_ids(product_ids)
+            suggestions = await get_product_suggestions(product_ids) if product_ids else []
+            return {"wishlist": wishlist, "suggestions": collect(suggestions)}
+
+        featured, categories, cart, wishlist = await asyncio.gather(
+            featured_section(), categories_section(), cart_section(), wishlist_section()
+        )
+
+        return {
+            "success": True,
+            "message": "Bootstrap data retrieved successfully",
+            "data": {
+                "featured": featured,
+                "categories": categories,
+                "cart": cart,
+                "wishlist": wishlist,
+                "products": products
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve bootstrap data: {str(e)}")
+
+# Admin runtime metrics
+@app.get("/api/admin/metrics")
+async def get_runtime_metrics(stacks: bool = False, current_user: dict = Depends(get_current_admin)):
+    """Counters from the in-process subsystems; stacks=true includes the captured stack of each recent loop stall"""
+    return {
+        "success": True,
+        "message": "Metrics retrieved successfully",
+        "data": {
+            "userLocks": user_locks.metrics(),
+            "compression": response_compressor.stats,
+            "webhooks": {**webhook_processor.stats, "queued": webhook_processor.queue.qsize()},
+            "idempotency": {**idempotency_store.stats, "keys": len(idempotency_store)},
+            "events": event_hub.stats,
+            "productCache": product_cache.metrics(),
+            "eventLoop": loop_monitor.metrics(include_stacks=stacks),
+            "cpuExecutor": cpu_executor.metrics(),
+            "integrations": integration_clients.metrics(),
+            "googleAuth": google_verifier.metrics(),
+            "wishlistAlerts": wishlist_notifier.metrics(),
+            "promotions": price_table.metrics()
+        }
+    }
+
+# Admin on-demand profiling
+@app.post("/api/admin/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    format: str = "json",
+    current_user: dict = Depends(get_current_admin)
+):
+    """Sample this worker's stacks for `seconds`; format=collapsed returns flamegraph.pl/speedscope input"""
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail=f"Unsupported profile format: {format}")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    
+    print(f"🔬 PROFILING WORKER {os.getpid()} for {seconds}s")
+    result = await profiler.profile(seconds, interval_ms / 1000)
+    
+    if format == "collapsed":
+        return Response(content="\n".join(result["collapsed"]) + "\n", media_type="text/plain")
+    return {
+        "success": True,
+        "message": "Profile captured successfully",
+        "data": {**result, "pid": os.getpid()}
+    }
+
+# Admin order export
+@app.get("/api/admin/orders/export")
+async def export_orders(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    after: Optional[str] = None,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Stream orders as NDJSON or CSV; status is comma-separated, naive dates are local time like createdAt, after resumes past an order id"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    
+    statuses = set(status.split(",")) if status else None
+    start = first_id_at(created_from) if created_from else None
+    stop = first_id_at(created_to) if created_to else None
+    filename = f"orders-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    
+    return StreamingResponse(
+        stream_orders(orders_db, order_index, format, statuses, start, stop, after),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Admin sales analytics
+@app.get("/api/admin/analytics/sales")
+async def get_sales_analytics(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    group_by: str = "day",
+    limit: int = 20,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Revenue, units, orders and AOV for days start..end (YYYY-MM-DD), grouped by day, category or product"""
+    try:
+        if group_by not in GROUPINGS:
+            raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUPINGS)}")
+        for day in (start, end):
+            if day is not None:
+                datetime.strptime(day, "%Y-%m-%d")
+        
+        return {
+            "success": True,
+            "message": "Sales analytics retrieved successfully",
+            "data": sales_rollup.query(start, end, group_by, limit)
+        }
+    except HTTPException:
+        raise
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be formatted as YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve sales analytics: {str(e)}")
+
+@app.post("/api/admin/analytics/backfill")
+async def backfill_sales_analytics(current_user: dict = Depends(get_current_admin)):
+    """Rebuild the sales rollups from every existing order, scanning a snapshot of them in the CPU executor"""
+    try:
+        counted = await sales_rollup.rebuild(orders_db.values(), cpu_executor.run)
+        return {
+            "success": True,
+            "message": "Sales analytics rebuilt",
+            "data": {"ordersCounted": counted, "days": len(sales_rollup.days)}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild sales analytics: {str(e)}")
+
+# Events API
+@app.get("/api/events/stream")
+async def event_stream(
+    request: Request,
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Server-Sent Events stream of the user's order status changes and stock alerts for wishlisted products"""
+    # EventSource can't set headers, so browsers pass the token as a query parameter
+    if credentials is None and token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    current_user = user_from_token(credentials.credentials if credentials else token)
+
+    subscription = event_hub.subscribe(current_user["id"])
+    if subscription is None:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+
+    return StreamingResponse(
+        event_hub.stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
@@ -1459,6 +2412,11 @@ async def internal_error_handler(request, exc):
         }
     )
 
+# Module import time is the cold-start cost paid before the worker can accept connections
+startup_profile["import"] = time.perf_counter() - _import_started
+if startup_profile["import"] > STARTUP_BUDGET_SECONDS:
+    print(f"⚠️ STARTUP BUDGET EXCEEDED: import took {startup_profile['import']:.2f}s (budget {STARTUP_BUDGET_SECONDS:.2f}s)")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
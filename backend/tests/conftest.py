@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Tests import the backend modules the way server.py does, as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def server_module():
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server_module):
+    """TestClient with the lifespan running and the catalog warmed up"""
+    from fastapi.testclient import TestClient
+
+    with TestClient(server_module.app) as test_client:
+        deadline = time.monotonic() + 30
+        while test_client.get("/health/ready").status_code != 200:
+            assert time.monotonic() < deadline, "server did not become ready"
+            time.sleep(0.05)
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def sign_in(client, server_module):
+    """sign_in(email) registers and verifies a user and returns its Authorization header"""
+    def sign_in(email: str):
+        client.post("/api/auth/register", json={"firstName": "Test", "lastName": "User", "email": email, "password": "pw"})
+        otp = server_module.otps_db[email]["otp"]
+        client.post("/api/auth/verify-otp", json={"email": email, "otp": otp})
+        response = client.post("/api/auth/login", json={"email": email, "password": "pw"})
+        return {"Authorization": f"Bearer {response.json()['data']['accessToken']}"}
+    return sign_in
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from analytics import SalesRollup
+
+
+def order(order_id, day, status="paid", amount=50.0):
+    return {
+        "id": order_id, "status": status, "createdAt": f"{day}T10:00:00", "totalAmount": amount,
+        "items": [{"productId": "p1", "categoryId": "c1", "quantity": 1, "itemTotal": amount}],
+    }
+
+
+def rollup():
+    return SalesRollup(lambda product_id: None)
+
+
+def test_rebuild_runs_off_the_loop_and_keeps_changes_made_meanwhile():
+    orders = {o["id"]: o for o in (order("o1", "2026-01-01"), order("o2", "2026-01-02"), order("o3", "2026-01-02"))}
+    live = rollup()
+    live.backfill(orders.values())
+    threads = []
+
+    async def rebuild():
+        loop = asyncio.get_running_loop()
+        scanned = asyncio.Event()
+
+        async def run(func, *args):
+            def scan():
+                threads.append(threading.get_ident())
+                result = func(*args)
+                loop.call_soon_threadsafe(scanned.set)
+                return result
+            future = loop.run_in_executor(None, scan)
+            await scanned.wait()
+            # The scan is done, but before the swap orders keep changing on the loop
+            new = orders["o4"] = order("o4", "2026-01-03", amount=20.0)
+            live.record(new)
+            live.transition(orders["o2"], "paid", "refunded")
+            orders["o2"]["status"] = "refunded"
+            return await future
+
+        return await live.rebuild(orders.values(), run)
+
+    assert asyncio.run(rebuild()) == 3
+    assert threads and threads[0] != threading.get_ident()
+
+    expected = rollup()
+    expected.backfill(orders.values())
+    assert live.query() == expected.query()
+    assert live.query()["totals"]["orders"] == 3
+
+
+def test_rebuild_drops_counters_of_removed_orders():
+    live = rollup()
+    live.record(order("o1", "2026-01-01"))
+
+    async def run(func, *args):
+        return func(*args)
+
+    assert asyncio.run(live.rebuild([], run)) == 0
+    assert live.days == [] and live.query()["totals"]["orders"] == 0
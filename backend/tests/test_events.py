@@ -0,0 +1,30 @@
+from events import EventHub
+
+
+def test_publish_many_reaches_only_listed_users():
+    hub = EventHub(buffer_size=10, heartbeat=15)
+    alice, bob = hub.subscribe("alice"), hub.subscribe("bob")
+    assert hub.publish_many({"alice": 1, "carol": 1}.keys(), "product.stock", {"productId": "1"}) == 1
+    assert len(alice.buffer) == 1 and len(bob.buffer) == 0
+    assert hub.publish_many(["nobody"], "product.stock", {"productId": "1"}) == 0
+
+
+def test_stock_alerts_go_to_wishlist_watchers_only(client, server_module, sign_in):
+    watcher = sign_in("watcher-stock@example.com")
+    sign_in("bystander-stock@example.com")
+    users = {user["email"]: user_id for user_id, user in server_module.users_db.items()}
+    client.post("/api/wishlist/add", json={"productId": "2"}, headers=watcher)
+
+    hub = server_module.event_hub
+    watching = hub.subscribe(users["watcher-stock@example.com"])
+    bystanding = hub.subscribe(users["bystander-stock@example.com"])
+    original = server_module.products_db["2"]
+    try:
+        product = dict(original, stock=0)
+        server_module.products_db["2"] = product
+        assert [m for m in watching.buffer if "product.stock" in m]
+        assert not [m for m in bystanding.buffer if "product.stock" in m]
+    finally:
+        server_module.products_db["2"] = original
+        hub.unsubscribe(watching)
+        hub.unsubscribe(bystanding)
@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+import google_keys
+from google_keys import GoogleKeyring, GoogleTokenVerifier, InvalidGoogleToken
+
+CLIENT_ID = "client-1"
+
+
+def keypair(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = jwk.construct(private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ), "RS256").to_dict()
+    public.update(kid=kid, use="sig", alg="RS256")
+    return pem, public
+
+
+def sign(pem, kid, **overrides):
+    claims = {
+        "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234",
+        "email": "user@gmail.com", "email_verified": True, "name": "Jane Doe",
+        "iat": int(time.time()), "exp": int(time.time()) + 600,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid})
+
+
+class Certs:
+    """Stand-in for Google's certs endpoint: serves the current JWKS and counts fetches"""
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.fetches = 0
+
+    async def __call__(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return {"keys": list(self.keys)}, 3600.0
+
+
+@pytest.fixture(scope="module")
+def old_key():
+    return keypair("old")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def verifier_for(certs):
+    keyring = GoogleKeyring(certs)
+    run(keyring.refresh())
+    return GoogleTokenVerifier(keyring, CLIENT_ID)
+
+
+def test_valid_token_is_verified_then_served_from_cache(old_key):
+    pem, public = old_key
+    verifier = verifier_for(Certs(public))
+    token = sign(pem, "old")
+
+    assert run(verifier.verify(token))["email"] == "user@gmail.com"
+    assert run(verifier.verify(token))["sub"] == "1234"
+    assert verifier.stats == {"verified": 1, "cacheHits": 1, "rejected": 0}
+
+
+@pytest.mark.parametrize("overrides", [
+    {"email_verified": False},
+    {"email_verified": "true"},
+    {"email_verified": None},
+    {"email": ""},
+])
+def test_unverified_email_is_rejected(old_key, overrides):
+    pem, public = old_key
+    verifier = verifier_for(Certs(public))
+    with pytest.raises(InvalidGoogleToken, match="not verified"):
+        run(verifier.verify(sign(pem, "old", **overrides)))
+    assert verifier.stats["rejected"] == 1
+
+
+@pytest.mark.parametrize("overrides", [
+    {"aud": "someone-else"},
+    {"iss": "evil.example"},
+    {"exp": int(time.time()) - 10},
+])
+def test_wrong_audience_issuer_or_expired_token_is_rejected(old_key, overrides):
+    pem, public = old_key
+    verifier = verifier_for(Certs(public))
+    with pytest.raises(InvalidGoogleToken):
+        run(verifier.verify(sign(pem, "old", **overrides)))
+
+
+def test_forged_signature_is_rejected(old_key):
+    _, public = old_key
+    forger_pem, _ = keypair("old")
+    verifier = verifier_for(Certs(public))
+    with pytest.raises(InvalidGoogleToken):
+        run(verifier.verify(sign(forger_pem, "old")))
+
+
+def test_key_rotation_triggers_one_shared_refresh(old_key):
+    old_pem, old_public = old_key
+    new_pem, new_public = keypair("new")
+    certs = Certs(old_public)
+    verifier = verifier_for(certs)
+    assert certs.fetches == 1
+
+    certs.keys.append(new_public)
+    verifier.keyring._last_refresh = 0.0
+
+    async def sign_in_concurrently():
+        return await asyncio.gather(*(verifier.verify(sign(new_pem, "new", sub=f"r{i}")) for i in range(10)))
+
+    claims = run(sign_in_concurrently())
+    assert [c["sub"] for c in claims] == [f"r{i}" for i in range(10)]
+    assert certs.fetches == 2
+    # Tokens signed with the previous key keep working while Google still publishes it
+    assert run(verifier.verify(sign(old_pem, "old")))["sub"] == "1234"
+
+
+def test_unknown_key_refresh_is_rate_limited(old_key):
+    pem, public = old_key
+    certs = Certs(public)
+    verifier = verifier_for(certs)
+    for _ in range(3):
+        with pytest.raises(InvalidGoogleToken, match="Unknown signing key"):
+            run(verifier.verify(sign(pem, "unknown")))
+    # Refreshed at setup moments ago, so unknown kids don't hit Google again
+    assert certs.fetches == 1
+    assert verifier.keyring.stats["unknownKid"] == 3
+
+
+def test_refresh_failure_keeps_serving_old_keys(old_key, monkeypatch):
+    pem, public = old_key
+    certs = Certs(public)
+    verifier = verifier_for(certs)
+
+    async def outage():
+        raise ConnectionError("certs endpoint down")
+
+    verifier.keyring.fetch = outage
+    monkeypatch.setattr(google_keys, "MIN_UNKNOWN_KID_REFRESH_SECONDS", 0.0)
+    with pytest.raises(InvalidGoogleToken):
+        run(verifier.verify(sign(pem, "rotated")))
+    assert verifier.keyring.stats["refreshErrors"] == 1
+    assert run(verifier.verify(sign(pem, "old")))["sub"] == "1234"
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+import http_clients
+from http_clients import CircuitBreaker, CircuitOpenError, IntegrationError, ProviderClient, RetryBudget
+
+
+class StandIn:
+    """Provider stand-in: answers each request with the next scripted outcome (a status code or an exception)"""
+
+    def __init__(self, *outcomes, latency: float = 0.0):
+        self.outcomes = list(outcomes)
+        self.latency = latency
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"ok": outcome == 200})
+
+
+def provider(stand_in, **kwargs):
+    return ProviderClient("stand-in", "http://stand-in", transport=httpx.MockTransport(stand_in), **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(http_clients, "BACKOFF_BASE_SECONDS", 0.0)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_idempotent_requests_retry_server_errors():
+    stand_in = StandIn(503, 502, 200)
+    client = provider(stand_in, retries=2)
+    response = run(client.request("GET", "/v1/ping"))
+    assert response.status_code == 200
+    assert stand_in.requests == 3
+    assert client.stats["retries"] == 2
+
+
+def test_non_idempotent_requests_only_retry_connection_failures():
+    stand_in = StandIn(503)
+    client = provider(stand_in, retries=2)
+    assert run(client.request("POST", "/v1/charges")).status_code == 503
+    assert stand_in.requests == 1
+
+    stand_in = StandIn(httpx.ConnectError("refused"), 200)
+    client = provider(stand_in, retries=2)
+    assert run(client.request("POST", "/v1/charges")).status_code == 200
+    assert stand_in.requests == 2
+
+    stand_in = StandIn(httpx.ReadTimeout("slow"))
+    client = provider(stand_in, retries=2)
+    with pytest.raises(IntegrationError):
+        run(client.request("POST", "/v1/charges"))
+    assert stand_in.requests == 1
+
+
+def test_idempotency_key_makes_posts_retryable():
+    stand_in = StandIn(503, 200)
+    client = provider(stand_in, retries=2)
+    response = run(client.request("POST", "/v1/payment_intents", headers={"Idempotency-Key": "k"}))
+    assert response.status_code == 200
+    assert stand_in.requests == 2
+
+
+def test_retry_budget_exhaustion_stops_retries():
+    stand_in = StandIn(503)
+    client = provider(stand_in, retries=5, budget=RetryBudget(ratio=0.0, reserve=2.0),
+                      breaker=CircuitBreaker(failure_threshold=100))
+
+    async def calls():
+        first = await client.request("GET", "/v1/ping")
+        second = await client.request("GET", "/v1/ping")
+        return first, second
+
+    first, second = run(calls())
+    assert first.status_code == second.status_code == 503
+    # Two tokens: the first call spends both, the second gets no retries at all
+    assert stand_in.requests == 3 + 1
+    assert client.stats["retries"] == 2
+    assert client.stats["budgetExhausted"] == 2
+    assert client.budget.tokens < 1
+
+
+def test_breaker_opens_then_half_opens_with_a_single_probe():
+    stand_in = StandIn(503)
+    client = provider(stand_in, retries=0, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.05))
+
+    async def scenario():
+        for _ in range(3):
+            await client.request("GET", "/v1/ping")
+        assert client.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await client.request("GET", "/v1/ping")
+        assert stand_in.requests == 3
+
+        # After the cool-down one probe goes through; a failed probe reopens at once
+        await asyncio.sleep(0.06)
+        await client.request("GET", "/v1/ping")
+        assert stand_in.requests == 4
+        assert client.breaker.state == "open"
+
+        # A successful probe closes the circuit; concurrent callers are rejected while it runs
+        await asyncio.sleep(0.06)
+        stand_in.outcomes = [200]
+        stand_in.latency = 0.02
+        results = await asyncio.gather(*(client.request("GET", "/v1/ping") for _ in range(5)), return_exceptions=True)
+        assert sum(isinstance(result, CircuitOpenError) for result in results) == 4
+        assert client.breaker.state == "closed"
+        assert (await client.request("GET", "/v1/ping")).status_code == 200
+        await client.aclose()
+
+    run(scenario())
+    assert client.stats["rejected"] == 5
+    assert client.breaker.trips == 2
@@ -0,0 +1,30 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ids import first_id_at, id_timestamp, new_id
+
+
+@pytest.fixture
+def non_utc_host(monkeypatch):
+    """Run with the process time zone far from UTC, as on a non-UTC host"""
+    monkeypatch.setenv("TZ", "Pacific/Auckland")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_moments_are_local_time_like_created_at(non_utc_host):
+    created_at = datetime.now()
+    order_id = new_id()
+    # The window its own createdAt suggests contains the id
+    assert first_id_at(created_at - timedelta(seconds=1)) <= order_id
+    assert first_id_at(created_at + timedelta(seconds=1)) > order_id
+
+
+def test_aware_moments_match_naive_local_ones(non_utc_host):
+    moment = datetime.now().replace(microsecond=0)
+    assert first_id_at(moment) == first_id_at(moment.astimezone(timezone.utc))
+    assert abs(id_timestamp(first_id_at(moment)) - moment.astimezone(timezone.utc)) < timedelta(milliseconds=1)
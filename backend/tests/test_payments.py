@@ -0,0 +1,17 @@
+def test_create_intent_requires_sign_in(client):
+    response = client.post("/api/payments/create-intent", params={"amount": 10})
+    assert response.status_code in (401, 403)
+
+
+def test_idempotency_keys_are_scoped_per_user(client, sign_in):
+    alice = sign_in("alice-payments@example.com")
+    bob = sign_in("bob-payments@example.com")
+
+    first = client.post("/api/payments/create-intent", params={"amount": 10}, headers={**alice, "Idempotency-Key": "k1"})
+    retry = client.post("/api/payments/create-intent", params={"amount": 10}, headers={**alice, "Idempotency-Key": "k1"})
+    other = client.post("/api/payments/create-intent", params={"amount": 10}, headers={**bob, "Idempotency-Key": "k1"})
+
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.json()["data"] == first.json()["data"]
+    assert "Idempotent-Replayed" not in other.headers
+    assert other.json()["data"]["client_secret"] != first.json()["data"]["client_secret"]
@@ -0,0 +1,28 @@
+from catalog import generate_synthetic_products
+from product_store import ProductStore
+
+
+def test_updates_do_not_grow_the_intern_pool():
+    store = ProductStore()
+    product = next(generate_synthetic_products(1))
+    store[product["id"]] = product
+    pool_size = len(store._pool)
+    for n in range(5000):
+        product["images"] = [f"https://cdn.example.com/{n}.webp"]
+        product["careInstructions"] = f"Wash {n}"
+        product["materials"] = [f"Material {n}"]
+        store[product["id"]] = product
+    assert len(store._pool) == pool_size
+    assert store[product["id"]]["images"] == ["https://cdn.example.com/4999.webp"]
+
+
+def test_enum_like_fields_are_shared():
+    store = ProductStore()
+    first, second = generate_synthetic_products(2)
+    second["categoryId"] = "".join(first["categoryId"])
+    second["sizes"] = list(first["sizes"])
+    store[first["id"]] = first
+    store[second["id"]] = second
+    a, b = store.record(first["id"]), store.record(second["id"])
+    assert a.categoryId is b.categoryId
+    assert a.sizes is b.sizes
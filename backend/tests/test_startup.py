@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so nothing imported by other tests hides import cost
+PROFILE_SCRIPT = """
+import json, sys, time
+from fastapi.testclient import TestClient
+import server
+
+with TestClient(server.app) as client:
+    deadline = time.monotonic() + 60
+    while not server.readiness["ready"] and server.readiness["phase"] != "failed" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+heavy = ("stripe", "twilio", "sendgrid", "reportlab", "google.oauth2", "PIL")
+print(json.dumps({
+    "profile": server.startup_profile,
+    "budget": server.STARTUP_BUDGET_SECONDS,
+    "readiness": server.readiness,
+    "heavyImports": sorted(name for name in heavy if name in sys.modules),
+}))
+"""
+
+
+def profile_startup():
+    result = subprocess.run(
+        [sys.executable, "-c", PROFILE_SCRIPT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120,
+        env={**os.environ, "DATA_DIR": "", "SYNTHETIC_CATALOG_SIZE": "0", "CATALOG_PATH": ""},
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_startup_is_within_budget():
+    report = profile_startup()
+    assert report["readiness"]["ready"], report["readiness"]
+    assert report["profile"]["import"] < report["budget"], report["profile"]
+    assert report["profile"]["catalog"] < report["budget"], report["profile"]
+
+
+def test_import_does_not_load_integration_sdks():
+    assert profile_startup()["heavyImports"] == []
@@ -0,0 +1,79 @@
+import asyncio
+
+from webhooks import WebhookProcessor, TTLCache, expected_status
+
+
+def payment_event(event_id, intent_id, event_type="payment_intent.succeeded"):
+    return {"id": event_id, "type": event_type, "data": {"object": {"id": intent_id, "object": "payment_intent"}}}
+
+
+def drain(processor):
+    while not processor.queue.empty():
+        processor._process(processor.queue.get_nowait())
+
+
+def test_ttl_cache_reports_evicted_entries():
+    evicted = []
+    cache = TTLCache(ttl=60, max_size=2, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert evicted == [("a", 1)]
+    assert cache.pop("b") == 2
+    assert evicted == [("a", 1)]
+
+
+def test_evicted_parked_events_are_accepted_again():
+    async def scenario():
+        orders = {}
+        processor = WebhookProcessor(lambda event: event["data"]["object"]["id"] in orders, queue_size=2)
+        for n in range(3):
+            assert processor.submit(payment_event(f"evt_{n}", f"pi_{n}")) == "queued"
+            drain(processor)
+        # pi_0 was evicted from the parked events when pi_2 was parked
+        assert processor.stats["dropped"] == 1
+        assert processor.submit(payment_event("evt_0", "pi_0")) == "queued"
+        assert processor.submit(payment_event("evt_1", "pi_1")) == "duplicate"
+
+    asyncio.run(scenario())
+
+
+def test_expired_parked_events_are_accepted_again():
+    async def scenario():
+        processor = WebhookProcessor(lambda event: False, dedup_ttl=60)
+        processor.parked.ttl = 0
+        processor.submit(payment_event("evt_0", "pi_0"))
+        drain(processor)
+        assert processor.submit(payment_event("evt_0", "pi_0")) == "queued"
+
+    asyncio.run(scenario())
+
+
+def test_released_events_are_applied_once_in_order():
+    async def scenario():
+        applied = []
+        orders = set()
+
+        def apply(event):
+            if event["data"]["object"]["id"] not in orders:
+                return False
+            applied.append(event["id"])
+            return True
+
+        processor = WebhookProcessor(apply)
+        processor.submit(payment_event("evt_0", "pi_0", "payment_intent.processing"))
+        processor.submit(payment_event("evt_1", "pi_0"))
+        drain(processor)
+        assert processor.submit(payment_event("evt_0", "pi_0")) == "duplicate"
+        orders.add("pi_0")
+        processor.release("pi_0")
+        drain(processor)
+        assert applied == ["evt_0", "evt_1"]
+        assert processor.submit(payment_event("evt_1", "pi_0")) == "duplicate"
+
+    asyncio.run(scenario())
+
+
+def test_expected_status_skips_stale_transitions():
+    assert expected_status(["paid", "processing", "refunded"]) == "refunded"
+    assert expected_status(["payment_failed", "paid", "cancelled"]) == "paid"
@@ -0,0 +1,348 @@
+"""
+AllBlackery Stripe Webhook Processing
+
+Idempotent, queued handling of Stripe webhook events:
+- Stripe-Signature verification (HMAC-SHA256, same scheme as stripe.Webhook)
+- Event-id dedup store with TTL, so Stripe retries are applied once. An id
+  counts as seen only once its event is applied; while it is queued or
+  parked, retries are absorbed, and a failed apply lets Stripe's retry in
+- Bounded queue drained by one background worker, applying status
+  transitions in arrival order while the endpoint acknowledges immediately
+- Events that arrive before their order exists are parked until it is created;
+  parked events that expire or are evicted are forgotten, so Stripe's retries
+  of them are accepted again
+
+Replay harness (signs in, seeds orders for half the payment intents, fires
+signed events with duplicates, then checks every order's final status and the
+duplicate count; needs MOCK_INTEGRATIONS=true for the mock Google sign-in):
+    STRIPE_WEBHOOK_SECRET=whsec_test python webhooks.py http://localhost:8001 5000
+"""
+
+from typing import List, Optional, Dict, Any, Callable, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+# Stripe event type -> order status
+PAYMENT_EVENT_STATUS = {
+    "payment_intent.processing": "processing",
+    "payment_intent.succeeded": "paid",
+    "payment_intent.payment_failed": "payment_failed",
+    "payment_intent.canceled": "cancelled",
+    "charge.refunded": "refunded",
+}
+
+# Allowed order status transitions; anything else (e.g. a late "processing"
+# after "paid") is a stale or out-of-order event and is ignored
+ALLOWED_TRANSITIONS = {
+    "pending": {"processing", "paid", "payment_failed", "cancelled"},
+    "processing": {"paid", "payment_failed", "cancelled"},
+    "payment_failed": {"processing", "paid", "cancelled"},
+    "paid": {"refunded"},
+}
+
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+
+class SignatureError(ValueError):
+    pass
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header value for a payload"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def verify_signature(payload: bytes, header: Optional[str], secret: str,
+                     tolerance: int = SIGNATURE_TOLERANCE_SECONDS):
+    """Verify a Stripe-Signature header; raises SignatureError when invalid or stale"""
+    if not header:
+        raise SignatureError("Missing Stripe-Signature header")
+    timestamp = None
+    signatures = []
+    for part in header.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise SignatureError("Malformed Stripe-Signature header")
+    if abs(time.time() - int(timestamp)) > tolerance:
+        raise SignatureError("Timestamp outside the tolerance zone")
+
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, s) for s in signatures):
+        raise SignatureError("No signature matches the payload")
+
+
+def payment_intent_id(event: Dict[str, Any]) -> Optional[str]:
+    """Payment intent id of a payment_intent.* or charge.* event"""
+    obj = event.get("data", {}).get("object", {})
+    if obj.get("object") == "charge" or event.get("type", "").startswith("charge."):
+        return obj.get("payment_intent")
+    return obj.get("id")
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire after a fixed TTL; on_evict(key, value) sees expired and evicted entries"""
+
+    def __init__(self, ttl: float, max_size: int, on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        # Entries are kept in insertion order, which is also expiry order
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_size:
+                break
+            _, (_, value) = self._entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+
+    def expire(self):
+        """Drop expired entries now instead of on the next access"""
+        self._evict()
+
+    def __contains__(self, key: str) -> bool:
+        self._evict()
+        return key in self._entries
+
+    def __len__(self) -> int:
+        self._evict()
+        return len(self._entries)
+
+    def get(self, key: str, default=None):
+        self._evict()
+        entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key: str, value: Any = True):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._evict()
+
+    def pop(self, key: str, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+
+class WebhookProcessor:
+    """Deduplicates webhook events and applies them in order on a background worker"""
+
+    def __init__(
+        self,
+        apply: Callable[[Dict[str, Any]], bool],
+        dedup_ttl: float = 72 * 3600,
+        max_events: int = 1_000_000,
+        queue_size: int = 10_000,
+    ):
+        # apply(event) returns False when the event's order doesn't exist yet
+        self.apply = apply
+        self.seen = TTLCache(dedup_ttl, max_events)
+        # Ids of events queued or parked but not yet applied
+        self.pending = TTLCache(dedup_ttl, max_events)
+        self.parked = TTLCache(dedup_ttl, queue_size, on_evict=self._drop_parked)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = {"received": 0, "duplicates": 0, "applied": 0, "parked": 0, "dropped": 0, "failed": 0}
+
+    def _drop_parked(self, intent_id: str, events: List[Dict[str, Any]]):
+        # Forget the dropped events so Stripe's next retry of each is accepted, not answered as a duplicate
+        for event in events:
+            self.pending.pop(event.get("id"))
+        self.stats["dropped"] += len(events)
+
+    def submit(self, event: Dict[str, Any]) -> str:
+        """Queue an event; returns "queued", "duplicate" or "busy" (queue full, let Stripe retry)"""
+        event_id = event.get("id")
+        # Expired parked events release their ids from pending before the duplicate check
+        self.parked.expire()
+        if event_id and (event_id in self.seen or event_id in self.pending):
+            self.stats["duplicates"] += 1
+            return "duplicate"
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return "busy"
+        if event_id:
+            self.pending.set(event_id)
+        self.stats["received"] += 1
+        return "queued"
+
+    def release(self, intent_id: Optional[str]):
+        """Re-queue events parked for a payment intent whose order now exists"""
+        if not intent_id:
+            return
+        for event in self.parked.pop(intent_id, []):
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Dropped: forget it so Stripe's next retry is accepted
+                self.pending.pop(event.get("id"))
+                self.stats["failed"] += 1
+
+    def _process(self, event: Dict[str, Any]):
+        event_id = event.get("id")
+        try:
+            if self.apply(event):
+                if event_id:
+                    self.pending.pop(event_id)
+                    self.seen.set(event_id)
+                self.stats["applied"] += 1
+                return
+            intent_id = payment_intent_id(event)
+            if intent_id:
+                parked = self.parked.get(intent_id) or []
+                parked.append(event)
+                self.parked.set(intent_id, parked)
+                self.stats["parked"] += 1
+            elif event_id:
+                self.pending.pop(event_id)
+        except Exception as e:
+            # Not marked seen, so Stripe's retry of this event is applied again
+            if event_id:
+                self.pending.pop(event_id)
+            self.stats["failed"] += 1
+            print(f"Webhook processing error for {event.get('id')}: {str(e)}")
+
+    async def run(self):
+        """Single consumer, so events are applied in the order they were received"""
+        while True:
+            event = await self.queue.get()
+            self._process(event)
+            self.queue.task_done()
+
+
+def expected_status(statuses: List[str], status: str = "pending") -> str:
+    """Order status after applying event statuses in order, skipping disallowed transitions"""
+    for next_status in statuses:
+        if next_status in ALLOWED_TRANSITIONS.get(status, ()):
+            status = next_status
+    return status
+
+
+async def replay(base_url: str, count: int, secret: str, duplicate_ratio: float = 0.2,
+                 intents: int = 100, concurrency: int = 50, settle_timeout: float = 30) -> Dict[str, Any]:
+    """Fire `count` signed events (a share of them resent) at a running server and check the outcome
+
+    Orders are seeded for half of the payment intents. Each intent's events are
+    sent one after another (intents in parallel), so every seeded order must end
+    in the status its event sequence implies, and every resent event must be
+    answered as a duplicate.
+    """
+    import random
+    import httpx
+
+    rng = random.Random(0)
+    run = format(int(time.time() * 1000), "x")
+    types = list(PAYMENT_EVENT_STATUS)
+    # Per intent: (payload, is_resend) in send order
+    sequences: Dict[str, List[Tuple[bytes, bool]]] = {f"pi_replay_{run}_{k}": [] for k in range(intents)}
+    intent_ids = list(sequences)
+    expected_duplicates = 0
+    for i in range(count):
+        intent_id = intent_ids[i % intents]
+        sent = sequences[intent_id]
+        if sent and rng.random() < duplicate_ratio:
+            sent.append((rng.choice(sent)[0], True))
+            expected_duplicates += 1
+            continue
+        event_type = rng.choice(types)
+        if event_type.startswith("charge."):
+            obj = {"id": f"ch_replay_{run}_{i}", "object": "charge", "payment_intent": intent_id}
+        else:
+            obj = {"id": intent_id, "object": "payment_intent"}
+        event = {"id": f"evt_replay_{run}_{i}", "type": event_type, "data": {"object": obj}}
+        sent.append((json.dumps(event).encode(), False))
+
+    statuses: Dict[int, int] = {}
+    duplicates = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+        # Seed an order for every other intent; events for the rest stay parked
+        response = await client.post("/api/auth/google", json={"token": f"replay-{run}"})
+        response.raise_for_status()
+        auth = {"Authorization": f"Bearer {response.json()['data']['accessToken']}"}
+        response = await client.get("/api/products", params={"limit": 1})
+        product_id = response.json()["data"]["products"][0]["id"]
+        orders: Dict[str, str] = {}
+        for intent_id in intent_ids[::2]:
+            response = await client.post("/api/orders", headers=auth, json={
+                "items": [{"productId": product_id, "quantity": 1}],
+                "shippingAddress": {"line1": "Replay"},
+                "paymentMethod": "card",
+                "paymentIntentId": intent_id,
+            })
+            response.raise_for_status()
+            orders[intent_id] = response.json()["data"]["orderId"]
+
+        async def fire(sequence: List[Tuple[bytes, bool]]):
+            nonlocal duplicates
+            for payload, _ in sequence:
+                async with semaphore:
+                    response = await client.post(
+                        "/api/payments/webhook",
+                        content=payload,
+                        headers={"Stripe-Signature": sign_payload(payload, secret), "Content-Type": "application/json"},
+                    )
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200 and response.json().get("duplicate"):
+                    duplicates += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fire(sequence) for sequence in sequences.values()))
+        elapsed = time.perf_counter() - started
+
+        # Events are applied in the background: poll until every seeded order settles
+        expected = {
+            intent_id: expected_status([
+                PAYMENT_EVENT_STATUS[json.loads(payload)["type"]]
+                for payload, resend in sequences[intent_id] if not resend
+            ])
+            for intent_id in orders
+        }
+        mismatches: Dict[str, Tuple[str, str]] = {}
+        deadline = time.monotonic() + settle_timeout
+        while True:
+            mismatches = {}
+            for intent_id, order_id in orders.items():
+                response = await client.get(f"/api/orders/{order_id}", headers=auth)
+                status = response.json()["data"]["status"]
+                if status != expected[intent_id]:
+                    mismatches[intent_id] = (status, expected[intent_id])
+            if not mismatches or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.2)
+
+    return {
+        "events": count,
+        "seconds": round(elapsed, 3),
+        "perSecond": round(count / elapsed),
+        "statuses": statuses,
+        "duplicates": {"expected": expected_duplicates, "observed": duplicates},
+        "seededOrders": len(orders),
+        "statusMismatches": mismatches,
+        "ok": not mismatches and duplicates == expected_duplicates and set(statuses) == {200},
+    }
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    report = asyncio.run(replay(base_url, count, os.environ["STRIPE_WEBHOOK_SECRET"]))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
@@ -33,10 +33,12 @@ export const useStripePayment = () => {
   // Create payment intent
   const createPaymentIntentMutation = useMutation({
     mutationFn: async (paymentData: PaymentData) => {
+      const token = localStorage.getItem('accessToken');
       const response = await fetch('/api/payments/create-intent', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
         },
         body: JSON.stringify(paymentData),
       });